@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import re
+from typing import List, Optional, Pattern
+
+DEFAULT_MARKER_TEMPLATE = "⟦{i}⟧"
+DEFAULT_MARKER_REGEX = r"⟦\d+⟧"
+
+
+def format_markers(template: str, n: int) -> List[str]:
+    """``n`` distinct segment markers (1-based ``{i}``)."""
+
+    if "{i}" not in template:
+        raise ValueError(f"Marker template must contain '{{i}}': {template!r}")
+    return [template.replace("{i}", str(i)) for i in range(1, n + 1)]
+
+
+def add_marker(marker: str, text: str, join: str = " ") -> str:
+    return f"{marker}{join}{text}" if text else marker
+
+
+def markers_in(text: str, regex: str = DEFAULT_MARKER_REGEX) -> List[str]:
+    return re.findall(regex, text or "")
+
+
+def strip_markers(text: str, regex: str = DEFAULT_MARKER_REGEX) -> str:
+    out = re.sub(rf"[ \t]*(?:{regex})[ \t]*", " ", text or "")
+    return "\n".join(line.strip() for line in out.split("\n")).strip()
+
+
+def _pattern(markers: List[str], regex: Optional[str]) -> Pattern[str]:
+    alts = [re.escape(m) for m in sorted(set(markers), key=len, reverse=True)]
+    if regex:
+        alts.append(f"(?:{regex})")
+    return re.compile("|".join(alts))
+
+
+def split_on_markers(text: str, markers: List[str], regex: Optional[str] = None) -> Optional[List[str]]:
+    """Split ``text`` into one segment per expected marker, or ``None``.
+
+    Valid only if the markers found in ``text`` are exactly ``markers`` in the
+    same order (each once); ``regex`` additionally catches invented markers
+    such as a ``⟦7⟧`` in a 6-segment document. Text before the first marker
+    belongs to the first segment.
+    """
+
+    if not markers:
+        return None
+    found = list(_pattern(markers, regex).finditer(text or ""))
+    if [m.group(0) for m in found] != markers:
+        return None
+    segments: List[str] = []
+    for i, m in enumerate(found):
+        end = found[i + 1].start() if i + 1 < len(found) else len(text)
+        segments.append(text[m.end() : end].strip())
+    lead = text[: found[0].start()].strip()
+    if lead:
+        segments[0] = f"{lead} {segments[0]}".strip()
+    return segments
@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+LATENCY_DISTS = ("fixed", "uniform", "lognormal")
+
+# Rough chars per token for the synthetic usage numbers.
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class FakeServerConfig:
+    """Behaviour of the stand-in OpenAI server (see :class:`FakeOpenAIServer`).
+
+    A request waits for one of ``max_num_seqs`` slots, then takes a sampled
+    time-to-first-token plus ``completion_tokens / tokens_per_s``. The output
+    echoes the source text (last paragraph of the last message), scaled by
+    ``output_ratio`` and cut at ``max_tokens``.
+    """
+
+    model: str = "bench-model"
+    ttft_ms: float = 50.0
+    latency_dist: str = "lognormal"
+    jitter: float = 0.3
+    tokens_per_s: float = 200.0
+    output_ratio: float = 1.0
+    max_num_seqs: int = 256
+    error_rate: float = 0.0
+    error_status: int = 503
+    retry_after_s: Optional[float] = None
+    slow_rate: float = 0.0
+    slow_factor: float = 10.0
+    seed: int = 0
+
+    def __post_init__(self) -> None:
+        if self.latency_dist not in LATENCY_DISTS:
+            raise ValueError(f"latency_dist must be one of {LATENCY_DISTS}, got {self.latency_dist!r}")
+
+
+class _State:
+    def __init__(self, cfg: FakeServerConfig) -> None:
+        self.cfg = cfg
+        self.rng = random.Random(cfg.seed)
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max(1, cfg.max_num_seqs))
+        self.running = 0
+        self.waiting = 0
+        self.requests = 0
+        self.errors = 0
+        self.slow = 0
+        self.completion_tokens = 0
+        self.started = time.time()
+
+    def draw(self) -> tuple[float, bool, bool]:
+        """(ttft seconds, inject error, slow request) for one request."""
+
+        cfg = self.cfg
+        with self.lock:
+            u = self.rng.random()
+            err = self.rng.random() < cfg.error_rate
+            slow = self.rng.random() < cfg.slow_rate
+            g = self.rng.gauss(0.0, 1.0)
+        base = cfg.ttft_ms / 1000.0
+        if cfg.latency_dist == "uniform":
+            ttft = base * (1.0 + cfg.jitter * (2.0 * u - 1.0))
+        elif cfg.latency_dist == "lognormal":
+            # Median stays at ttft_ms; jitter is sigma of the underlying normal.
+            ttft = base * math.exp(cfg.jitter * g)
+        else:
+            ttft = base
+        return max(0.0, ttft), err, slow
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "slow": self.slow,
+                "running": self.running,
+                "waiting": self.waiting,
+                "completion_tokens": self.completion_tokens,
+                "uptime_s": round(time.time() - self.started, 3),
+                "config": asdict(self.cfg),
+            }
+
+
+def _source_text(messages: List[Dict[str, Any]]) -> str:
+    if not messages:
+        return ""
+    content = messages[-1].get("content", "")
+    if isinstance(content, list):
+        content = " ".join(str(p.get("text", "")) for p in content if isinstance(p, dict))
+    content = str(content)
+    # Prompt templates put the text after the last blank line / <<<text>>> tag.
+    content = content.rsplit("<<<text>>>", 1)[-1]
+    return content.rsplit("\n\n", 1)[-1].strip()
+
+
+def _fake_output(source: str, ratio: float, max_tokens: Optional[int]) -> tuple[str, int, str]:
+    n_chars = max(1, int(len(source) * ratio))
+    text = (source + " ") * (n_chars // (len(source) + 1) + 1) if source else "x" * n_chars
+    text = text[:n_chars]
+    tokens = max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+    if max_tokens is not None and tokens > max_tokens:
+        return text[: max_tokens * CHARS_PER_TOKEN], max_tokens, "length"
+    return text, tokens, "stop"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: _State
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0].rstrip("/")
+        st = self.state
+        if path in ("/v1/models", "/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": st.cfg.model, "object": "model"}]})
+        elif path == "/health":
+            self._send_json(200, {})
+        elif path == "/metrics":
+            s = st.stats()
+            body = (
+                f"vllm:num_requests_running {s['running']}\n"
+                f"vllm:num_requests_waiting {s['waiting']}\n"
+                f"vllm:generation_tokens_total {s['completion_tokens']}\n"
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/bench/stats":
+            self._send_json(200, st.stats())
+        else:
+            self._send_json(404, {"error": f"no route {self.path}"})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        if self.path.split("?", 1)[0].rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": f"no route {self.path}"})
+            return
+        try:
+            req = json.loads(raw)
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+
+        st = self.state
+        ttft, err, slow = st.draw()
+        with st.lock:
+            st.requests += 1
+            if err:
+                st.errors += 1
+        if err:
+            headers = {}
+            if st.cfg.retry_after_s is not None:
+                headers["Retry-After"] = f"{st.cfg.retry_after_s:g}"
+            self._send_json(st.cfg.error_status, {"error": {"message": "injected error"}}, headers)
+            return
+
+        source = _source_text(req.get("messages") or [])
+        max_tokens = req.get("max_tokens")
+        n = max(1, int(req.get("n") or 1))
+        text, tokens, finish = _fake_output(source, st.cfg.output_ratio, int(max_tokens) if max_tokens else None)
+        decode_s = tokens / st.cfg.tokens_per_s if st.cfg.tokens_per_s > 0 else 0.0
+        if slow:
+            ttft *= st.cfg.slow_factor
+            decode_s *= st.cfg.slow_factor
+
+        with st.lock:
+            st.waiting += 1
+        st.slots.acquire()
+        with st.lock:
+            st.waiting -= 1
+            st.running += 1
+            st.slow += int(slow)
+        try:
+            prompt_chars = sum(len(str(m.get("content", ""))) for m in req.get("messages") or [])
+            usage = {
+                "prompt_tokens": max(1, prompt_chars // CHARS_PER_TOKEN),
+                "completion_tokens": tokens * n,
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            if req.get("stream"):
+                self._stream(req, text, finish, usage, ttft, decode_s)
+            else:
+                time.sleep(ttft + decode_s)
+                choices = [
+                    {"index": i, "message": {"role": "assistant", "content": text}, "finish_reason": finish}
+                    for i in range(n)
+                ]
+                body = {"object": "chat.completion", "model": st.cfg.model, "choices": choices, "usage": usage}
+                self._send_json(200, body)
+            with st.lock:
+                st.completion_tokens += usage["completion_tokens"]
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # client cancelled (hedge loser / abort)
+        finally:
+            with st.lock:
+                st.running -= 1
+            st.slots.release()
+
+    def _stream(
+        self, req: Dict[str, Any], text: str, finish: str, usage: Dict[str, int], ttft: float, decode_s: float
+    ) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        time.sleep(ttft)
+        pieces = [text[i : i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)] or [""]
+        # Coalesce tokens into ~10ms frames so fast token rates don't turn into sleep(0) spam.
+        per_frame = max(1, math.ceil(len(pieces) / max(1.0, decode_s / 0.01)))
+        frame_s = decode_s * per_frame / len(pieces)
+        for i in range(0, len(pieces), per_frame):
+            delta = "".join(pieces[i : i + per_frame])
+            chunk = {"choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]}
+            self._chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+            if frame_s > 0:
+                time.sleep(frame_s)
+        tail = {"choices": [{"index": 0, "delta": {}, "finish_reason": finish}]}
+        self._chunk(b"data: " + json.dumps(tail).encode("utf-8") + b"\n\n")
+        if (req.get("stream_options") or {}).get("include_usage"):
+            self._chunk(b"data: " + json.dumps({"choices": [], "usage": usage}).encode("utf-8") + b"\n\n")
+        self._chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Stand-in for a vLLM OpenAI server: ``/v1/chat/completions``, ``/v1/models``,
+    ``/metrics`` (vLLM queue gauges) and ``/bench/stats`` (JSON counters)."""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host: str, port: int, cfg: FakeServerConfig) -> None:
+        self.state = _State(cfg)
+        handler = type("FakeHandler", (_Handler,), {"state": self.state})
+        super().__init__((host, port), handler)
+
+
+def add_server_args(p: argparse.ArgumentParser) -> None:
+    d = FakeServerConfig()
+    p.add_argument("--ttft-ms", type=float, default=d.ttft_ms, help="median time to first token")
+    p.add_argument("--latency-dist", choices=list(LATENCY_DISTS), default=d.latency_dist)
+    p.add_argument("--jitter", type=float, default=d.jitter, help="uniform: +-fraction; lognormal: sigma")
+    p.add_argument("--tokens-per-s", type=float, default=d.tokens_per_s, help="decode rate per request (0 = instant)")
+    p.add_argument("--output-ratio", type=float, default=d.output_ratio, help="output chars per source char")
+    p.add_argument("--max-num-seqs", type=int, default=d.max_num_seqs, help="concurrently running requests")
+    p.add_argument("--error-rate", type=float, default=d.error_rate, help="fraction of requests answered with --error-status")
+    p.add_argument("--error-status", type=int, default=d.error_status)
+    p.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds on injected errors")
+    p.add_argument("--slow-rate", type=float, default=d.slow_rate, help="fraction of requests slowed by --slow-factor")
+    p.add_argument("--slow-factor", type=float, default=d.slow_factor)
+    p.add_argument("--seed", type=int, default=d.seed)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeServerConfig:
+    return FakeServerConfig(
+        ttft_ms=args.ttft_ms,
+        latency_dist=args.latency_dist,
+        jitter=args.jitter,
+        tokens_per_s=args.tokens_per_s,
+        output_ratio=args.output_ratio,
+        max_num_seqs=args.max_num_seqs,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after_s=args.retry_after,
+        slow_rate=args.slow_rate,
+        slow_factor=args.slow_factor,
+        seed=args.seed,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Fake OpenAI-compatible server for offline generation benchmarks")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=18000)
+    p.add_argument("--model", default=FakeServerConfig.model)
+    add_server_args(p)
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    cfg = config_from_args(args)
+    cfg.model = args.model
+    server = FakeOpenAIServer(args.host, args.port, cfg)
+    print(f"[fake-server] http://{args.host}:{args.port}/v1 ({cfg.latency_dist} ttft={cfg.ttft_ms:g}ms, {cfg.tokens_per_s:g} tok/s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
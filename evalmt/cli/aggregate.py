@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import argparse
+import json
+from pathlib import Path
 
 import pandas as pd
 
@@ -11,9 +13,38 @@ from ..utils.jsonl import iter_jsonl
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser()
     p.add_argument("--run", required=True)
+    p.add_argument(
+        "--with-gen-stats",
+        action="store_true",
+        help="join throughput/latency/error-rate columns from outputs/<run>/gen/<model>.gen_stats.json",
+    )
     return p.parse_args()
 
 
+# Columns taken from each gen_stats.json job entry (prefixed with gen_).
+GEN_STATS_COLUMNS = [
+    "completion_tokens_per_s",
+    "latency_p50_s",
+    "latency_p95_s",
+    "latency_p99_s",
+    "error_rate",
+    "prompt_tokens",
+    "completion_tokens",
+]
+
+
+def load_gen_stats(gen_dir: Path) -> pd.DataFrame:
+    rows = []
+    for f in sorted(gen_dir.glob("*.gen_stats.json")):
+        stats = json.loads(f.read_text(encoding="utf-8"))
+        model = stats.get("model") or f.name[: -len(".gen_stats.json")]
+        for job in stats.get("by_job", {}).values():
+            row = {"dataset": job["dataset"], "lp": job["lp"], "model": model}
+            row.update({f"gen_{c}": job.get(c) for c in GEN_STATS_COLUMNS})
+            rows.append(row)
+    return pd.DataFrame(rows, columns=["dataset", "lp", "model"] + [f"gen_{c}" for c in GEN_STATS_COLUMNS])
+
+
 def main() -> None:
     args = parse_args()
     run_dir = ROOT / "outputs" / args.run
@@ -63,6 +94,11 @@ def main() -> None:
                     )
 
     df = pd.DataFrame(rows).sort_values(["dataset", "lp", "metric", "model"])
+    if args.with_gen_stats:
+        gen_df = load_gen_stats(run_dir / "gen")
+        if gen_df.empty:
+            print(f"⚠️  no *.gen_stats.json under {run_dir / 'gen'}")
+        df = df.merge(gen_df, on=["dataset", "lp", "model"], how="left")
     out_csv = run_dir / "summary.csv"
     df.to_csv(out_csv, index=False)
 
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+
+from ..bench.fake_server import add_server_args
+from ..utils.jsonl import write_jsonl
+
+BENCH_RUN = "bench"
+BENCH_DATASET = "bench"
+BENCH_MODEL = "bench"
+
+WORDS = "the of translation quality model segment document evaluation metric system language source target".split()
+
+
+def parse_args() -> tuple[argparse.Namespace, List[str]]:
+    p = argparse.ArgumentParser(
+        description="Benchmark evalmt-generate against local fake OpenAI servers (no GPU needed). "
+        "Unknown arguments are passed to evalmt-generate, e.g. --concurrency 64 --stream --hedge."
+    )
+    p.add_argument("--rows", type=int, default=2000, help="synthetic rows per LP")
+    p.add_argument("--lps", type=int, default=1, help="number of synthetic language pairs")
+    p.add_argument("--mean-chars", type=int, default=200, help="median source length (lognormal)")
+    p.add_argument("--servers", type=int, default=1, help="fake server replicas (one process each)")
+    p.add_argument("--port", type=int, default=18900, help="first fake server port")
+    p.add_argument("--workdir", default=None, help="scratch EVALMT_ROOT (default: a temporary directory)")
+    p.add_argument("--json", default=None, help="write the result as JSON")
+    p.add_argument("--baseline", default=None, help="previous --json result to compare against")
+    add_server_args(p)
+    return p.parse_known_args()
+
+
+def _sentence(rng: random.Random, n_chars: int) -> str:
+    words: List[str] = []
+    size = 0
+    while size < n_chars:
+        w = rng.choice(WORDS)
+        words.append(w)
+        size += len(w) + 1
+    return " ".join(words)
+
+
+def write_workdir(root: Path, *, rows: int, lps: int, mean_chars: int, seed: int) -> List[str]:
+    """Synthetic dataset + model config under ``root`` (used as EVALMT_ROOT)."""
+
+    rng = random.Random(seed)
+    data_dir = root / "data" / BENCH_DATASET
+    lp_names = [f"en-x{i}_XX" for i in range(lps)]
+    for lp in lp_names:
+        tgt = lp.split("-", 1)[1]
+        out = []
+        for i in range(rows):
+            n_chars = max(8, int(rng.lognormvariate(0.0, 0.6) * mean_chars))
+            out.append(
+                {
+                    "id": f"{lp}:{i}",
+                    "lp": lp,
+                    "document_id": f"d{i // 20}",
+                    "segment_id": i,
+                    "source": _sentence(rng, n_chars),
+                    "reference": "",
+                    "source_lang_code": "en",
+                    "target_lang_code": tgt,
+                }
+            )
+        write_jsonl(data_dir / f"{lp}.jsonl", out)
+    cfg_dir = root / "configs"
+    (cfg_dir / "datasets").mkdir(parents=True, exist_ok=True)
+    (cfg_dir / "models").mkdir(parents=True, exist_ok=True)
+    (cfg_dir / "datasets" / f"{BENCH_DATASET}.yaml").write_text(
+        yaml.safe_dump({"type": "bench", "prepared_dir": str(data_dir)}), encoding="utf-8"
+    )
+    model_cfg = {
+        "hf_model_id": "bench-model",
+        "served_model_name": "bench-model",
+        "generation_defaults": {"temperature": 0.0, "top_p": 1.0, "max_tokens": 4096, "stop": []},
+    }
+    (cfg_dir / "models" / f"{BENCH_MODEL}.yaml").write_text(yaml.safe_dump(model_cfg), encoding="utf-8")
+    (root / "pyproject.toml").touch()
+    return lp_names
+
+
+def _server_argv(args: argparse.Namespace, port: int, seed: int) -> List[str]:
+    argv = [
+        sys.executable, "-m", "evalmt.bench.fake_server",
+        "--port", str(port),
+        "--model", "bench-model",
+        "--ttft-ms", str(args.ttft_ms),
+        "--latency-dist", args.latency_dist,
+        "--jitter", str(args.jitter),
+        "--tokens-per-s", str(args.tokens_per_s),
+        "--output-ratio", str(args.output_ratio),
+        "--max-num-seqs", str(args.max_num_seqs),
+        "--error-rate", str(args.error_rate),
+        "--error-status", str(args.error_status),
+        "--slow-rate", str(args.slow_rate),
+        "--slow-factor", str(args.slow_factor),
+        "--seed", str(seed),
+    ]
+    if args.retry_after is not None:
+        argv += ["--retry-after", str(args.retry_after)]
+    return argv
+
+
+def _get_json(url: str, timeout_s: float = 2.0) -> Optional[Dict[str, Any]]:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout_s) as r:
+            return json.loads(r.read())
+    except OSError:
+        return None
+
+
+def _wait_ready(bases: List[str], timeout_s: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    for base in bases:
+        while _get_json(f"{base}/v1/models") is None:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"fake server did not come up: {base}")
+            time.sleep(0.1)
+
+
+def _fmt_delta(cur: Optional[float], base: Optional[float]) -> str:
+    if cur is None or not base:
+        return ""
+    return f" ({(cur - base) / base:+.1%})"
+
+
+def main() -> None:
+    args, gen_args = parse_args()
+    tmp: Optional[tempfile.TemporaryDirectory] = None
+    if args.workdir:
+        root = Path(args.workdir).resolve()
+    else:
+        tmp = tempfile.TemporaryDirectory(prefix="evalmt-bench-")
+        root = Path(tmp.name)
+    lps = write_workdir(root, rows=args.rows, lps=args.lps, mean_chars=args.mean_chars, seed=args.seed)
+    gen_dir = root / "outputs" / BENCH_RUN / "gen"
+    shutil.rmtree(root / "outputs" / BENCH_RUN, ignore_errors=True)
+
+    bases = [f"http://127.0.0.1:{args.port + i}" for i in range(args.servers)]
+    servers = [
+        subprocess.Popen(_server_argv(args, args.port + i, args.seed + i), stdout=subprocess.DEVNULL)
+        for i in range(args.servers)
+    ]
+    try:
+        _wait_ready(bases)
+        cmd = [
+            sys.executable, "-m", "evalmt.cli.generate",
+            "--run", BENCH_RUN,
+            "--dataset", BENCH_DATASET,
+            "--lp", ",".join(lps),
+            "--model", BENCH_MODEL,
+            "--api-base", ",".join(f"{b}/v1" for b in bases),
+            "--no-cache",
+            *gen_args,
+        ]
+        env = {**os.environ, "EVALMT_ROOT": str(root)}
+        print(f"[bench] {args.rows * len(lps)} rows, {args.servers} server(s): {' '.join(cmd[3:])}")
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        t0 = time.perf_counter()
+        # Reaped before the servers, so RUSAGE_CHILDREN covers the client process only.
+        proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        wall = time.perf_counter() - t0
+        after = resource.getrusage(resource.RUSAGE_CHILDREN)
+        server_stats = [_get_json(f"{b}/bench/stats") or {} for b in bases]
+    finally:
+        for s in servers:
+            s.terminate()
+        for s in servers:
+            s.wait()
+    if proc.returncode != 0:
+        print(proc.stdout[-4000:])
+        raise SystemExit(f"evalmt-generate failed (exit {proc.returncode})")
+
+    stats = json.loads((gen_dir / f"{BENCH_MODEL}.gen_stats.json").read_text(encoding="utf-8"))["total"]
+    cpu_s = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    requests = sum(int(s.get("requests", 0)) for s in server_stats) or stats["attempts"]
+    gen_wall = stats["wall_s"] or wall
+    result: Dict[str, Any] = {
+        "rows": stats["rows"],
+        "failed": stats["failed"],
+        "requests": requests,
+        "injected_errors": sum(int(s.get("errors", 0)) for s in server_stats),
+        "wall_s": round(wall, 3),
+        "gen_wall_s": round(gen_wall, 3),
+        "requests_per_s": round(requests / gen_wall, 2) if gen_wall else None,
+        "rows_per_s": stats["rows_per_s"],
+        "client_cpu_s": round(cpu_s, 3),
+        "client_cpu_ms_per_request": round(cpu_s * 1000 / requests, 3) if requests else None,
+        "client_max_rss_mb": round(after.ru_maxrss / 1024, 1),
+        "latency_p50_s": stats["latency_p50_s"],
+        "latency_p95_s": stats["latency_p95_s"],
+        "latency_p99_s": stats["latency_p99_s"],
+        "generate_args": gen_args,
+        "server": {k: v for k, v in vars(args).items() if k not in ("json", "baseline", "workdir")},
+    }
+    for line in proc.stdout.splitlines():
+        if line.startswith("[") and not line.startswith("[bench]"):
+            print(f"  {line}")
+
+    base: Dict[str, Any] = {}
+    if args.baseline:
+        base = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    print(
+        f"[bench] rows={result['rows']} failed={result['failed']} requests={requests} "
+        f"(injected errors={result['injected_errors']}) wall={wall:.2f}s"
+    )
+    print(f"[bench] requests/s={result['requests_per_s']}{_fmt_delta(result['requests_per_s'], base.get('requests_per_s'))}")
+    print(
+        f"[bench] client cpu={cpu_s:.2f}s ({result['client_cpu_ms_per_request']} ms/request"
+        f"{_fmt_delta(result['client_cpu_ms_per_request'], base.get('client_cpu_ms_per_request'))}, "
+        f"incl. interpreter start) max_rss={result['client_max_rss_mb']}MB"
+    )
+    print(
+        "[bench] latency "
+        + " ".join(
+            f"{q}={result[f'latency_{q}_s']:.3f}s{_fmt_delta(result[f'latency_{q}_s'], base.get(f'latency_{q}_s'))}"
+            for q in ("p50", "p95", "p99")
+        )
+    )
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(result, indent=2) + "\n", encoding="utf-8")
+        print(f"✅ bench result -> {args.json}")
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,19 @@ import re
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from ..align.markers import (
+    DEFAULT_MARKER_REGEX,
+    add_marker,
+    format_markers,
+    markers_in,
+    split_on_markers,
+    strip_markers,
+)
 from ..utils.jsonl import iter_jsonl, write_jsonl
 from ..utils.text import infer_order_field, join_with_sep, normalize_text
-from ..generation.vllm_openai import chat_completion, extract_text
+from ..utils.telemetry import REGISTRY, start_metrics_server
+from ..generation.cache import DEFAULT_CACHE_PATH, ResponseCache
+from ..generation.vllm_openai import GenerationClient, chat_completion, extract_text
 
 
 def _safe_json_loads(text: str) -> Dict[str, Any]:
@@ -75,6 +85,10 @@ def _build_doc_rows(
     doc_field: str,
     order_field: Optional[str],
     include_segment_ids: bool,
+    marker_template: Optional[str] = None,
+    marker_join: str = " ",
+    marker_fields: Optional[List[str]] = None,
+    keep_segments: bool = False,
 ) -> List[Dict[str, Any]]:
     doc_order, groups = _group_indices(rows, doc_field=doc_field, order_field=order_field)
     out_rows: List[Dict[str, Any]] = []
@@ -87,9 +101,20 @@ def _build_doc_rows(
             base[doc_field] = doc_id
             base["id"] = f"doc:{doc_id}"
 
+        markers = format_markers(marker_template, len(idxs)) if marker_template else []
         for field in fields:
             parts = [normalize_text(rows[i].get(field)) for i in idxs]
+            if markers and field in (marker_fields or []):
+                # Every segment keeps its marker, even when empty, so the
+                # marker count always equals segment_count.
+                parts = [add_marker(m, p, marker_join) for m, p in zip(markers, parts)]
             base[field] = join_with_sep(parts, sep)
+        if markers:
+            base["markers"] = markers
+        if keep_segments:
+            # Unmarked per-segment sources for evalmt-generate --doc-chunk-size.
+            base["source_segments"] = [normalize_text(rows[i].get("source")) for i in idxs]
+            base["segment_sep"] = sep
 
         base["segment_count"] = len(idxs)
         if include_segment_ids:
@@ -179,6 +204,10 @@ def cmd_to_doc(args: argparse.Namespace) -> None:
         doc_field=args.doc_field,
         order_field=args.order_field,
         include_segment_ids=args.include_segment_ids,
+        marker_template=args.marker_template,
+        marker_join=args.marker_join,
+        marker_fields=[f.strip() for f in args.marker_fields.split(",") if f.strip()],
+        keep_segments=args.keep_segments,
     )
 
     write_jsonl(out_path, doc_rows, append=False)
@@ -198,8 +227,8 @@ def cmd_expand(args: argparse.Namespace) -> None:
     if not doc_rows:
         raise ValueError(f"No rows in {doc_path}")
 
-        doc_field = args.doc_field
-        order_field = infer_order_field(base_rows, args.order_field)
+    doc_field = args.doc_field
+    order_field = infer_order_field(base_rows, args.order_field)
 
     doc_has_field = doc_field and any(r.get(doc_field) is not None for r in doc_rows)
     doc_map: Dict[Any, Dict[str, Any]] = {}
@@ -218,6 +247,13 @@ def cmd_expand(args: argparse.Namespace) -> None:
     align_spans: List[Optional[Tuple[int, int]]] = [None for _ in base_rows]
     align_low_conf: List[Optional[bool]] = [None for _ in base_rows]
 
+    # Marker/chunk pass: documents whose hypothesis kept every segment marker,
+    # and chunks generated with per-segment hypotheses, are split locally;
+    # only the rest need the alignment model.
+    pending: List[Tuple[List[int], str, str]] = []
+    marker_docs = 0
+    chunk_docs = 0
+    chunk_segments = 0
     for doc_idx, doc_id in enumerate(doc_order):
         idxs = groups[doc_id]
         if doc_has_field:
@@ -226,10 +262,68 @@ def cmd_expand(args: argparse.Namespace) -> None:
             doc_row = doc_rows[doc_idx] if doc_idx < len(doc_rows) else {}
 
         doc_hyp = normalize_text(doc_row.get(args.hyp_field))
-        if args.align_mode == "gpt":
-            if not args.align_api_base or not args.align_model_name:
-                raise ValueError("align_mode=gpt requires --align-api-base and --align-model-name")
+        chunks = doc_row.get("chunks") or []
+        if chunks and chunks[-1]["end"] == len(idxs):
+            # evalmt-generate --doc-chunk-size: split per chunk, align only
+            # the chunks whose segments are not known.
+            chunk_docs += 1
+            has_markers = bool(doc_row.get("markers"))
+            if has_markers:
+                doc_hyp = strip_markers(doc_hyp, args.marker_regex)
+            for c in chunks:
+                c_idxs = idxs[c["start"] : c["end"]]
+                seg_hyps = c.get("segment_hypotheses")
+                if seg_hyps is not None and len(seg_hyps) == len(c_idxs):
+                    for idx, hyp in zip(c_idxs, seg_hyps):
+                        sent_hyps[idx] = hyp
+                        doc_split_status[idx] = "chunk"
+                        doc_hyps[idx] = doc_hyp
+                    chunk_segments += len(c_idxs)
+                    continue
+                c_hyp = normalize_text(c.get("hypothesis"))
+                pending.append((c_idxs, strip_markers(c_hyp, args.marker_regex) if has_markers else c_hyp, doc_hyp))
+            continue
+        if args.splitter == "marker":
+            markers = doc_row.get("markers") or markers_in(str(doc_row.get("source", "")), args.marker_regex)
+            parts = split_on_markers(doc_hyp, markers, args.marker_regex) if len(markers) == len(idxs) else None
+            doc_hyp = strip_markers(doc_hyp, args.marker_regex)
+            if parts is not None:
+                for i, idx in enumerate(idxs):
+                    sent_hyps[idx] = parts[i]
+                    doc_split_status[idx] = "marker"
+                    doc_hyps[idx] = doc_hyp
+                marker_docs += 1
+                continue
+        pending.append((idxs, doc_hyp, doc_hyp))
+
+    REGISTRY.const_labels.update(doc=doc_path.name)
+    REGISTRY.set("evalmt_expand_docs_total", len(doc_order))
+    REGISTRY.counter("evalmt_expand_docs_done_total", "documents aligned")
+    REGISTRY.counter("evalmt_expand_fallbacks_total", "alignment calls retried without response_format")
+    REGISTRY.gauge("evalmt_expand_in_flight_requests", "alignment requests in flight")
+    REGISTRY.set("evalmt_expand_marker_docs", marker_docs)
+    REGISTRY.inc("evalmt_expand_docs_done_total", marker_docs)
+    if args.splitter == "marker":
+        print(f"[markers] split {marker_docs}/{len(doc_order)} docs by segment markers; {len(pending)} need LLM alignment")
+    if chunk_docs:
+        print(f"[chunks] {chunk_segments}/{len(base_rows)} segments taken from chunk provenance")
+    if pending and (not args.align_api_base or not args.align_model_name):
+        what = f"{len(pending)} docs/chunks without known segments" if args.splitter == "marker" or chunk_docs else "align_mode=gpt"
+        raise ValueError(f"{what} require --align-api-base and --align-model-name")
+
+    # One event loop + pooled client for all alignment calls of this file.
+    loop = asyncio.new_event_loop()
+    client: Optional[GenerationClient] = None
+    if pending:
+        cache = None if args.no_cache else ResponseCache(Path(args.cache_path))
+        client = GenerationClient(max_connections=1, http2=args.http2, cache=cache)
+        REGISTRY.sample(
+            "evalmt_expand_requests_total", lambda: client.stats.requests, "alignment HTTP requests", kind="counter"
+        )
+    start_metrics_server(args.metrics_port)
 
+    try:
+        for idxs, hyp_text, doc_hyp in pending:
             src_sents = [base_rows[i].get("source", "") for i in idxs]
 
             system = (
@@ -241,7 +335,7 @@ def cmd_expand(args: argparse.Namespace) -> None:
                 "Keep monotonic order. "
                 "If you cannot find content, use empty string for hyp."
             )
-            user = json.dumps({"src_sents": src_sents, "hyp_text": doc_hyp}, ensure_ascii=False)
+            user = json.dumps({"src_sents": src_sents, "hyp_text": hyp_text}, ensure_ascii=False)
 
             schema = {
                 "type": "object",
@@ -266,27 +360,34 @@ def cmd_expand(args: argparse.Namespace) -> None:
                 response_format = {"type": "json_schema", "json_schema": {"name": "alignment", "schema": schema}}
 
             async def _run(fmt: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-                return await chat_completion(
-                    api_base=args.align_api_base,
-                    model=args.align_model_name,
-                    messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
-                    temperature=args.align_temperature,
-                    top_p=1.0,
-                    max_tokens=args.align_max_tokens,
-                    response_format=fmt,
-                )
+                REGISTRY.set("evalmt_expand_in_flight_requests", 1)
+                try:
+                    return await chat_completion(
+                        api_base=args.align_api_base,
+                        model=args.align_model_name,
+                        messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+                        temperature=args.align_temperature,
+                        top_p=1.0,
+                        max_tokens=args.align_max_tokens,
+                        response_format=fmt,
+                        client=client,
+                    )
+                finally:
+                    REGISTRY.set("evalmt_expand_in_flight_requests", 0)
 
             try:
-                resp = asyncio.run(_run(response_format))
+                resp = loop.run_until_complete(_run(response_format))
             except Exception:
-                resp = asyncio.run(_run(None))
+                REGISTRY.inc("evalmt_expand_fallbacks_total")
+                resp = loop.run_until_complete(_run(None))
 
             text = extract_text(resp)
             try:
                 data = _safe_json_loads(text)
             except Exception:
                 if response_format:
-                    resp = asyncio.run(_run(None))
+                    REGISTRY.inc("evalmt_expand_fallbacks_total")
+                    resp = loop.run_until_complete(_run(None))
                     text = extract_text(resp)
                     data = _safe_json_loads(text)
                 else:
@@ -301,8 +402,14 @@ def cmd_expand(args: argparse.Namespace) -> None:
                 sent_hyps[idx] = (row.get("hyp") if row else "") or ""
                 doc_split_status[idx] = "gpt"
                 doc_hyps[idx] = doc_hyp
-        else:
-            raise ValueError("align_mode must be 'gpt' (LLM-only alignment is enforced)")
+            REGISTRY.inc("evalmt_expand_docs_done_total")
+    finally:
+        if client is not None:
+            loop.run_until_complete(client.aclose())
+            print(f"[pool] {client.stats.summary()}")
+            if client.cache is not None:
+                print(f"[cache] {client.cache.summary()}")
+        loop.close()
 
     out_rows: List[Dict[str, Any]] = []
     for i, r in enumerate(base_rows):
@@ -332,20 +439,54 @@ def cmd_clean(args: argparse.Namespace) -> None:
         raise ValueError(f"No rows in {in_path}")
 
     fields = [f.strip() for f in args.fields.split(",") if f.strip()]
-    rx = None
+    rx = args.marker_regex or None
 
     out_rows: List[Dict[str, Any]] = []
     for r in rows:
         rr = dict(r)
         for f in fields:
             if f in rr and isinstance(rr[f], str) and rx:
-                rr[f] = re.sub(rx, "", rr[f]).strip()
+                rr[f] = strip_markers(rr[f], rx)
         out_rows.append(rr)
 
     write_jsonl(out_path, out_rows, append=False)
     print(f"✅ cleaned jsonl -> {out_path} (rows={len(out_rows)})")
 
 
+def cmd_sync_raw(args: argparse.Namespace) -> None:
+    """Bring the marked copy (``--raw``) up to date with the generate output (``--gen``).
+
+    ``clean`` rebuilds the generate output from the raw copy, so rows that
+    generate appended after the last clean (resume, ``--retry-failed``) must
+    reach the raw copy first: rows whose id is not in it, or that still carry
+    markers (not cleaned yet), are taken from the generate output.
+    """
+
+    gen_path = Path(args.gen)
+    raw_path = Path(args.raw)
+    fields = [f.strip() for f in args.fields.split(",") if f.strip()]
+    rx = args.marker_regex
+
+    raw_rows = list(iter_jsonl(raw_path)) if raw_path.exists() else []
+    pos = {r.get("id"): i for i, r in enumerate(raw_rows)}
+    added = replaced = 0
+    for r in iter_jsonl(gen_path):
+        i = pos.get(r.get("id"))
+        if i is None:
+            pos[r.get("id")] = len(raw_rows)
+            raw_rows.append(r)
+            added += 1
+        elif any(isinstance(r.get(f), str) and markers_in(r[f], rx) for f in fields):
+            raw_rows[i] = r
+            replaced += 1
+
+    if added or replaced:
+        tmp = raw_path.with_name(raw_path.name + ".tmp")
+        write_jsonl(tmp, raw_rows, append=False)
+        tmp.replace(raw_path)
+    print(f"✅ synced raw jsonl -> {raw_path} (rows={len(raw_rows)} added={added} replaced={replaced})")
+
+
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser()
     sub = p.add_subparsers(dest="cmd", required=True)
@@ -358,6 +499,18 @@ def parse_args() -> argparse.Namespace:
     p_doc.add_argument("--order-field", default=None)
     p_doc.add_argument("--fields", default=None, help="comma-separated fields to concat")
     p_doc.add_argument("--include-segment-ids", action="store_true")
+    p_doc.add_argument(
+        "--marker-template",
+        default=None,
+        help="prefix every segment with a numbered marker, e.g. '⟦{i}⟧' (stored as 'markers' on the doc row)",
+    )
+    p_doc.add_argument("--marker-join", default=" ", help="text between a marker and its segment")
+    p_doc.add_argument("--marker-fields", default="source", help="comma-separated fields that get markers")
+    p_doc.add_argument(
+        "--keep-segments",
+        action="store_true",
+        help="also store 'source_segments' and 'segment_sep' (needed by evalmt-generate --doc-chunk-size)",
+    )
 
     p_exp = sub.add_parser("expand")
     p_exp.add_argument("--base", required=True, help="sentence-level base jsonl")
@@ -367,8 +520,14 @@ def parse_args() -> argparse.Namespace:
     p_exp.add_argument("--doc-field", default="document_id")
     p_exp.add_argument("--order-field", default=None)
     p_exp.add_argument("--hyp-field", default="hypothesis")
-    p_exp.add_argument("--splitter", choices=["auto", "sep", "regex"], default="auto")
+    p_exp.add_argument(
+        "--splitter",
+        choices=["auto", "sep", "regex", "marker"],
+        default="auto",
+        help="marker: split on the segment markers kept by the model; only docs that lost them go to LLM alignment",
+    )
     p_exp.add_argument("--regex", default=None)
+    p_exp.add_argument("--marker-regex", default=DEFAULT_MARKER_REGEX)
     p_exp.add_argument("--add-doc-hyp", action="store_true")
     p_exp.add_argument("--align-mode", choices=["gpt"], default="gpt")
     p_exp.add_argument("--align-meta", action="store_true")
@@ -377,11 +536,22 @@ def parse_args() -> argparse.Namespace:
     p_exp.add_argument("--align-temperature", type=float, default=0.0)
     p_exp.add_argument("--align-max-tokens", type=int, default=64000)
     p_exp.add_argument("--align-response-format", choices=["none", "json_schema"], default="none")
+    p_exp.add_argument("--http2", action="store_true", help="use HTTP/2 for the alignment client (needs 'h2')")
+    p_exp.add_argument("--no-cache", action="store_true", help="do not read/write the response cache")
+    p_exp.add_argument("--cache-path", default=str(DEFAULT_CACHE_PATH))
+    p_exp.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus /metrics on this local port")
 
     p_clean = sub.add_parser("clean")
     p_clean.add_argument("--input", required=True)
     p_clean.add_argument("--output", required=True)
     p_clean.add_argument("--fields", default="source,reference,hypothesis")
+    p_clean.add_argument("--marker-regex", default=DEFAULT_MARKER_REGEX, help="segment markers to remove")
+
+    p_sync = sub.add_parser("sync-raw")
+    p_sync.add_argument("--gen", required=True, help="generate output (cleaned in place by 'clean')")
+    p_sync.add_argument("--raw", required=True, help="marked copy kept for 'expand --splitter marker'")
+    p_sync.add_argument("--fields", default="source,reference,hypothesis", help="fields checked for markers")
+    p_sync.add_argument("--marker-regex", default=DEFAULT_MARKER_REGEX)
 
     return p.parse_args()
 
@@ -394,6 +564,8 @@ def main() -> None:
         cmd_expand(args)
     elif args.cmd == "clean":
         cmd_clean(args)
+    elif args.cmd == "sync-raw":
+        cmd_sync_raw(args)
     else:
         raise SystemExit(f"Unknown cmd: {args.cmd}")
 
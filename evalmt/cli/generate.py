@@ -4,31 +4,164 @@ import argparse
 import asyncio
 import json
 import os
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Set
+from typing import Any, Dict, Iterator, List, Optional, Set
 
+import httpx
 from tqdm import tqdm
 
+from ..align.markers import DEFAULT_MARKER_REGEX, add_marker, split_on_markers, strip_markers
 from ..config import ROOT, ensure_dir, load_dataset_config, load_model_config
+from ..generation.prompt_store import PromptStore
 from ..generation.prompts import (
     language_name_from_code,
     region_name_from_code,
     split_lang_pair,
 )
-from ..generation.vllm_openai import chat_completion, clean_translation, extract_text
-from ..utils.jsonl import iter_jsonl
+from ..generation.abort import ABORT_DETECTORS, ABORT_FINISH_REASON, AbortMonitor, build_detectors
+from ..generation.budget import TokenBudget
+from ..generation.cache import DEFAULT_CACHE_PATH, ResponseCache
+from ..generation.chunking import chunk_spans, context_instruction, gather_or_cancel, target_context
+from ..generation.checkpoint import CheckpointedWriter, CompactIdSet, DeadLetter, failed_path, recover_checkpoint
+from ..generation.concurrency import ConcurrencyLimiter, percentile
+from ..generation.hedging import HedgePolicy
+from ..generation.router import ROUTER_POLICIES, EndpointRouter, parse_api_bases
+from ..generation.scheduling import (
+    DISPATCH_ORDERS,
+    LengthIndex,
+    char_length,
+    dispatch_plan,
+    iter_planned_rows,
+    tail_summary,
+    tokenizer_length,
+)
+from ..generation.stats import RunStats, gen_stats_path
+from ..generation.vllm_openai import (
+    GenerationClient,
+    RequestFailed,
+    clean_translation,
+    extract_finish_reason,
+    extract_finish_reasons,
+    extract_text,
+    extract_texts,
+)
+from ..generation.writer import BackgroundWriter, ReorderBuffer
+from ..utils.jsonl import count_lines, iter_jsonl
 from ..utils.lang_codes import apply_lang_code_map
+from ..utils.text import join_with_sep
+from ..utils.net import scrape_prometheus_gauge
+from ..utils.telemetry import REGISTRY, start_metrics_server
+
+VLLM_WAITING_GAUGE = "vllm:num_requests_waiting"
 
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser()
     p.add_argument("--run", required=True)
-    p.add_argument("--dataset", required=True)
-    p.add_argument("--lp", required=True)
+    p.add_argument("--dataset", "--datasets", dest="dataset", required=True, help="dataset key(s), comma-separated")
+    p.add_argument("--lp", "--lps", dest="lp", required=True, help="all | comma- or space-separated list of LPs")
     p.add_argument("--model", required=True)
-    p.add_argument("--api-base", required=True)
-    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument(
+        "--api-base",
+        required=True,
+        help="OpenAI-compatible base URL; comma-separated list to balance over replicas",
+    )
+    p.add_argument("--router", choices=list(ROUTER_POLICIES), default="least-outstanding")
+    p.add_argument("--health-interval", type=float, default=10.0, help="seconds between /v1/models probes")
+    p.add_argument("--concurrency", type=int, default=16, help="in-flight request limit (initial if adaptive)")
+    p.add_argument("--adaptive-concurrency", action="store_true", help="resize the limit at runtime (AIMD)")
+    p.add_argument("--min-concurrency", type=int, default=1)
+    p.add_argument("--max-concurrency", type=int, default=None, help="default: 4x --concurrency when adaptive")
+    p.add_argument("--target-p95", type=float, default=None, help="shrink when request p95 latency exceeds this (s)")
+    p.add_argument("--aimd-interval", type=float, default=5.0, help="seconds between controller decisions")
+    p.add_argument(
+        "--scrape-queue",
+        action="store_true",
+        help="read vllm:num_requests_waiting from each server's /metrics to steer the controller",
+    )
+    p.add_argument("--window-factor", type=int, default=2, help="queued row tasks per in-flight slot")
     p.add_argument("--resume", action="store_true")
+    p.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="only regenerate rows recorded in <model>.failed.jsonl by the previous run (implies --resume)",
+    )
+    p.add_argument(
+        "--ordered-output",
+        action="store_true",
+        help="write rows in input order (bounded reorder buffer) instead of completion order",
+    )
+    p.add_argument("--reorder-window", type=int, default=1024, help="max rows held for --ordered-output")
+    p.add_argument(
+        "--store-messages",
+        action="store_true",
+        help="embed the full chat messages in every row instead of a prompt_ref into <model>.prompts.jsonl",
+    )
+    p.add_argument(
+        "--dispatch-order",
+        choices=list(DISPATCH_ORDERS),
+        default="file",
+        help="longest-first/bucketed send long rows early so the batch stays full until the end",
+    )
+    p.add_argument("--length-estimator", choices=["chars", "tokenizer"], default="chars")
+    p.add_argument("--length-buckets", type=int, default=8, help="number of buckets for --dispatch-order bucketed")
+    p.add_argument(
+        "--token-budget",
+        action="store_true",
+        help="per-row max_tokens from the per-LP output/source length ratio learned from outputs/<run>/gen",
+    )
+    p.add_argument("--budget-multiplier", type=float, default=2.0, help="safety multiplier on the learned ratio")
+    p.add_argument("--budget-quantile", type=float, default=99.0, help="percentile of observed ratios to use")
+    p.add_argument("--budget-min-tokens", type=int, default=256, help="constant headroom added to every budget")
+    p.add_argument(
+        "--no-budget-retry",
+        action="store_true",
+        help="only flag rows truncated by the budget (budget_truncated=true) instead of retrying with the config max_tokens",
+    )
+    p.add_argument(
+        "--n",
+        type=int,
+        default=None,
+        help="candidates per row in one request (overrides generation_defaults.n); >1 stores 'candidates' for evalmt-rerank",
+    )
+    p.add_argument("--best-of", type=int, default=None, help="overrides generation_defaults.best_of (vLLM builds that support it)")
+    p.add_argument(
+        "--doc-chunk-size",
+        type=int,
+        default=0,
+        help="translate doc rows built with 'docops to-doc --keep-segments' K segments per request (0: whole document)",
+    )
+    p.add_argument("--chunk-context-src", type=int, default=0, help="previous source segments shown with each chunk")
+    p.add_argument(
+        "--chunk-context-tgt",
+        type=int,
+        default=0,
+        help="previous translated segments shown with each chunk (>0 makes the chunks of one document sequential)",
+    )
+    p.add_argument("--stream", action="store_true", help="stream completions (SSE) and record TTFT / inter-token latency")
+    p.add_argument(
+        "--abort-on",
+        default="",
+        help=f"comma list of runaway-output detectors for --stream ({', '.join(ABORT_DETECTORS)})",
+    )
+    p.add_argument("--abort-max-ratio", type=float, default=4.0, help="length-ratio detector: max output/source chars")
+    p.add_argument(
+        "--hedge",
+        action="store_true",
+        help="send a duplicate to another endpoint when a request outlives the latency percentile; first answer wins",
+    )
+    p.add_argument("--hedge-quantile", type=float, default=95.0, help="latency percentile that triggers a hedge")
+    p.add_argument("--hedge-min-delay", type=float, default=1.0, help="never hedge before this many seconds")
+    p.add_argument("--hedge-budget", type=float, default=0.05, help="max hedges as a fraction of requests")
+    p.add_argument("--hedge-max-in-flight", type=int, default=4, help="max concurrent hedge requests")
+    p.add_argument("--http2", action="store_true", help="use HTTP/2 for the pooled client (needs 'h2')")
+    p.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    p.add_argument("--no-cache", action="store_true", help="do not read/write the response cache")
+    p.add_argument("--cache-path", default=str(DEFAULT_CACHE_PATH))
+    p.add_argument("--cache-max-mb", type=int, default=2048, help="evict LRU entries above this size")
+    p.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus /metrics on this local port")
     return p.parse_args()
 
 
@@ -47,6 +180,11 @@ UNIFIED_SYSTEM_TEMPLATE = (
 UNIFIED_USER_TEMPLATE = (
     "Please translate the following {source_lang} text into {target_lang}:\n\n\n{text}"
 )
+# Added for doc rows built with `docops to-doc --marker-template` (row["markers"]).
+MARKER_INSTRUCTION = (
+    "The text is split into segments, each starting with a marker such as {first}. "
+    "Copy every marker unchanged, exactly once and in the same order, in front of the translation of its segment."
+)
 
 
 def _format_prompt(
@@ -56,6 +194,7 @@ def _format_prompt(
     sys_tmpl: str,
     usr_tmpl: str,
     merge_system: bool,
+    instruction: str = "",
 ) -> tuple[str, str]:
     if prompt_style == "custom":
         system = sys_tmpl.format(**fmt) if sys_tmpl else ""
@@ -63,165 +202,765 @@ def _format_prompt(
     else:
         system = UNIFIED_SYSTEM_TEMPLATE.format(**fmt)
         user = UNIFIED_USER_TEMPLATE.format(**fmt)
+    if instruction:
+        if system.strip():
+            system = f"{system}\n{instruction}"
+        else:
+            user = f"{instruction}\n\n{user}"
     if merge_system and system.strip():
         user = f"{system}\n{user}"
         system = ""
     return system, user
 
 
+class PromptBuilder:
+    """Renders the chat `messages` for one row according to the model config."""
+
+    def __init__(self, model_key: str, model_cfg: Dict[str, Any]) -> None:
+        prompt_cfg = model_cfg.get("prompt", {})
+        self.message_format = str(model_cfg.get("message_format", "simple")).lower()
+        self.message_content_type = str(model_cfg.get("message_content_type", "text")).lower()
+        self.sys_tmpl = prompt_cfg.get("system") or ""
+        self.usr_tmpl = prompt_cfg.get("user") or "{source}"
+        self.prompt_style = str(model_cfg.get("prompt_style", "unified")).lower()
+        hf_id = str(model_cfg.get("hf_model_id", "")).lower()
+        is_gemma = "gemma" in hf_id or "gemma" in str(model_key).lower()
+        self.no_system_prompt = bool(model_cfg.get("no_system_prompt", is_gemma))
+        self.lang_code_map: Dict[str, str] = {}
+        if self.message_format == "translategemma":
+            lang_code_map = model_cfg.get("translategemma_lang_code_map", {}) or {}
+            if not isinstance(lang_code_map, dict):
+                raise ValueError("translategemma_lang_code_map must be a dict in model config")
+            env_map = os.environ.get("TRANSLATEGEMMA_LANG_CODE_MAP")
+            if env_map:
+                try:
+                    env_data = json.loads(env_map)
+                except json.JSONDecodeError as exc:
+                    raise ValueError("TRANSLATEGEMMA_LANG_CODE_MAP must be valid JSON") from exc
+                if isinstance(env_data, dict):
+                    lang_code_map = {**lang_code_map, **env_data}
+                else:
+                    raise ValueError("TRANSLATEGEMMA_LANG_CODE_MAP must be a JSON object")
+            self.lang_code_map = lang_code_map
+
+    @staticmethod
+    def row_lang_codes(row: Dict[str, Any], lp: str) -> tuple[str, str]:
+        row_src = (row.get("source_lang_code") or "").strip()
+        row_tgt = (row.get("target_lang_code") or "").strip()
+        if row_src and row_tgt:
+            return row_src, row_tgt
+        lp_val = (row.get("lp") or lp or "").strip()
+        if lp_val and "-" in lp_val:
+            return split_lang_pair(lp_val)
+        return row_src, row_tgt
+
+    def messages(self, row: Dict[str, Any], lp: str, *, context: str = "") -> List[Dict[str, str]]:
+        row_src, row_tgt = self.row_lang_codes(row, lp)
+        if self.message_format == "translategemma":
+            if self.lang_code_map:
+                row_src = apply_lang_code_map(row_src, self.lang_code_map)
+                row_tgt = apply_lang_code_map(row_tgt, self.lang_code_map)
+            tagged = f"<<<source>>>{row_src}<<<target>>>{row_tgt}<<<text>>>{row['source']}"
+            return [{"role": "user", "content": tagged}]
+
+        src_lang = language_name_from_code(row_src)
+        tgt_lang = language_name_from_code(row_tgt)
+        tgt_region = region_name_from_code(row_tgt)
+        fmt = {
+            "source": row["source"],
+            "text": row["source"],
+            "source_lang": src_lang,
+            "src_lang_code": row_src,
+            "target_lang": tgt_lang,
+            "tgt_lang_code": row_tgt,
+            "target_language": tgt_lang,
+            "target_region": tgt_region,
+        }
+        instructions = []
+        if row.get("markers"):
+            instructions.append(MARKER_INSTRUCTION.format(first=row["markers"][0]))
+        if context:
+            instructions.append(context)
+        system, user = _format_prompt(
+            fmt,
+            prompt_style=self.prompt_style,
+            sys_tmpl=self.sys_tmpl,
+            usr_tmpl=self.usr_tmpl,
+            merge_system=self.no_system_prompt,
+            instruction="\n".join(instructions),
+        )
+        messages = []
+        if system.strip():
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": user})
+        return messages
+
+
+def _split_list(value: str) -> List[str]:
+    # Commas and/or whitespace, like pipeline_list_lps (LPS="en-ko_KR en-ja_JP").
+    return value.replace(",", " ").split()
+
+
+def _normalize_lp(lp: str) -> str:
+    while lp.endswith(".jsonl"):
+        lp = lp[: -len(".jsonl")]
+    return lp
+
+
+@dataclass
+class GenJob:
+    """One (dataset, lp) input file and its generation output."""
+
+    dataset: str
+    lp: str
+    in_path: Path
+    out_path: Path
+    done: CompactIdSet = field(default_factory=CompactIdSet)
+    in_flight: int = 0
+    exhausted: bool = False
+    writer: Optional[CheckpointedWriter] = None
+    reorder: Optional[ReorderBuffer] = None
+    dead: Optional[DeadLetter] = None
+    prompts: Optional[PromptStore] = None
+    only_ids: Optional[Set[Any]] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.dataset}/{self.lp}"
+
+    def open(self, *, resume: bool, retry_failed: bool = False, store_messages: bool = False) -> int:
+        """Recover the checkpoint, open the writers; returns rows already done."""
+
+        done, n_done = recover_checkpoint(self.out_path)
+        if resume:
+            self.done = done
+        self.writer = CheckpointedWriter(self.out_path)
+        self.dead = DeadLetter(self.out_path)
+        if not store_messages:
+            self.prompts = PromptStore(self.out_path)
+        if retry_failed:
+            previous = self.dead.previous_ids()
+            if previous is None:
+                print(f"⚠️  {self.name}: no {self.dead.path.name} to retry; nothing to do")
+            self.only_ids = previous or set()
+        return n_done if resume else 0
+
+    def wants(self, row_id: Any) -> bool:
+        if row_id in self.done:
+            return False
+        return self.only_ids is None or row_id in self.only_ids
+
+    def pending_rows(self) -> Iterator[Dict[str, Any]]:
+        """Lazily yield input rows that still need a generation."""
+
+        for r in iter_jsonl(self.in_path):
+            if self.wants(r.get("id")):
+                yield r
+
+
+def resolve_jobs(run: str, datasets: List[str], lps_arg: str, model: str) -> List[GenJob]:
+    jobs: List[GenJob] = []
+    for dataset in datasets:
+        ds_cfg = load_dataset_config(dataset)
+        prepared_dir = Path(ds_cfg.get("prepared_dir", f"data/{dataset}"))
+        if lps_arg == "all":
+            lps = sorted(p.stem for p in prepared_dir.glob("*.jsonl"))
+            if not lps:
+                raise FileNotFoundError(f"No prepared LPs in {prepared_dir}")
+        else:
+            lps = [_normalize_lp(lp) for lp in _split_list(lps_arg)]
+        for lp in lps:
+            in_path = prepared_dir / f"{lp}.jsonl"
+            if not in_path.exists():
+                raise FileNotFoundError(f"Prepared dataset not found: {in_path}")
+            jobs.append(
+                GenJob(
+                    dataset=dataset,
+                    lp=lp,
+                    in_path=in_path,
+                    out_path=out_gen_path(run, dataset, lp, model),
+                )
+            )
+    return jobs
+
+
 async def main_async() -> None:
     args = parse_args()
-    ds_cfg = load_dataset_config(args.dataset)
+    if args.retry_failed:
+        args.resume = True
+    if args.ordered_output and args.dispatch_order != "file":
+        raise SystemExit("--ordered-output requires --dispatch-order file")
+    abort_names = _split_list(args.abort_on)
+    if abort_names and not args.stream:
+        raise SystemExit("--abort-on requires --stream")
+    detectors = build_detectors(abort_names, max_ratio=args.abort_max_ratio)
     model_cfg = load_model_config(args.model)
-
-    prepared_dir = Path(ds_cfg.get("prepared_dir", f"data/{args.dataset}"))
-    in_path = prepared_dir / f"{args.lp}.jsonl"
-    if not in_path.exists():
-        raise FileNotFoundError(f"Prepared dataset not found: {in_path}")
-
-    out_path = out_gen_path(args.run, args.dataset, args.lp, args.model)
-    ensure_dir(out_path.parent)
-
-    done_ids: Set[str] = set()
-    if args.resume and out_path.exists():
-        for r in iter_jsonl(out_path):
-            done_ids.add(r.get("id"))
+    jobs = resolve_jobs(args.run, _split_list(args.dataset), args.lp, args.model)
+    if args.retry_failed and not any(failed_path(job.out_path).exists() for job in jobs):
+        raise SystemExit("--retry-failed: no <model>.failed.jsonl for these jobs; nothing to retry")
 
     served = model_cfg.get("served_model_name", model_cfg["hf_model_id"])
-    prompt_cfg = model_cfg.get("prompt", {})
-    message_format = str(model_cfg.get("message_format", "simple")).lower()
-    message_content_type = str(model_cfg.get("message_content_type", "text")).lower()
-    sys_tmpl = prompt_cfg.get("system") or ""
-    usr_tmpl = prompt_cfg.get("user") or "{source}"
-    prompt_style = str(model_cfg.get("prompt_style", "unified")).lower()
-    hf_id = str(model_cfg.get("hf_model_id", "")).lower()
-    model_key = str(args.model).lower()
-    is_gemma = "gemma" in hf_id or "gemma" in model_key
-    no_system_prompt = bool(model_cfg.get("no_system_prompt", is_gemma))
-    src_code, tgt_code = ("", "")
-    lang_code_map: Dict[str, str] = {}
-    if message_format == "translategemma":
-        src_code, tgt_code = split_lang_pair(args.lp)
-        lang_code_map = model_cfg.get("translategemma_lang_code_map", {}) or {}
-        if not isinstance(lang_code_map, dict):
-            raise ValueError("translategemma_lang_code_map must be a dict in model config")
-        env_map = os.environ.get("TRANSLATEGEMMA_LANG_CODE_MAP")
-        if env_map:
-            try:
-                env_data = json.loads(env_map)
-            except json.JSONDecodeError as exc:
-                raise ValueError("TRANSLATEGEMMA_LANG_CODE_MAP must be valid JSON") from exc
-            if isinstance(env_data, dict):
-                lang_code_map = {**lang_code_map, **env_data}
-            else:
-                raise ValueError("TRANSLATEGEMMA_LANG_CODE_MAP must be a JSON object")
+    prompts = PromptBuilder(args.model, model_cfg)
 
     gen_defaults = model_cfg.get("generation_defaults", {})
     temperature = float(gen_defaults.get("temperature", 0.0))
     top_p = float(gen_defaults.get("top_p", 1.0))
     max_tokens = int(gen_defaults.get("max_tokens", 256))
     stop = gen_defaults.get("stop", None)
-
-    rows = [r for r in iter_jsonl(in_path) if r.get("id") not in done_ids]
-
-    sem = asyncio.Semaphore(args.concurrency)
-
-    def _row_lang_codes(row: Dict[str, Any]) -> tuple[str, str]:
-        row_src = (row.get("source_lang_code") or "").strip()
-        row_tgt = (row.get("target_lang_code") or "").strip()
-        if row_src and row_tgt:
-            return row_src, row_tgt
-        lp_val = (row.get("lp") or args.lp or "").strip()
-        if lp_val and "-" in lp_val:
-            return split_lang_pair(lp_val)
-        return row_src or src_code, row_tgt or tgt_code
-
-    async def run_one(r: Dict[str, Any]) -> Dict[str, Any]:
-        async with sem:
-            row_src, row_tgt = _row_lang_codes(r)
-            src_lang = language_name_from_code(row_src)
-            tgt_lang = language_name_from_code(row_tgt)
-            tgt_region = region_name_from_code(row_tgt)
-            fmt = {
-                "source": r["source"],
-                "text": r["source"],
-                "source_lang": src_lang,
-                "src_lang_code": row_src,
-                "target_lang": tgt_lang,
-                "tgt_lang_code": row_tgt,
-                "target_language": tgt_lang,
-                "target_region": tgt_region,
+    n = int(args.n or gen_defaults.get("n", 1))
+    best_of = args.best_of or gen_defaults.get("best_of")
+    if n > 1 and args.stream:
+        raise SystemExit("--stream supports a single candidate per row only (n=1)")
+    if n > 1 and temperature == 0.0:
+        print(f"⚠️  n={n} with temperature=0 will return {n} identical candidates")
+    if args.doc_chunk_size < 0:
+        raise SystemExit("--doc-chunk-size must be >= 0")
+    if args.doc_chunk_size and n > 1:
+        raise SystemExit("--doc-chunk-size supports a single candidate per row only (n=1)")
+    if args.doc_chunk_size and prompts.message_format == "translategemma" and (args.chunk_context_src or args.chunk_context_tgt):
+        print("⚠️  translategemma message format has no room for chunk context; chunks are translated without it")
+
+    budget: Optional[TokenBudget] = None
+    if args.token_budget:
+        budget = TokenBudget(
+            max_tokens,
+            multiplier=args.budget_multiplier,
+            quantile=args.budget_quantile,
+            min_tokens=args.budget_min_tokens,
+        )
+        for lp in sorted({j.lp for j in jobs}):
+            seeded = budget.learn_files(lp, sorted((ROOT / "outputs" / args.run / "gen").glob(f"*/{lp}/{args.model}.jsonl")))
+            print(f"[budget] {lp}: seeded from {seeded} previous rows")
+
+    ttfts: List[float] = []
+    itls: List[float] = []
+    aborted: Dict[str, int] = {}
+    marker_rows = {"kept": 0, "lost": 0}
+    chunked = {"docs": 0, "chunks": 0, "whole": 0}
+
+    run_stats = RunStats(args.model)
+    stats_path = gen_stats_path(ROOT / "outputs" / args.run / "gen", args.model)
+
+    async def generate(messages: List[Dict[str, str]], row_max_tokens: int, source: str) -> Dict[str, Any]:
+        return await client.chat_completion(
+            model=served,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=row_max_tokens,
+            stop=stop if stop else None,
+            timeout_s=args.timeout,
+            stream=args.stream,
+            abort=AbortMonitor(detectors, source) if detectors else None,
+            n=n,
+            best_of=int(best_of) if best_of else None,
+        )
+
+    async def run_one(
+        job: GenJob, seq: int, r: Dict[str, Any]
+    ) -> tuple[GenJob, int, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Generate one row; a row whose request still fails after retries becomes a dead-letter record.
+
+        Only request failures are recorded; any other exception is a bug and
+        stops the run.
+        """
+
+        try:
+            if args.doc_chunk_size and r.get("source_segments"):
+                return job, seq, await generate_doc_chunked(job, r), None
+            if args.doc_chunk_size and r.get("segment_count"):
+                chunked["whole"] += 1
+            return job, seq, await generate_row(job, r), None
+        except (RequestFailed, httpx.RequestError, httpx.HTTPStatusError) as exc:
+            failure = {
+                "id": r.get("id"),
+                "dataset": job.dataset,
+                "lp": job.lp,
+                "model": args.model,
+                "error_type": type(exc.__cause__ or exc).__name__,
+                "error": str(exc).splitlines()[0] if str(exc) else "",
+                "status": getattr(exc, "status", None),
+                "attempts": getattr(exc, "attempts", 1),
+                "ts": time.time(),
             }
-            if message_format == "translategemma":
-                if lang_code_map:
-                    row_src = apply_lang_code_map(row_src, lang_code_map)
-                    row_tgt = apply_lang_code_map(row_tgt, lang_code_map)
-                tagged = f"<<<source>>>{row_src}<<<target>>>{row_tgt}<<<text>>>{r['source']}"
-                messages = [{"role": "user", "content": tagged}]
-            else:
-                system, user = _format_prompt(
-                    fmt,
-                    prompt_style=prompt_style,
-                    sys_tmpl=sys_tmpl,
-                    usr_tmpl=usr_tmpl,
-                    merge_system=no_system_prompt,
-                )
-                messages = []
-                if system.strip():
-                    messages.append({"role": "system", "content": system})
-                messages.append({"role": "user", "content": user})
-            resp = await chat_completion(
-                api_base=args.api_base,
-                model=served,
-                messages=messages,
-                temperature=temperature,
-                top_p=top_p,
-                max_tokens=max_tokens,
-                stop=stop if stop else None,
+            return job, seq, None, failure
+
+    async def complete(
+        job: GenJob, messages: List[Dict[str, str]], source: str
+    ) -> tuple[Dict[str, Any], int, float, Optional[str]]:
+        """One budgeted request; returns (response, max_tokens, latency_s, budget_flag).
+
+        ``budget_flag`` is the row field to set when the learned budget cut the
+        first attempt: ``budget_retried`` if it was regenerated with the full
+        cap, ``budget_truncated`` if the cut output is kept (--no-budget-retry).
+        """
+
+        row_max_tokens = budget.for_row(job.lp, source) if budget is not None else max_tokens
+        resp = await generate(messages, row_max_tokens, source)
+        latency_s = resp["meta"]["latency_s"]
+
+        # A row cut off by the learned budget (not by the config cap) is
+        # flagged and, unless disabled, regenerated once with the full cap.
+        budget_flag: Optional[str] = None
+        if budget is not None and "length" in extract_finish_reasons(resp) and row_max_tokens < max_tokens:
+            budget.truncated += 1
+            budget_flag = "budget_truncated"
+            if not args.no_budget_retry:
+                budget.retried += 1
+                budget_flag = "budget_retried"
+                row_max_tokens = max_tokens
+                resp = await generate(messages, row_max_tokens, source)
+                latency_s += resp["meta"]["latency_s"]
+        if budget is not None:
+            # usage counts the tokens of all n candidates; the budget is per candidate.
+            completion_tokens = (resp.get("usage") or {}).get("completion_tokens")
+            budget.observe(
+                job.lp,
+                source,
+                completion_tokens / n if completion_tokens else len(extract_text(resp)),
+                truncated=any(f in ("length", ABORT_FINISH_REASON) for f in extract_finish_reasons(resp)),
             )
-            text = clean_translation(extract_text(resp))
-
-            out = dict(r)
-            out.update(
-                {
-                    "model": args.model,
-                    "served_model": served,
-                    "hypothesis": text,
-                    "messages": messages,
-                    "gen_params": {
-                        "temperature": temperature,
-                        "top_p": top_p,
-                        "max_tokens": max_tokens,
-                        "stop": stop,
-                    },
-                }
+        timing = resp.get("timing")
+        if timing is not None:
+            if timing.get("ttft_s") is not None:
+                ttfts.append(timing["ttft_s"])
+            if timing.get("itl_mean_s") is not None:
+                itls.append(timing["itl_mean_s"])
+        if resp.get("aborted"):
+            kind = resp["aborted"].split("(", 1)[0]
+            aborted[kind] = aborted.get(kind, 0) + 1
+        return resp, row_max_tokens, latency_s, budget_flag
+
+    async def generate_row(job: GenJob, r: Dict[str, Any]) -> Dict[str, Any]:
+        messages = prompts.messages(r, job.lp)
+        source = str(r.get("source", ""))
+        resp, row_max_tokens, latency_s, budget_flag = await complete(job, messages, source)
+        finish_reason = extract_finish_reason(resp)
+        timing = resp.get("timing")
+        text = clean_translation(extract_text(resp))
+        candidates: Dict[str, int] = {}
+        if n > 1:
+            # Identical samples are stored once, with their multiplicity.
+            for cand in extract_texts(resp):
+                cand = clean_translation(cand)
+                candidates[cand] = candidates.get(cand, 0) + 1
+
+        meta = resp["meta"]
+        usage = resp.get("usage") or {}
+
+        out = dict(r)
+        out.update(
+            {
+                "model": args.model,
+                "served_model": served,
+                "hypothesis": text,
+                "finish_reason": finish_reason,
+                "gen_params": {
+                    "temperature": temperature,
+                    "top_p": top_p,
+                    "max_tokens": row_max_tokens,
+                    "stop": stop,
+                    **({"n": n, "best_of": best_of} if n > 1 else {}),
+                },
+                "usage": {
+                    "prompt_tokens": usage.get("prompt_tokens"),
+                    "completion_tokens": usage.get("completion_tokens"),
+                },
+                "latency_s": round(latency_s, 4),
+                "retries": meta["retries"],
+                "endpoint": meta["endpoint"],
+                "cached": meta["cached"],
+            }
+        )
+        # Prompts are stored once per distinct skeleton in <model>.prompts.jsonl;
+        # rows only keep the id (see evalmt.generation.prompt_store.PromptResolver).
+        prompt_ref = job.prompts.ref(messages, source) if job.prompts is not None else None
+        if prompt_ref is not None:
+            out["prompt_ref"] = prompt_ref
+        else:
+            out["messages"] = messages
+        if candidates:
+            out["candidates"] = list(candidates)
+            if len(candidates) < n:
+                out["candidate_counts"] = list(candidates.values())
+        if r.get("markers"):
+            # docops expand --splitter marker only needs LLM alignment when this is false.
+            out["markers_ok"] = split_on_markers(text, r["markers"], DEFAULT_MARKER_REGEX) is not None
+            marker_rows["kept" if out["markers_ok"] else "lost"] += 1
+        if budget_flag:
+            out[budget_flag] = True
+        if timing is not None:
+            out["timing"] = timing
+        if resp.get("aborted"):
+            out["aborted"] = resp["aborted"]
+        if meta.get("hedged"):
+            out["hedged"] = True
+        return out
+
+    async def generate_doc_chunked(job: GenJob, r: Dict[str, Any]) -> Dict[str, Any]:
+        """Translate a doc row K segments per request and reassemble it.
+
+        Without target context every chunk of the document is sent at once;
+        with ``--chunk-context-tgt`` each chunk waits for the previous one.
+        The row keeps per-chunk provenance in ``chunks`` (segment range,
+        context sizes, hypothesis and, when known, per-segment hypotheses),
+        which ``docops expand`` uses instead of aligning the whole document.
+        """
+
+        segments = [str(x) for x in r["source_segments"]]
+        sep = str(r.get("segment_sep", "\n"))
+        markers = r.get("markers") or []
+        spans = chunk_spans(len(segments), args.doc_chunk_size)
+        chunks: List[Dict[str, Any]] = [{} for _ in spans]
+
+        async def translate_chunk(ci: int) -> None:
+            start, end = spans[ci]
+            chunk_markers = markers[start:end]
+            parts = segments[start:end]
+            if chunk_markers:
+                parts = [add_marker(m, p) for m, p in zip(chunk_markers, parts)]
+            source = join_with_sep(parts, sep)
+            src_ctx = segments[max(0, start - args.chunk_context_src) : start]
+            tgt_ctx = target_context(chunks[:ci], start, args.chunk_context_tgt) if args.chunk_context_tgt else []
+            messages = prompts.messages(
+                {**r, "source": source, "markers": chunk_markers},
+                job.lp,
+                context=context_instruction(src_ctx, [strip_markers(t, DEFAULT_MARKER_REGEX) for t in tgt_ctx]),
             )
-            return out
+            resp, chunk_max_tokens, latency_s, budget_flag = await complete(job, messages, source)
+            text = clean_translation(extract_text(resp))
+            meta = resp["meta"]
+            usage = resp.get("usage") or {}
+            rec: Dict[str, Any] = {
+                "start": start,
+                "end": end,
+                "hypothesis": text,
+                "context": {"source": len(src_ctx), "target": len(tgt_ctx)},
+                "finish_reason": extract_finish_reason(resp),
+                "max_tokens": chunk_max_tokens,
+                "usage": {
+                    "prompt_tokens": usage.get("prompt_tokens"),
+                    "completion_tokens": usage.get("completion_tokens"),
+                },
+                "latency_s": round(latency_s, 4),
+                "retries": meta["retries"],
+                "endpoint": meta["endpoint"],
+                "cached": meta["cached"],
+            }
+            segment_hyps = [text] if end - start == 1 else None
+            if chunk_markers:
+                segment_hyps = split_on_markers(text, chunk_markers, DEFAULT_MARKER_REGEX)
+                rec["markers_ok"] = segment_hyps is not None
+            if segment_hyps is not None:
+                rec["segment_hypotheses"] = segment_hyps
+            prompt_ref = job.prompts.ref(messages, source) if job.prompts is not None else None
+            if prompt_ref is not None:
+                # PromptResolver fills the skeleton from the row's own source.
+                rec["source"] = source
+                rec["prompt_ref"] = prompt_ref
+            else:
+                rec["messages"] = messages
+            if budget_flag:
+                rec[budget_flag] = True
+            if resp.get("aborted"):
+                rec["aborted"] = resp["aborted"]
+            chunks[ci] = rec
+
+        t0 = time.monotonic()
+        if args.chunk_context_tgt:
+            for ci in range(len(spans)):
+                await translate_chunk(ci)
+        else:
+            await gather_or_cancel([translate_chunk(ci) for ci in range(len(spans))])
+        chunked["docs"] += 1
+        chunked["chunks"] += len(chunks)
+
+        reasons = [c["finish_reason"] for c in chunks]
+        out = {k: v for k, v in r.items() if k not in ("source_segments", "segment_sep")}
+        out.update(
+            {
+                "model": args.model,
+                "served_model": served,
+                "hypothesis": join_with_sep([c["hypothesis"] for c in chunks], sep),
+                "finish_reason": next((f for f in reasons if f != "stop"), "stop"),
+                "gen_params": {
+                    "temperature": temperature,
+                    "top_p": top_p,
+                    "max_tokens": max(c["max_tokens"] for c in chunks),
+                    "stop": stop,
+                    "doc_chunk_size": args.doc_chunk_size,
+                    "chunk_context_src": args.chunk_context_src,
+                    "chunk_context_tgt": args.chunk_context_tgt,
+                },
+                "usage": {
+                    key: sum(int(c["usage"][key] or 0) for c in chunks)
+                    for key in ("prompt_tokens", "completion_tokens")
+                },
+                # Wall time of the whole document, comparable to a single-request doc row.
+                "latency_s": round(time.monotonic() - t0, 4),
+                "retries": sum(c["retries"] for c in chunks),
+                "endpoint": ",".join(sorted({str(c["endpoint"]) for c in chunks})),
+                "cached": all(c["cached"] for c in chunks),
+                "chunks": chunks,
+            }
+        )
+        if markers:
+            out["markers_ok"] = all(c.get("markers_ok") for c in chunks)
+            marker_rows["kept" if out["markers_ok"] else "lost"] += 1
+        for flag in ("budget_truncated", "budget_retried"):
+            if any(c.get(flag) for c in chunks):
+                out[flag] = True
+        return out
+
+    def finish_job(job: GenJob) -> None:
+        if job.writer is not None:
+            bg_writer.close_file(job.writer)
+            job.writer = None
+        pbar.write(f"✅ wrote generations -> {job.out_path}")
+        if job.prompts is not None:
+            job.prompts.close()
+        if job.dead is not None:
+            job.dead.commit()
+            if job.dead.count:
+                pbar.write(f"⚠️  {job.dead.count} rows failed -> {job.dead.path} (rerun with --retry-failed)")
+
+    def write_result(
+        job: GenJob, seq: int, out_rec: Optional[Dict[str, Any]], failure: Optional[Dict[str, Any]]
+    ) -> None:
+        # A failed row still advances the reorder buffer (as None).
+        ready = job.reorder.push(seq, out_rec) if job.reorder is not None else [out_rec] if out_rec else []
+        if ready:
+            bg_writer.submit(job.writer, ready)
+        if out_rec is not None:
+            run_stats.add(job.dataset, job.lp, out_rec)
+        else:
+            job.dead.write(failure)
+            run_stats.add_failure(job.dataset, job.lp, failure["attempts"])
+        job.in_flight -= 1
+        pbar.update(1)
+        if job.exhausted and job.in_flight == 0:
+            finish_job(job)
+
+    def iter_work() -> Iterator[tuple[GenJob, int, Dict[str, Any]]]:
+        # One global queue across every (dataset, lp): the next LP starts filling
+        # free slots while the previous one is still draining. Input files are
+        # read lazily, so nothing is materialized beyond the task window.
+        for job in jobs:
+            ensure_dir(job.out_path.parent)
+            pbar.update(job.open(resume=args.resume, retry_failed=args.retry_failed, store_messages=args.store_messages))
+            if args.ordered_output:
+                job.reorder = ReorderBuffer(args.reorder_window)
+            for seq, r in enumerate(job.pending_rows()):
+                job.in_flight += 1
+                yield job, seq, r
+            job.exhausted = True
+            if job.in_flight == 0:
+                finish_job(job)
+
+    def iter_work_by_length() -> Iterator[tuple[GenJob, int, Dict[str, Any]]]:
+        # Length-aware dispatch needs every file open up front: a light pre-pass
+        # records (offset, estimated length) per pending row, then rows are
+        # re-read in plan order across all jobs.
+        if args.length_estimator == "tokenizer":
+            vllm_cfg = model_cfg.get("vllm", {}) or {}
+            length_fn = tokenizer_length(str(vllm_cfg.get("tokenizer") or model_cfg["hf_model_id"]))
+        else:
+            length_fn = char_length
+        indexes: List[LengthIndex] = []
+        remaining: List[int] = []
+        for job in jobs:
+            ensure_dir(job.out_path.parent)
+            pbar.update(job.open(resume=args.resume, retry_failed=args.retry_failed, store_messages=args.store_messages))
+            idx = LengthIndex.scan(job.in_path, length_fn=length_fn, skip=lambda row_id: not job.wants(row_id))
+            indexes.append(idx)
+            remaining.append(len(idx))
+            if not len(idx):
+                job.exhausted = True
+                finish_job(job)
+        plan = dispatch_plan(indexes, order=args.dispatch_order, buckets=args.length_buckets)
+        for seq, (fi, r) in enumerate(iter_planned_rows(indexes, plan)):
+            job = jobs[fi]
+            job.in_flight += 1
+            remaining[fi] -= 1
+            if remaining[fi] == 0:
+                job.exhausted = True
+            yield job, seq, r
+
+    async def count_total() -> None:
+        # Progress total is filled in from a background line count so the
+        # first requests are not delayed by a scan of large inputs.
+        counts = await asyncio.gather(*(asyncio.to_thread(count_lines, j.in_path) for j in jobs))
+        pbar.total = sum(counts)
+        pbar.refresh()
 
     pending: Set[asyncio.Task] = set()
-    window = args.concurrency * 4
-
-    with out_path.open("a", encoding="utf-8") as f_out:
-        pbar = tqdm(total=len(rows), desc=f"gen {args.model} {args.lp}")
-
-        for r in rows:
-            t = asyncio.create_task(run_one(r))
-            pending.add(t)
-            if len(pending) >= window:
-                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
-                for d in done:
-                    out_rec = d.result()
-                    f_out.write(json.dumps(out_rec, ensure_ascii=False) + "\n")
-                    pbar.update(1)
-
-        for t in asyncio.as_completed(list(pending)):
-            out_rec = await t
-            f_out.write(json.dumps(out_rec, ensure_ascii=False) + "\n")
-            pbar.update(1)
-
-        pbar.close()
-
-    print(f"✅ wrote generations -> {out_path}")
+    limiter = ConcurrencyLimiter(
+        args.concurrency,
+        adaptive=args.adaptive_concurrency,
+        min_limit=args.min_concurrency,
+        max_limit=args.max_concurrency or (args.concurrency * 4 if args.adaptive_concurrency else args.concurrency),
+        target_p95_s=args.target_p95,
+        interval_s=args.aimd_interval,
+    )
+
+    router = EndpointRouter(
+        parse_api_bases(args.api_base),
+        policy=args.router,
+        probe_interval_s=args.health_interval,
+    )
+    # Hedges run inside a limiter slot but need a connection of their own.
+    client = GenerationClient(
+        max_connections=limiter.max_limit + (args.hedge_max_in_flight if args.hedge else 0),
+        http2=args.http2,
+        timeout_s=args.timeout,
+        router=router,
+        limiter=limiter,
+        cache=None if args.no_cache else ResponseCache(Path(args.cache_path), max_bytes=args.cache_max_mb * 1024**2),
+        hedge=HedgePolicy(
+            quantile=args.hedge_quantile,
+            min_delay_s=args.hedge_min_delay,
+            budget=args.hedge_budget,
+            max_in_flight=args.hedge_max_in_flight,
+        )
+        if args.hedge
+        else None,
+    )
+
+    REGISTRY.const_labels.update(run=args.run, model=args.model)
+    REGISTRY.sample("evalmt_gen_in_flight_requests", lambda: limiter.in_flight, "HTTP requests in flight")
+    REGISTRY.sample("evalmt_gen_concurrency_limit", lambda: limiter.limit, "current concurrency (batch) limit")
+    REGISTRY.sample(
+        "evalmt_gen_queued_rows", lambda: max(0, len(pending) - limiter.in_flight), "row tasks waiting for a slot"
+    )
+    REGISTRY.sample(
+        "evalmt_gen_server_queue_waiting",
+        lambda: limiter.last_queue_waiting,
+        "vllm:num_requests_waiting summed over endpoints (--scrape-queue)",
+    )
+    REGISTRY.sample("evalmt_gen_rows_completed_total", lambda: run_stats.total.rows, "rows written", kind="counter")
+    REGISTRY.sample("evalmt_gen_rows_cached_total", lambda: run_stats.total.cached, "rows served from cache", kind="counter")
+    REGISTRY.sample(
+        "evalmt_gen_failed_rows_total", lambda: run_stats.total.failed, "rows sent to the dead-letter file", kind="counter"
+    )
+    REGISTRY.sample("evalmt_gen_retries_total", lambda: run_stats.total.retries, "request retries", kind="counter")
+    REGISTRY.sample(
+        "evalmt_gen_completion_tokens_total", lambda: run_stats.total.completion_tokens, "generated tokens", kind="counter"
+    )
+    REGISTRY.sample(
+        "evalmt_gen_tokens_per_second",
+        lambda: run_stats.total.completion_tokens_per_s,
+        "generated tokens per second since the first dispatch",
+    )
+    REGISTRY.sample(
+        "evalmt_gen_hedged_requests_total",
+        lambda: client.hedge.hedged if client.hedge is not None else None,
+        "duplicate requests sent by --hedge",
+        kind="counter",
+    )
+    REGISTRY.sample(
+        "evalmt_gen_endpoint_outstanding",
+        lambda: [({"endpoint": e.api_base}, e.outstanding) for e in router.endpoints],
+        "in-flight requests per endpoint",
+    )
+    start_metrics_server(args.metrics_port)
+
+    async def queue_probe() -> Optional[float]:
+        vals = await asyncio.gather(
+            *(scrape_prometheus_gauge(probe_http, e.api_base, VLLM_WAITING_GAUGE) for e in router.endpoints)
+        )
+        got = [v for v in vals if v is not None]
+        return sum(got) if got else None
+
+    # Health probes and /metrics scrapes get their own small pool so they are
+    # never queued behind generation requests on a saturated one.
+    probe_http = httpx.AsyncClient(
+        timeout=5.0,
+        limits=httpx.Limits(max_connections=2 * len(router.endpoints), max_keepalive_connections=len(router.endpoints)),
+    )
+
+    async with client, probe_http:
+        if len(router.endpoints) > 1:
+            await router.probe_all(probe_http)
+            if not any(e.healthy for e in router.endpoints):
+                raise RuntimeError(f"No healthy endpoint among: {args.api_base}")
+        health_task = asyncio.create_task(router.health_loop(probe_http))
+        control_task = asyncio.create_task(limiter.control_loop(queue_probe if args.scrape_queue else None))
+        desc = f"gen {args.model} {jobs[0].lp}" if len(jobs) == 1 else f"gen {args.model} ({len(jobs)} files)"
+        pbar = tqdm(total=None, desc=desc)
+        count_task = asyncio.create_task(count_total())
+        bg_writer = BackgroundWriter()
+
+        async def drain_one() -> None:
+            nonlocal pending
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for d in done:
+                write_result(*d.result())
+
+        work = iter_work() if args.dispatch_order == "file" else iter_work_by_length()
+        t_start = time.monotonic()
+        t_last_dispatch: Optional[float] = None
+        try:
+            for job, seq, r in work:
+                # Bounded reorder buffer: do not run further ahead of the
+                # oldest unfinished row than the buffer can hold.
+                while job.reorder is not None and not job.reorder.can_admit(seq):
+                    await drain_one()
+                run_stats.start(job.dataset, job.lp)
+                pending.add(asyncio.create_task(run_one(job, seq, r)))
+                t_last_dispatch = time.monotonic()
+                if len(pending) >= limiter.limit * args.window_factor:
+                    await drain_one()
+
+            while pending:
+                await drain_one()
+            tail = tail_summary(t_start, time.monotonic(), t_last_dispatch, limiter.last_full_ts)
+        finally:
+            count_task.cancel()
+            pbar.close()
+            for job in jobs:
+                if job.writer is not None:
+                    bg_writer.close_file(job.writer)
+                    job.writer = None
+                for side in (job.prompts, job.dead):
+                    if side is not None:
+                        side.close()
+            await asyncio.to_thread(bg_writer.shutdown)
+            run_stats.write(stats_path)
+        health_task.cancel()
+        control_task.cancel()
+
+    print(f"[pool] {client.stats.summary()}")
+    print(f"[usage] {run_stats.summary()} -> {stats_path}")
+    if budget is not None:
+        print(f"[budget] {budget.summary()}")
+    if client.hedge is not None:
+        print(f"[hedge] {client.hedge.summary()}")
+    if args.stream:
+        print(
+            f"[stream] ttft p50={percentile(ttfts, 50) * 1000:.0f}ms p95={percentile(ttfts, 95) * 1000:.0f}ms "
+            f"itl p50={percentile(itls, 50) * 1000:.1f}ms p95={percentile(itls, 95) * 1000:.1f}ms "
+            f"aborted={sum(aborted.values())} {aborted if aborted else ''}".rstrip()
+        )
+    if chunked["docs"]:
+        print(
+            f"[chunks] {chunked['docs']} docs in {chunked['chunks']} chunks of <= {args.doc_chunk_size} segments "
+            f"(context src={args.chunk_context_src} tgt={args.chunk_context_tgt})"
+        )
+    if chunked["whole"]:
+        print(
+            f"⚠️  {chunked['whole']} doc rows have no 'source_segments' and were sent whole "
+            "(rebuild them with docops to-doc --keep-segments)"
+        )
+    if marker_rows["kept"] or marker_rows["lost"]:
+        print(f"[markers] segment markers kept in {marker_rows['kept']}/{sum(marker_rows.values())} doc rows")
+    print(f"[schedule] order={args.dispatch_order} {tail}")
+    if client.cache is not None:
+        print(f"[cache] {client.cache.summary()}")
+    if limiter.adaptive:
+        print(f"[aimd] {limiter.summary()}")
+    if len(router.endpoints) > 1:
+        for line in router.summary():
+            print(f"[router] {line}")
 
 
 def main() -> None:
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import argparse
+import shutil
+from typing import Any, Dict, List, Tuple
+
+from ..config import ROOT, load_metric_config
+from ..generation.prompt_store import prompts_path
+from ..metrics.base import BaseMetric
+from ..metrics.registry import create_metric
+from ..utils.jsonl import iter_jsonl, write_jsonl
+
+DIRECTIONS = {"higher_is_better": 1.0, "lower_is_better": -1.0}
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Pick the final hypothesis of n-best generations (evalmt-generate --n) with a metric"
+    )
+    p.add_argument("--run", required=True)
+    p.add_argument("--metric", required=True, help="metric config used for reranking, e.g. cometkiwi_wmt22_qe")
+    p.add_argument("--dataset", required=True)
+    p.add_argument("--lp", required=True)
+    p.add_argument("--model", required=True)
+    p.add_argument(
+        "--out-model",
+        default=None,
+        help="model key of the reranked generations (default: <model>__rerank_<metric>)",
+    )
+    return p.parse_args()
+
+
+def expand_candidates(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One metric input row per candidate of every row that has more than one."""
+
+    out: List[Dict[str, Any]] = []
+    for i, r in enumerate(rows):
+        cands = r.get("candidates") or []
+        if len(cands) < 2:
+            continue
+        for k, cand in enumerate(cands):
+            rr = BaseMetric.output_row(r)
+            rr.update(hypothesis=cand, rerank_row=i, rerank_k=k)
+            out.append(rr)
+    return out
+
+
+def pick_best(candidates: List[str], scores: List[float], counts: List[int], sign: float) -> int:
+    # Ties go to the more frequent sample, then to the earlier one.
+    return max(range(len(candidates)), key=lambda k: (sign * scores[k], counts[k], -k))
+
+
+def main() -> None:
+    args = parse_args()
+    cfg = load_metric_config(args.metric)
+    direction = cfg.get("direction")
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Metric {args.metric} has no usable direction ({direction!r}); cannot rerank with it")
+    if cfg.get("enable_context") or int(cfg.get("context_window", 0)) > 0:
+        # Candidates of neighbouring rows would be scored as each other's context.
+        raise ValueError(f"Context metrics cannot rerank single candidates: {args.metric}")
+    sign = DIRECTIONS[direction]
+
+    gen_dir = ROOT / "outputs" / args.run / "gen" / args.dataset / args.lp
+    gen_path = gen_dir / f"{args.model}.jsonl"
+    if not gen_path.exists():
+        raise FileNotFoundError(f"Generation not found: {gen_path}")
+    out_model = args.out_model or f"{args.model}__rerank_{args.metric}"
+    out_path = gen_dir / f"{out_model}.jsonl"
+    tmp_dir = ROOT / "outputs" / args.run / "tmp" / "rerank" / args.metric / args.dataset / args.lp / args.model
+
+    rows = list(iter_jsonl(gen_path))
+    expanded = expand_candidates(rows)
+    print(f"[rerank] {len(rows)} rows, {len(expanded)} candidates to score with {args.metric}")
+
+    scores: Dict[Tuple[int, int], float] = {}
+    if expanded:
+        cand_path = tmp_dir / "candidates.jsonl"
+        scored_path = tmp_dir / f"{args.metric}.jsonl"
+        write_jsonl(cand_path, expanded)
+        metric = create_metric(args.metric, cfg)
+        metric.score(gen_path=cand_path, out_path=scored_path, tmp_dir=tmp_dir / "metric")
+        for r in iter_jsonl(scored_path):
+            scores[(int(r["rerank_row"]), int(r["rerank_k"]))] = float(r["score"])
+
+    changed = 0
+    gain = 0.0
+    out_rows: List[Dict[str, Any]] = []
+    for i, r in enumerate(rows):
+        out = dict(r)
+        out["model"] = out_model
+        cands = r.get("candidates") or []
+        if len(cands) >= 2:
+            cand_scores = [scores[(i, k)] for k in range(len(cands))]
+            counts = r.get("candidate_counts") or [1] * len(cands)
+            best = pick_best(cands, cand_scores, counts, sign)
+            out["hypothesis"] = cands[best]
+            out["rerank"] = {
+                "metric": args.metric,
+                "picked": best,
+                "scores": [round(s, 6) for s in cand_scores],
+            }
+            if cands[best] != r.get("hypothesis"):
+                changed += 1
+            gain += sign * (cand_scores[best] - cand_scores[0])
+        out_rows.append(out)
+
+    tmp_out = out_path.with_name(out_path.name + ".tmp")
+    write_jsonl(tmp_out, out_rows)
+    tmp_out.replace(out_path)
+    # Rows keep their prompt_ref; the reranked "model" needs the same skeletons.
+    src_prompts = prompts_path(gen_path)
+    if src_prompts.exists():
+        shutil.copyfile(src_prompts, prompts_path(out_path))
+
+    n_multi = sum(1 for r in rows if len(r.get("candidates") or []) >= 2)
+    mean_gain = gain / n_multi if n_multi else 0.0
+    print(f"[rerank] changed {changed}/{n_multi} hypotheses, mean {args.metric} gain over sample 0: {mean_gain:+.4f}")
+    print(f"✅ reranked -> {out_path}")
+
+
+if __name__ == "__main__":
+    main()
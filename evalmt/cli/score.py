@@ -1,54 +1,178 @@
 from __future__ import annotations
 
 import argparse
-
-import importlib
+import fnmatch
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 from ..config import ROOT, load_metric_config
-from ..metrics.registry import METRIC_REGISTRY
+from ..metrics.base import BaseMetric, ScoreJob
+from ..metrics.cache import DEFAULT_SCORE_CACHE_PATH, ScoreCache
+from ..metrics.incremental import IncrementalPlan, merge_incremental, plan_incremental
+from ..metrics.registry import create_metric
+from ..metrics.server import score_remote, server_sockets
+from ..utils.jsonl import count_lines
+from ..utils.telemetry import REGISTRY, start_metrics_server
+
+GLOB_CHARS = "*?["
 
 
 def parse_args() -> argparse.Namespace:
-    p = argparse.ArgumentParser()
+    p = argparse.ArgumentParser(
+        description="Score generations with one metric. --dataset/--lp/--model take comma lists and globs "
+        "(e.g. --lp 'en-*' --model 'gemma*'); all matching files share one model load."
+    )
     p.add_argument("--run", required=True)
     p.add_argument("--metric", required=True)
-    p.add_argument("--dataset", required=True)
-    p.add_argument("--lp", required=True)
-    p.add_argument("--model", required=True)
+    p.add_argument("--dataset", "--datasets", dest="dataset", required=True)
+    p.add_argument("--lp", "--lps", dest="lp", required=True, help="comma list / glob of LPs ('all' = every LP)")
+    p.add_argument("--model", "--models", dest="model", required=True)
+    p.add_argument(
+        "--server",
+        default=None,
+        help="evalmt-score-server socket(s) to hand the work to, comma-separated "
+        "(default: $EVALMT_SCORE_SERVER, else outputs/_score_server.sock if present); scores locally if none can",
+    )
+    p.add_argument("--no-server", action="store_true", help="always score in this process")
+    p.add_argument("--no-score-cache", action="store_true", help="do not read/write the segment score cache")
+    p.add_argument("--score-cache-path", default=str(DEFAULT_SCORE_CACHE_PATH))
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only score rows that are new or whose source/hypothesis/reference changed since the existing "
+        "metric output (matched by id), then merge and recompute the system score",
+    )
+    p.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus /metrics on this local port")
     return p.parse_args()
 
 
+def _split_list(value: str) -> List[str]:
+    return [x.strip() for x in value.split(",") if x.strip()]
+
+
+def _is_glob(pattern: str) -> bool:
+    return any(c in pattern for c in GLOB_CHARS)
+
+
+def _expand(patterns: List[str], available: List[str]) -> List[str]:
+    """Explicit names are kept as given (and must exist); globs match ``available``."""
+
+    out: List[str] = []
+    for pat in patterns:
+        names = sorted(fnmatch.filter(available, pat)) if _is_glob(pat) else [pat]
+        out.extend(n for n in names if n not in out)
+    return out
+
+
+def _subdirs(path: Path) -> List[str]:
+    return sorted(p.name for p in path.iterdir() if p.is_dir()) if path.is_dir() else []
+
+
+def _gen_models(lp_dir: Path) -> List[str]:
+    # Sidecars (<model>.prompts.jsonl, <model>.failed.jsonl) have a dot in the stem.
+    return sorted(p.stem for p in lp_dir.glob("*.jsonl") if "." not in p.stem) if lp_dir.is_dir() else []
+
+
+def resolve_jobs(run: str, metric: str, datasets: str, lps: str, models: str) -> List[ScoreJob]:
+    gen_root = ROOT / "outputs" / run / "gen"
+    jobs: List[ScoreJob] = []
+    lp_patterns = ["*" if x == "all" else x for x in _split_list(lps)]
+    for dataset in _expand(_split_list(datasets), _subdirs(gen_root)):
+        for lp in _expand(lp_patterns, _subdirs(gen_root / dataset)):
+            for model in _expand(_split_list(models), _gen_models(gen_root / dataset / lp)):
+                gen_path = gen_root / dataset / lp / f"{model}.jsonl"
+                if not gen_path.exists():
+                    raise FileNotFoundError(f"Generation not found: {gen_path}")
+                jobs.append(
+                    ScoreJob(
+                        name=f"{dataset}/{lp}/{model}",
+                        gen_path=gen_path,
+                        out_path=ROOT / "outputs" / run / "metrics" / metric / dataset / lp / f"{model}.jsonl",
+                        tmp_dir=ROOT / "outputs" / run / "tmp" / metric / dataset / lp / model,
+                    )
+                )
+    if not jobs:
+        raise FileNotFoundError(f"No generations match dataset={datasets} lp={lps} model={models} in {gen_root}")
+    return jobs
+
+
+def score_jobs(
+    args: argparse.Namespace, cfg: Dict[str, Any], metric: Optional[BaseMetric], jobs: List[ScoreJob], tmp_dir: Path
+) -> None:
+    cache_path = None if args.no_score_cache else str(Path(args.score_cache_path).resolve())
+    sockets = [] if args.no_server else server_sockets(args.server)
+    remote = score_remote(sockets, args.metric, jobs, tmp_dir, score_cache=cache_path) if sockets else None
+    if remote is not None:
+        state = "already loaded" if remote["resident"] else "loaded now"
+        print(f"[score] {args.metric}: {remote['files']} files via {remote['server']} ({state}) in {remote['seconds']:.1f}s")
+        if remote.get("cache"):
+            print(f"[score-cache] {remote['cache']}")
+        return
+
+    if metric is None:
+        metric = create_metric(args.metric, cfg)
+    if len(jobs) > 1:
+        print(f"[score] {args.metric}: {len(jobs)} files in one process")
+    if cache_path is not None:
+        metric.score_cache = ScoreCache(Path(cache_path))
+    metric.score_many(jobs, tmp_dir=tmp_dir)
+    metric.report_phase("done")
+    if metric.score_cache is not None:
+        print(f"[score-cache] {metric.score_cache.summary()}")
+        metric.score_cache.close()
+
+
 def main() -> None:
     args = parse_args()
     cfg = load_metric_config(args.metric)
-    metric_type = cfg["type"]
-
-    # Lazy-import only the required metric implementation to avoid
-    # pulling heavy deps from other metric stacks into this env.
-    module_map = {
-        "bleu": "evalmt.metrics.bleu_metric",
-        "comet": "evalmt.metrics.comet_metric",
-        "metricx": "evalmt.metrics.metricx_metric",
-    }
-    if metric_type in module_map and metric_type not in METRIC_REGISTRY:
-        importlib.import_module(module_map[metric_type])
-
-    if metric_type not in METRIC_REGISTRY:
-        raise KeyError(f"Unknown metric type: {metric_type}. Registered={list(METRIC_REGISTRY)}")
-
-    gen_path = ROOT / "outputs" / args.run / "gen" / args.dataset / args.lp / f"{args.model}.jsonl"
-    if not gen_path.exists():
-        raise FileNotFoundError(f"Generation not found: {gen_path}")
-
-    out_path = (
-        ROOT / "outputs" / args.run / "metrics" / args.metric / args.dataset / args.lp / f"{args.model}.jsonl"
-    )
-    tmp_dir = ROOT / "outputs" / args.run / "tmp" / args.metric / args.dataset / args.lp / args.model
+    jobs = resolve_jobs(args.run, args.metric, args.dataset, args.lp, args.model)
+    # The metric is only built here for --incremental planning; otherwise
+    # score_jobs builds it if no evalmt-score-server takes the work.
+    metric = create_metric(args.metric, cfg) if args.incremental else None
+
+    # --incremental: score only the delta of files that were scored before.
+    plans: List[IncrementalPlan] = []
+    work = jobs
+    if args.incremental:
+        work = []
+        for job in jobs:
+            plan = plan_incremental(metric, job)
+            if plan is None:
+                work.append(job)
+                continue
+            plans.append(plan)
+            print(f"[incremental] {job.name}: {len(plan.rescore)}/{len(plan.gen_rows)} rows to score")
+            if plan.delta_job is not None:
+                work.append(plan.delta_job)
+
+    REGISTRY.const_labels.update(run=args.run, metric=args.metric, dataset=args.dataset, lp=args.lp, model=args.model)
+    REGISTRY.set("evalmt_score_rows_total", sum(count_lines(j.gen_path) for j in work))
+    REGISTRY.set("evalmt_score_batch_size", int(cfg.get("batch_size", 1)))
+    REGISTRY.set("evalmt_score_files_total", len(jobs))
+    start_metrics_server(args.metrics_port)
 
-    metric = METRIC_REGISTRY[metric_type](args.metric, cfg)
-    metric.score(gen_path=gen_path, out_path=out_path, tmp_dir=tmp_dir)
+    if work:
+        if len(work) == 1:
+            score_jobs(args, cfg, metric, work, work[0].tmp_dir)
+        else:
+            # A batch shares one scratch dir for metrics that concatenate their
+            # inputs; it is per invocation so concurrent runs of the same metric
+            # (e.g. sentence and doc datasets) do not overwrite each other.
+            batch_root = ROOT / "outputs" / args.run / "tmp" / args.metric / "_batch"
+            batch_root.mkdir(parents=True, exist_ok=True)
+            tmp_dir = Path(tempfile.mkdtemp(prefix="run-", dir=batch_root))
+            score_jobs(args, cfg, metric, work, tmp_dir)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    elif metric is not None:
+        metric.report_phase("done")
+    REGISTRY.inc("evalmt_score_rows_scored_total", sum(count_lines(j.out_path) for j in work))
+    for plan in plans:
+        merge_incremental(metric, plan)
 
-    print(f"✅ scored -> {out_path}")
+    for job in jobs:
+        print(f"✅ scored -> {job.out_path}")
 
 
 if __name__ == "__main__":
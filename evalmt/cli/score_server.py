@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import argparse
+import json
+import signal
+import sys
+from pathlib import Path
+
+from ..metrics.server import DEFAULT_SOCKET, ScoreService, call, serve_socket, serve_stdio
+from ..utils.telemetry import REGISTRY, start_metrics_server
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        description="Keep metric models loaded and score jobs sent by evalmt-score "
+        "(newline-delimited JSON-RPC 2.0 over a unix socket or stdin/stdout)"
+    )
+    p.add_argument("--metrics", default="", help="metric configs to load at startup (comma-separated); others load on first use")
+    p.add_argument("--socket", default=str(DEFAULT_SOCKET), help="unix socket to listen on (evalmt-score --server / $EVALMT_SCORE_SERVER)")
+    p.add_argument("--stdio", action="store_true", help="serve requests from stdin instead of a socket")
+    p.add_argument("--max-resident", type=int, default=0, help="metrics kept loaded at once, least recently used first out (0: no limit)")
+    p.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus /metrics on this local port")
+    p.add_argument("--status", action="store_true", help="print the status of the server on --socket and exit")
+    p.add_argument("--shutdown", action="store_true", help="stop the server on --socket and exit")
+    return p.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    sock = Path(args.socket)
+    if args.status or args.shutdown:
+        print(json.dumps(call(sock, "shutdown" if args.shutdown else "status"), indent=2))
+        return
+
+    # Unwind normally on SIGTERM so the socket file is removed.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    service = ScoreService(max_resident=args.max_resident)
+    REGISTRY.sample("evalmt_score_server_resident", lambda: len(service.status()["resident"]), "metrics kept loaded")
+    REGISTRY.sample("evalmt_score_server_requests_total", lambda: service.requests, "score requests served", kind="counter")
+    REGISTRY.sample("evalmt_score_server_loads_total", lambda: service.loads, "metric model loads", kind="counter")
+    start_metrics_server(args.metrics_port)
+
+    preload = [m.strip() for m in args.metrics.split(",") if m.strip()]
+    if preload:
+        # Loaded before the socket exists, so its presence means "ready".
+        service.preload(preload)
+    if args.stdio:
+        serve_stdio(service)
+    else:
+        serve_socket(service, sock)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Optional
+
+# Finish reason recorded for a streamed generation cancelled by a detector.
+ABORT_FINISH_REASON = "abort"
+
+
+class AbortDetector:
+    """Decides from the partial output whether a streamed generation is runaway.
+
+    Subclasses implement :meth:`check`, returning a short reason string to
+    abort or ``None`` to keep streaming. Detectors are built once per run and
+    must not keep per-row state.
+    """
+
+    name = "base"
+
+    def check(self, text: str, source: str) -> Optional[str]:
+        raise NotImplementedError
+
+
+class RepetitionDetector(AbortDetector):
+    """Output ends in the same unit repeated over and over (a decoding loop).
+
+    For every period ``p`` up to ``max_period`` characters, the tail is a loop
+    if it is ``p``-periodic over at least ``min_span`` characters and at least
+    ``min_repeats`` repetitions. A periodic tail that also occurs in the source
+    (a ``-----`` rule, a markdown table, repeated list prefixes) is a copy,
+    not a loop; runaway copies are left to the length-ratio detector.
+    """
+
+    name = "repetition"
+
+    def __init__(self, *, max_period: int = 200, min_repeats: int = 4, min_span: int = 200) -> None:
+        self.max_period = max_period
+        self.min_repeats = min_repeats
+        self.min_span = min_span
+
+    def check(self, text: str, source: str) -> Optional[str]:
+        n = len(text)
+        if n < self.min_span:
+            return None
+        for p in range(1, min(self.max_period, n // self.min_repeats) + 1):
+            span = max(self.min_span, p * self.min_repeats)
+            if span > n:
+                break
+            # p-periodic tail <=> the tail equals itself shifted by p.
+            if text[n - span + p :] == text[n - span : n - p] and text[n - span :] not in source:
+                return f"repetition(period={p})"
+        return None
+
+
+class LengthRatioDetector(AbortDetector):
+    """Output is far longer than the source (in characters)."""
+
+    name = "length-ratio"
+
+    def __init__(self, *, max_ratio: float = 4.0, min_chars: int = 256) -> None:
+        self.max_ratio = max_ratio
+        self.min_chars = min_chars
+
+    def check(self, text: str, source: str) -> Optional[str]:
+        limit = max(self.min_chars, self.max_ratio * len(source or ""))
+        if len(text) > limit:
+            return f"length-ratio(>{self.max_ratio:g}x)"
+        return None
+
+
+ABORT_DETECTORS: Dict[str, Callable[..., AbortDetector]] = {
+    RepetitionDetector.name: RepetitionDetector,
+    LengthRatioDetector.name: LengthRatioDetector,
+}
+
+
+def build_detectors(names: List[str], *, max_ratio: float = 4.0) -> List[AbortDetector]:
+    out: List[AbortDetector] = []
+    for name in names:
+        if name not in ABORT_DETECTORS:
+            raise ValueError(f"Unknown abort detector: {name} (available: {', '.join(ABORT_DETECTORS)})")
+        if name == LengthRatioDetector.name:
+            out.append(LengthRatioDetector(max_ratio=max_ratio))
+        else:
+            out.append(ABORT_DETECTORS[name]())
+    return out
+
+
+class AbortMonitor:
+    """Runs the detectors for one row every ``check_every`` new characters.
+
+    The stream asks :meth:`due` with its running character count and only
+    assembles the text when a check is due. The monitor keeps no position of
+    its own, so a hedged duplicate of the request can share it.
+    """
+
+    def __init__(self, detectors: List[AbortDetector], source: str, *, check_every: int = 64) -> None:
+        self.detectors = detectors
+        self.source = source
+        self.check_every = check_every
+
+    def due(self, n_chars: int, checked_at: int) -> bool:
+        return n_chars - checked_at >= self.check_every
+
+    def __call__(self, text: str) -> Optional[str]:
+        for d in self.detectors:
+            reason = d.check(text, self.source)
+            if reason:
+                return reason
+        return None
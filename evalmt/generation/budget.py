@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import json
+import math
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .abort import ABORT_FINISH_REASON
+from .concurrency import percentile
+
+
+def output_tokens(row: Dict[str, Any]) -> Optional[int]:
+    """Generated token count of an output row.
+
+    Uses the server-reported ``usage.completion_tokens`` when the row has it
+    (this also covers hidden reasoning tokens); older rows fall back to the
+    hypothesis character count, which over-estimates tokens for every script
+    we evaluate and is therefore a safe upper bound.
+    """
+
+    usage = row.get("usage") or {}
+    n = usage.get("completion_tokens")
+    if isinstance(n, int) and n > 0:
+        return n
+    hyp = row.get("hypothesis")
+    if isinstance(hyp, str) and hyp:
+        return len(hyp)
+    return None
+
+
+class TokenBudget:
+    """Per-row ``max_tokens`` from a learned output-tokens / source-chars ratio.
+
+    Ratios are kept per language pair in a bounded reservoir. The budget for a
+    row is ``ceil(len(source) * q_ratio * multiplier) + min_tokens``, capped at
+    ``cap`` (the model config ``max_tokens``), where ``q_ratio`` is a high
+    quantile of the observed ratios. Until an LP has ``min_samples`` ratios the
+    cap is used unchanged.
+    """
+
+    def __init__(
+        self,
+        cap: int,
+        *,
+        multiplier: float = 2.0,
+        quantile: float = 99.0,
+        min_tokens: int = 256,
+        min_samples: int = 50,
+        reservoir: int = 4096,
+    ) -> None:
+        self.cap = int(cap)
+        self.multiplier = float(multiplier)
+        self.quantile = float(quantile)
+        self.min_tokens = int(min_tokens)
+        self.min_samples = int(min_samples)
+        self.reservoir = int(reservoir)
+        self._ratios: Dict[str, List[float]] = {}
+        self._seen: Dict[str, int] = {}
+        self._q: Dict[str, float] = {}
+        self._rng = random.Random(0)
+
+        self.truncated = 0
+        self.retried = 0
+
+    def observe(self, lp: str, source: str, n_tokens: Optional[int], *, truncated: bool = False) -> None:
+        # Truncated outputs say nothing about the natural length.
+        if truncated or not n_tokens or not source:
+            return
+        ratio = n_tokens / len(source)
+        vals = self._ratios.setdefault(lp, [])
+        seen = self._seen.get(lp, 0) + 1
+        self._seen[lp] = seen
+        if len(vals) < self.reservoir:
+            vals.append(ratio)
+        else:
+            j = self._rng.randrange(seen)
+            if j < self.reservoir:
+                vals[j] = ratio
+        # Quantile is refreshed on a doubling schedule after warm-up and every
+        # 256 samples later on, so observe() stays O(1) amortised.
+        if len(vals) >= self.min_samples and (lp not in self._q or seen & (seen - 1) == 0 or seen % 256 == 0):
+            self._q[lp] = percentile(vals, self.quantile)
+
+    def learn_rows(self, lp: str, rows: Iterable[Dict[str, Any]]) -> int:
+        n = 0
+        for r in rows:
+            # Only the final output counts: a row regenerated after a budget
+            # cut (budget_retried) has its natural length and must be learned.
+            cut = r.get("finish_reason") in ("length", ABORT_FINISH_REASON)
+            self.observe(lp, str(r.get("source", "")), output_tokens(r), truncated=cut)
+            n += 1
+        return n
+
+    def learn_files(self, lp: str, paths: Iterable[Path], max_rows_per_file: int = 5000) -> int:
+        """Seed ratios from existing generation outputs (skipping torn lines)."""
+
+        n = 0
+        for path in paths:
+            if not path.exists():
+                continue
+            with path.open("r", encoding="utf-8") as f:
+                rows = []
+                for i, line in enumerate(f):
+                    if i >= max_rows_per_file:
+                        break
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+            n += self.learn_rows(lp, rows)
+        return n
+
+    def ratio(self, lp: str) -> Optional[float]:
+        return self._q.get(lp)
+
+    def for_row(self, lp: str, source: str) -> int:
+        q = self._q.get(lp)
+        if q is None:
+            return self.cap
+        need = int(math.ceil(len(source or "") * q * self.multiplier)) + self.min_tokens
+        return max(1, min(self.cap, need))
+
+    def summary(self) -> str:
+        lps = ", ".join(f"{lp}={q:.2f}" for lp, q in sorted(self._q.items())) or "none learned"
+        return (
+            f"p{self.quantile:g} tokens/char x{self.multiplier:g} (+{self.min_tokens}, cap {self.cap}): {lps}; "
+            f"truncated={self.truncated} retried={self.retried}"
+        )
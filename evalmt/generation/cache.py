@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import ROOT
+
+DEFAULT_CACHE_PATH = ROOT / "outputs" / "_cache" / "gen_responses.sqlite"
+
+
+def request_key(payload: Dict[str, Any]) -> str:
+    """Content hash of a chat-completion request (model, messages, sampling params)."""
+
+    blob = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """On-disk SQLite cache of chat-completion responses keyed by request hash.
+
+    Only deterministic requests (temperature == 0) are cached unless
+    ``allow_sampling`` is set. When the stored payload exceeds ``max_bytes``
+    the least recently used entries are evicted down to 90% of the budget.
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_CACHE_PATH,
+        *,
+        max_bytes: int = 2 * 1024**3,
+        allow_sampling: bool = False,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.allow_sampling = allow_sampling
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._puts_since_check = 0
+        self._last_size = 0
+        self._db = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " nbytes INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+
+    def cacheable(self, payload: Dict[str, Any]) -> bool:
+        return self.allow_sampling or float(payload.get("temperature", 0.0)) == 0.0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        blob = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses(key, response, nbytes, created, last_used) VALUES (?, ?, ?, ?, ?)",
+            (key, blob, len(blob), now, now),
+        )
+        self._puts_since_check += 1
+        if self._puts_since_check >= 256:
+            self._puts_since_check = 0
+            self.evict()
+
+    def size_bytes(self) -> int:
+        return int(self._db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM responses").fetchone()[0])
+
+    def evict(self) -> int:
+        total = self._last_size = self.size_bytes()
+        if total <= self.max_bytes:
+            return 0
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        cur = self._db.execute("SELECT key, nbytes FROM responses ORDER BY last_used ASC")
+        doomed = []
+        for key, nbytes in cur:
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= nbytes
+        if doomed:
+            self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            removed = len(doomed)
+        self.evicted += removed
+        self._last_size = total
+        return removed
+
+    def close(self) -> None:
+        self.evict()
+        self._db.close()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"hits={self.hits} misses={self.misses} hit_ratio={self.hit_ratio:.1%} "
+            f"evicted={self.evicted} size={self._last_size / 1024**2:.1f}MB path={self.path}"
+        )
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+def id_digest(row_id: object) -> int:
+    """64-bit digest of a row id; collisions are negligible at dataset scale."""
+
+    h = hashlib.blake2b(str(row_id).encode("utf-8"), digest_size=8)
+    return int.from_bytes(h.digest(), "little")
+
+
+class CompactIdSet:
+    """Set of completed row ids stored as 64-bit digests instead of strings."""
+
+    def __init__(self, ids: Optional[Iterable[object]] = None) -> None:
+        self._digests: Set[int] = set()
+        for row_id in ids or ():
+            self.add(row_id)
+
+    def add(self, row_id: object) -> None:
+        self._digests.add(id_digest(row_id))
+
+    def __contains__(self, row_id: object) -> bool:
+        return id_digest(row_id) in self._digests
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+
+def checkpoint_path(out_path: Path) -> Path:
+    """Sidecar index next to a generation output: `<model>.jsonl.ckpt`."""
+
+    return out_path.with_name(out_path.name + ".ckpt")
+
+
+def _rebuild_from_output(out_path: Path, start: int = 0) -> List[Tuple[int, str]]:
+    """Index every complete, parseable line of the output from byte ``start`` on.
+
+    Stops at the first partial or unparseable line. With ``start=0`` this
+    rebuilds the index of a legacy output (no sidecar); with the last indexed
+    offset it picks up rows written after the sidecar's last flush.
+    """
+
+    entries: List[Tuple[int, str]] = []
+    offset = start
+    with out_path.open("rb") as f:
+        f.seek(start)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            line = raw.strip()
+            if line:
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                entries.append((offset + len(raw), str(row.get("id"))))
+            offset += len(raw)
+    return entries
+
+
+def _read_sidecar(ckpt: Path, out_size: int) -> Tuple[Optional[List[Tuple[int, str]]], bool]:
+    """Read `<end_offset>\\t<json id>` lines, dropping a torn tail.
+
+    Returns ``None`` entries if an offset points past `out_size`: the output is
+    flushed before the sidecar, so that only happens when the output was
+    rewritten and no offset in the sidecar can be trusted.
+    """
+
+    entries: List[Tuple[int, str]] = []
+    clean = True
+    with ckpt.open("rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                clean = False
+                break
+            try:
+                off_s, id_s = raw.decode("utf-8").rstrip("\n").split("\t", 1)
+                off = int(off_s)
+                row_id = json.loads(id_s)
+            except (ValueError, UnicodeDecodeError):
+                clean = False
+                break
+            if off > out_size:
+                return None, False
+            entries.append((off, str(row_id)))
+    return entries, clean
+
+
+def _at_line_boundary(out_path: Path, out_size: int, offset: int) -> bool:
+    """True if ``offset`` is inside the output and ends a line (or is 0)."""
+
+    if offset == 0:
+        return True
+    if offset > out_size:
+        return False
+    with out_path.open("rb") as f:
+        f.seek(offset - 1)
+        return f.read(1) == b"\n"
+
+
+def recover_checkpoint(out_path: Path) -> Tuple[CompactIdSet, int]:
+    """Make `out_path` consistent with its sidecar and return (done ids, rows).
+
+    The sidecar is written in batches, so complete rows past its last offset
+    (at most about one ``flush_every`` batch) are parsed and indexed too; only
+    a final partial or unparseable line is truncated. Apart from that tail
+    only the sidecar is read, so the cost does not depend on the size of the
+    output rows.
+    """
+
+    done = CompactIdSet()
+    ckpt = checkpoint_path(out_path)
+    if not out_path.exists():
+        if ckpt.exists():
+            ckpt.unlink()
+        return done, 0
+
+    out_size = out_path.stat().st_size
+    entries: Optional[List[Tuple[int, str]]] = None
+    clean = False
+    if ckpt.exists():
+        entries, clean = _read_sidecar(ckpt, out_size)
+        if entries is None or not _at_line_boundary(out_path, out_size, entries[-1][0] if entries else 0):
+            # The output was rewritten behind the sidecar's back (e.g. an
+            # in-place clean); never cut it at one of those offsets.
+            print(f"⚠️  {ckpt} does not match {out_path}; rebuilding the index from the output")
+            entries, clean = None, False
+    tail: List[Tuple[int, str]] = []
+    if entries is None:
+        entries = _rebuild_from_output(out_path)
+    else:
+        tail = _rebuild_from_output(out_path, entries[-1][0] if entries else 0)
+        entries.extend(tail)
+
+    good = entries[-1][0] if entries else 0
+    if out_size != good:
+        print(f"⚠️  truncating {out_path} from {out_size} to {good} bytes (torn tail)")
+        with out_path.open("r+b") as f:
+            f.truncate(good)
+    if not clean:
+        with ckpt.open("w", encoding="utf-8") as f:
+            for off, row_id in entries:
+                f.write(f"{off}\t{json.dumps(row_id, ensure_ascii=False)}\n")
+    elif tail:
+        with ckpt.open("a", encoding="utf-8") as f:
+            for off, row_id in tail:
+                f.write(f"{off}\t{json.dumps(row_id, ensure_ascii=False)}\n")
+    for _, row_id in entries:
+        done.add(row_id)
+    return done, len(entries)
+
+
+class CheckpointedWriter:
+    """Append JSONL rows and record `<end_offset>\\t<id>` in the sidecar.
+
+    The output is always flushed before the sidecar so the index never points
+    past bytes that reached the file.
+    """
+
+    def __init__(self, out_path: Path, *, flush_every: int = 64, flush_interval_s: float = 1.0) -> None:
+        self.out_path = out_path
+        self._out = out_path.open("ab")
+        self._ckpt = checkpoint_path(out_path).open("a", encoding="utf-8")
+        self._offset = self._out.tell()
+        self._pending: List[str] = []
+        self.flush_every = flush_every
+        self.flush_interval_s = flush_interval_s
+        self._last_flush = time.monotonic()
+        self.rows = 0
+
+    def write(self, row_id: object, line: bytes) -> None:
+        self._out.write(line)
+        self._offset += len(line)
+        self._pending.append(f"{self._offset}\t{json.dumps(str(row_id), ensure_ascii=False)}\n")
+        self.rows += 1
+        self.maybe_flush()
+
+    def maybe_flush(self) -> None:
+        if len(self._pending) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    def flush(self) -> None:
+        self._out.flush()
+        if self._pending:
+            self._ckpt.write("".join(self._pending))
+            self._pending = []
+        self._ckpt.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+        self._out.close()
+        self._ckpt.close()
+
+
+def failed_path(out_path: Path) -> Path:
+    """Dead-letter file next to a generation output: `<model>.failed.jsonl`."""
+
+    return out_path.with_name(out_path.stem + ".failed.jsonl")
+
+
+class DeadLetter:
+    """JSONL of rows that failed after all retries.
+
+    New failures go to ``<model>.failed.jsonl.tmp``; :meth:`commit` atomically
+    replaces the dead-letter file with them once the job has finished (every
+    pending row, including earlier failures, was attempted). A run that stops
+    early leaves the previous file untouched. ``--retry-failed`` restricts a
+    run to the ids of :meth:`previous_ids`.
+    """
+
+    def __init__(self, out_path: Path) -> None:
+        self.path = failed_path(out_path)
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.count = 0
+        self._f: Optional[IO[str]] = None
+
+    def previous_ids(self) -> Optional[Set[object]]:
+        """Ids recorded by the last finished run (``None`` if there is no dead-letter file)."""
+
+        if not self.path.exists():
+            return None
+        ids: Set[object] = set()
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ids.add(json.loads(line).get("id"))
+                except json.JSONDecodeError:
+                    continue
+        return ids
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._f is None:
+            self._f = self.tmp_path.open("w", encoding="utf-8")
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self.count += 1
+
+    def commit(self) -> None:
+        """The job finished: its failures (possibly none) become the dead-letter file."""
+
+        self._close_file()
+        if self.count:
+            self.tmp_path.replace(self.path)
+        else:
+            self.path.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        """Stop writing; without :meth:`commit` this run's failures are discarded."""
+
+        self._close_file()
+        self.tmp_path.unlink(missing_ok=True)
+
+    def _close_file(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Dict, List, Tuple
+
+# Appended to the prompt of every chunk after the first one of a document.
+CHUNK_CONTEXT_INSTRUCTION = (
+    "The text to translate continues a longer document. "
+    "The preceding part is given for context only; do not translate or repeat it."
+)
+
+
+def chunk_spans(n_segments: int, size: int) -> List[Tuple[int, int]]:
+    """``[start, end)`` segment ranges of at most ``size`` segments each."""
+
+    if size <= 0:
+        raise ValueError(f"chunk size must be positive: {size}")
+    return [(s, min(s + size, n_segments)) for s in range(0, n_segments, size)]
+
+
+def target_context(chunks: List[Dict[str, Any]], start: int, n_segments: int) -> List[str]:
+    """Translations of the ``n_segments`` segments before ``start``.
+
+    Chunks that could not be split per segment contribute their whole
+    hypothesis once.
+    """
+
+    lo = max(0, start - n_segments)
+    out: List[str] = []
+    for c in chunks:
+        if c["end"] <= lo or c["start"] >= start:
+            continue
+        segs = c.get("segment_hypotheses")
+        if segs is not None:
+            out.extend(segs[max(lo, c["start"]) - c["start"] : start - c["start"]])
+        elif c["hypothesis"]:
+            out.append(c["hypothesis"])
+    return out
+
+
+def context_instruction(source: List[str], target: List[str]) -> str:
+    if not source and not target:
+        return ""
+    parts = [CHUNK_CONTEXT_INSTRUCTION]
+    if source:
+        parts.append("Preceding text:\n" + "\n".join(source))
+    if target:
+        parts.append("Preceding translation:\n" + "\n".join(target))
+    return "\n".join(parts)
+
+
+async def gather_or_cancel(aws: List[Awaitable[Any]]) -> List[Any]:
+    """``asyncio.gather`` that cancels the remaining chunks once one fails."""
+
+    tasks = [asyncio.ensure_future(a) for a in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
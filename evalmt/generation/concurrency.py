@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+
+    if not values:
+        return 0.0
+    vals = sorted(values)
+    k = max(0, min(len(vals) - 1, int(math.ceil(q / 100.0 * len(vals))) - 1))
+    return vals[k]
+
+
+class ConcurrencyLimiter:
+    """Resizable semaphore bounding the number of in-flight HTTP requests.
+
+    With ``adaptive=False`` it behaves like ``asyncio.Semaphore(initial)``.
+    With ``adaptive=True`` :meth:`control_loop` resizes the limit AIMD-style:
+    additive increase while the limit is saturated and latency is stable,
+    multiplicative decrease on 429/503/timeouts, a p95 above target, or a
+    growing server-side queue (``num_requests_waiting``).
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        *,
+        adaptive: bool = False,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        target_p95_s: Optional[float] = None,
+        latency_slack: float = 2.0,
+        increase: int = 1,
+        decrease: float = 0.7,
+        interval_s: float = 5.0,
+        queue_high: float = 8.0,
+    ) -> None:
+        self.adaptive = adaptive
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit or initial)
+        self.limit = max(self.min_limit, min(initial, self.max_limit))
+        self.target_p95_s = target_p95_s
+        self.latency_slack = latency_slack
+        self.increase = increase
+        self.decrease = decrease
+        self.interval_s = interval_s
+        self.queue_high = queue_high
+
+        self.in_flight = 0
+        self.last_queue_waiting: Optional[float] = None
+        self._cond = asyncio.Condition()
+        self._latencies: List[float] = []
+        self._overloads = 0
+        self._saturated = False
+        self._base_p50: Optional[float] = None
+        self.history: List[str] = []
+        # Last time the in-flight count was at the limit (batch full).
+        self.last_full_ts: Optional[float] = None
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+            if self.in_flight >= self.limit:
+                self._saturated = True
+                self.last_full_ts = time.monotonic()
+
+    async def release(self) -> None:
+        async with self._cond:
+            if self.in_flight >= self.limit:
+                self.last_full_ts = time.monotonic()
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def record_latency(self, latency_s: float) -> None:
+        self._latencies.append(latency_s)
+
+    def record_overload(self) -> None:
+        """429/503/timeout seen; forces a decrease at the next tick."""
+
+        self._overloads += 1
+
+    async def _set_limit(self, new_limit: int, reason: str) -> None:
+        new_limit = max(self.min_limit, min(self.max_limit, new_limit))
+        if new_limit == self.limit:
+            return
+        msg = f"limit {self.limit} -> {new_limit} ({reason})"
+        print(f"[aimd] {msg}")
+        self.history.append(msg)
+        async with self._cond:
+            self.limit = new_limit
+            self._cond.notify_all()
+
+    async def step(self, queue_waiting: Optional[float] = None) -> None:
+        lat, self._latencies = self._latencies, []
+        overloads, self._overloads = self._overloads, 0
+        saturated, self._saturated = self._saturated, self.in_flight >= self.limit
+        self.last_queue_waiting = queue_waiting
+        p50 = percentile(lat, 50)
+        p95 = percentile(lat, 95)
+        if lat and (self._base_p50 is None or p50 < self._base_p50):
+            self._base_p50 = p50
+        stats = f"p50={p50:.2f}s p95={p95:.2f}s n={len(lat)}"
+        if queue_waiting is not None:
+            stats += f" waiting={queue_waiting:g}"
+        shrink = max(self.min_limit, int(self.limit * self.decrease))
+
+        if overloads:
+            await self._set_limit(shrink, f"{overloads} overload responses, {stats}")
+        elif queue_waiting is not None and queue_waiting > self.queue_high:
+            await self._set_limit(shrink, f"server queue above {self.queue_high:g}, {stats}")
+        elif self.target_p95_s is not None and lat and p95 > self.target_p95_s:
+            await self._set_limit(shrink, f"p95 above target {self.target_p95_s:g}s, {stats}")
+        elif (
+            self.target_p95_s is None
+            and lat
+            and self._base_p50
+            and p50 > self.latency_slack * self._base_p50
+        ):
+            await self._set_limit(shrink, f"p50 above {self.latency_slack:g}x baseline {self._base_p50:.2f}s, {stats}")
+        elif saturated and (queue_waiting is None or queue_waiting <= 0):
+            await self._set_limit(self.limit + self.increase, f"saturated, {stats}")
+
+    async def control_loop(self, queue_probe: Optional[Callable[[], Awaitable[Optional[float]]]] = None) -> None:
+        if not self.adaptive:
+            return
+        while True:
+            await asyncio.sleep(self.interval_s)
+            waiting = await queue_probe() if queue_probe is not None else None
+            await self.step(waiting)
+
+    def summary(self) -> str:
+        return f"final_limit={self.limit} changes={len(self.history)} range=[{self.min_limit},{self.max_limit}]"
+
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, List, Optional
+
+from .concurrency import percentile
+
+
+class HedgePolicy:
+    """When to send a duplicate ("hedge") of a slow request, and how often.
+
+    The hedge delay is the ``quantile`` of recent request latencies (never
+    below ``min_delay_s``); nothing is hedged until ``min_samples`` latencies
+    were seen. Two caps keep hedging from overloading the cluster: at most
+    ``budget`` hedges per primary request overall, and at most
+    ``max_in_flight`` hedges outstanding at once.
+    """
+
+    def __init__(
+        self,
+        *,
+        quantile: float = 95.0,
+        min_delay_s: float = 1.0,
+        budget: float = 0.05,
+        max_in_flight: int = 4,
+        min_samples: int = 20,
+        window: int = 2048,
+    ) -> None:
+        self.quantile = quantile
+        self.min_delay_s = min_delay_s
+        self.budget = budget
+        self.max_in_flight = max_in_flight
+        self.min_samples = min_samples
+        self._lat: Deque[float] = deque(maxlen=window)
+        self._delay: Optional[float] = None
+        self._since_refresh = 0
+
+        self.requests = 0
+        self.hedged = 0
+        self.in_flight = 0
+        self.wins = 0
+        self.skipped_budget = 0
+        self._win_latencies: List[float] = []
+        self._slow_primary: List[float] = []
+
+    def record(self, latency_s: float) -> None:
+        self._lat.append(latency_s)
+        self._since_refresh += 1
+        if len(self._lat) >= self.min_samples and (self._delay is None or self._since_refresh >= 64):
+            self._delay = max(self.min_delay_s, percentile(list(self._lat), self.quantile))
+            self._since_refresh = 0
+
+    def delay(self) -> Optional[float]:
+        return self._delay
+
+    def try_start(self) -> bool:
+        if self.in_flight >= self.max_in_flight or self.hedged + 1 > self.budget * max(1, self.requests):
+            self.skipped_budget += 1
+            return False
+        self.hedged += 1
+        self.in_flight += 1
+        return True
+
+    def finish(self, *, hedge_won: bool, latency_s: float) -> None:
+        self.in_flight -= 1
+        if hedge_won:
+            self.wins += 1
+            self._win_latencies.append(latency_s)
+
+    def record_slow_primary(self, latency_s: float) -> None:
+        """Latency of a primary that outlived the hedge delay and still answered."""
+
+        self._slow_primary.append(latency_s)
+
+    @property
+    def estimated_saved_s(self) -> Optional[float]:
+        # The cancelled primary's latency is unknown; estimate it with the mean
+        # latency of slow primaries that did finish (same population). None
+        # until at least one such primary was observed.
+        if not self._slow_primary:
+            return None
+        slow = sum(self._slow_primary) / len(self._slow_primary)
+        return sum(max(0.0, slow - w) for w in self._win_latencies)
+
+    def summary(self) -> str:
+        rate = self.hedged / self.requests if self.requests else 0.0
+        delay = f"{self._delay:.2f}s" if self._delay is not None else "-"
+        saved = self.estimated_saved_s
+        return (
+            f"delay=p{self.quantile:g}({delay}) hedged={self.hedged}/{self.requests} ({rate:.1%}, budget {self.budget:.0%}) "
+            f"hedge_wins={self.wins} skipped_by_budget={self.skipped_budget} "
+            f"est_saved={f'{saved:.1f}s' if saved is not None else '-'}"
+        )
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional
+
+# Placeholder for the row's source text inside a stored message skeleton.
+SOURCE_SLOT = "{{evalmt:source}}"
+
+Messages = List[Dict[str, Any]]
+
+
+def prompts_path(out_path: Path) -> Path:
+    """Skeleton sidecar next to a generation output: `<model>.prompts.jsonl`."""
+
+    return out_path.with_name(out_path.stem + ".prompts.jsonl")
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def skeleton_id(skeleton: Messages) -> str:
+    return hashlib.sha1(_canonical(skeleton).encode("utf-8")).hexdigest()[:16]
+
+
+def fill_skeleton(skeleton: Messages, source: str) -> Messages:
+    out = copy.deepcopy(skeleton)
+    for m in out:
+        if isinstance(m.get("content"), str) and SOURCE_SLOT in m["content"]:
+            m["content"] = m["content"].replace(SOURCE_SLOT, source, 1)
+            break
+    return out
+
+
+def make_skeleton(messages: Messages, source: str) -> Optional[Messages]:
+    """Replace the row's source text by :data:`SOURCE_SLOT`; ``None`` if not lossless.
+
+    Only the last occurrence in the last message that contains it is replaced
+    (builders append the text to the user turn), so a short source that also
+    appears inside the instruction does not break deduplication.
+    """
+
+    if not source or any(SOURCE_SLOT in str(m.get("content", "")) for m in messages):
+        return None
+    skeleton = copy.deepcopy(messages)
+    for m in reversed(skeleton):
+        content = m.get("content")
+        if isinstance(content, str):
+            i = content.rfind(source)
+            if i >= 0:
+                m["content"] = content[:i] + SOURCE_SLOT + content[i + len(source) :]
+                break
+    else:
+        return None
+    if fill_skeleton(skeleton, source) != messages:
+        return None
+    return skeleton
+
+
+def load_skeletons(path: Path) -> Dict[str, Messages]:
+    out: Dict[str, Messages] = {}
+    if not path.exists():
+        return out
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn tail after a crash; the row referencing it was never written
+            out[rec["prompt_id"]] = rec["messages"]
+    return out
+
+
+class PromptStore:
+    """Writes each distinct message skeleton once and hands out ``prompt_ref`` ids.
+
+    A new skeleton is appended and flushed before the row that references it
+    is queued for writing, so the sidecar is never behind the output.
+    """
+
+    def __init__(self, out_path: Path) -> None:
+        self.path = prompts_path(out_path)
+        self._known = set(load_skeletons(self.path))
+        self._f: Optional[IO[str]] = None
+        self.inline = 0
+
+    def ref(self, messages: Messages, source: str) -> Optional[str]:
+        skeleton = make_skeleton(messages, source)
+        if skeleton is None:
+            self.inline += 1
+            return None
+        pid = skeleton_id(skeleton)
+        if pid not in self._known:
+            if self._f is None:
+                self._f = self.path.open("a", encoding="utf-8")
+            self._f.write(json.dumps({"prompt_id": pid, "messages": skeleton}, ensure_ascii=False) + "\n")
+            self._f.flush()
+            self._known.add(pid)
+        return pid
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+class PromptResolver:
+    """Reconstructs the exact chat ``messages`` of generation output rows.
+
+    Works for rows with ``prompt_ref`` (skeleton from the sidecar + the row's
+    ``source``) as well as rows written with inline ``messages``. Files derived
+    from a generation output (aligned, expanded, metric outputs) keep the
+    ``prompt_ref`` of their source rows; pass the original sidecar as
+    ``prompts_file`` for those.
+    """
+
+    def __init__(self, gen_path: Path, prompts_file: Optional[Path] = None) -> None:
+        self.gen_path = gen_path
+        self.prompts_file = prompts_file or prompts_path(gen_path)
+        self._skeletons: Optional[Dict[str, Messages]] = None
+
+    def messages(self, row: Dict[str, Any]) -> Messages:
+        if "messages" in row:
+            return row["messages"]
+        pid = row.get("prompt_ref")
+        if pid is None:
+            raise KeyError(f"Row {row.get('id')!r} has neither 'messages' nor 'prompt_ref'")
+        if self._skeletons is None or pid not in self._skeletons:
+            self._skeletons = load_skeletons(self.prompts_file)
+        try:
+            skeleton = self._skeletons[pid]
+        except KeyError:
+            raise KeyError(f"prompt_ref {pid} not found in {self.prompts_file}") from None
+        return fill_skeleton(skeleton, str(row.get("source", "")))
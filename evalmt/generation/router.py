@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional
+
+import httpx
+
+from ..utils.net import probe_openai_server
+
+ROUTER_POLICIES = ("least-outstanding", "p2c")
+
+
+def parse_api_bases(value: str) -> List[str]:
+    """Split a comma/whitespace separated `--api-base` value into endpoints."""
+
+    bases = [b.strip() for b in value.replace(" ", ",").split(",") if b.strip()]
+    if not bases:
+        raise ValueError("--api-base must name at least one endpoint")
+    # keep order, drop duplicates
+    return list(dict.fromkeys(bases))
+
+
+@dataclass
+class Endpoint:
+    api_base: str
+    healthy: bool = True
+    outstanding: int = 0
+    cancelled: int = 0
+    completed: int = 0
+    failed: int = 0
+    busy_s: float = 0.0
+    first_ts: Optional[float] = None
+    last_ts: Optional[float] = None
+    # circuit breaker
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+    trips: int = 0
+    cooldown_level: int = 0
+    probing: bool = False
+
+    @property
+    def throughput(self) -> float:
+        if self.first_ts is None or self.last_ts is None or self.last_ts <= self.first_ts:
+            return 0.0
+        return self.completed / (self.last_ts - self.first_ts)
+
+    @property
+    def mean_latency_s(self) -> float:
+        return self.busy_s / self.completed if self.completed else 0.0
+
+    def summary(self) -> str:
+        state = "up" if self.healthy else "DOWN"
+        if self.trips:
+            state += f", breaker tripped x{self.trips}"
+        return (
+            f"{self.api_base} [{state}] done={self.completed} failed={self.failed} cancelled={self.cancelled} "
+            f"rps={self.throughput:.2f} lat_avg={self.mean_latency_s:.2f}s"
+        )
+
+
+@dataclass
+class EndpointRouter:
+    """Client-side load balancer over several OpenAI-compatible replicas.
+
+    Endpoints that refuse connections are taken out of rotation and
+    re-admitted by the periodic `/v1/models` probe. Every endpoint also has a
+    circuit breaker: after ``breaker_threshold`` consecutive failures
+    (transport errors, 5xx, 429) it is skipped for a cooldown that doubles on
+    every re-trip, then a single half-open trial request decides whether it
+    closes again. When every breaker is open, :meth:`lease` waits for the
+    first one to reopen instead of hammering the cluster.
+    """
+
+    api_bases: List[str]
+    policy: str = "least-outstanding"
+    probe_interval_s: float = 10.0
+    breaker_threshold: int = 5
+    breaker_cooldown_s: float = 5.0
+    breaker_max_cooldown_s: float = 120.0
+    endpoints: List[Endpoint] = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.policy not in ROUTER_POLICIES:
+            raise ValueError(f"Unknown router policy: {self.policy}. Choices={list(ROUTER_POLICIES)}")
+        self.endpoints = [Endpoint(api_base=b) for b in self.api_bases]
+        self._rng = random.Random(0)
+
+    def _admits(self, ep: Endpoint, now: float) -> bool:
+        if ep.consecutive_failures < self.breaker_threshold:
+            return True
+        # open until the cooldown ends, then half-open for one trial request
+        return now >= ep.open_until and not ep.probing
+
+    def pick(self, exclude: Optional[str] = None) -> Optional[Endpoint]:
+        """Choose an endpoint, or ``None`` while every breaker is open."""
+
+        now = time.monotonic()
+        pool = [e for e in self.endpoints if e.healthy] or self.endpoints
+        pool = [e for e in pool if self._admits(e, now)]
+        if not pool:
+            return None
+        if exclude is not None and len(pool) > 1:
+            pool = [e for e in pool if e.api_base != exclude] or pool
+        if len(pool) == 1:
+            return pool[0]
+        if self.policy == "p2c":
+            a, b = self._rng.sample(pool, 2)
+            return a if a.outstanding <= b.outstanding else b
+        return min(pool, key=lambda e: (e.outstanding, e.completed))
+
+    async def _wait_pick(self, exclude: Optional[str]) -> Endpoint:
+        while True:
+            ep = self.pick(exclude)
+            if ep is not None:
+                return ep
+            reopen = min(e.open_until for e in self.endpoints) - time.monotonic()
+            await asyncio.sleep(max(0.05, reopen))
+
+    def _record_failure(self, ep: Endpoint, *, trial: bool) -> None:
+        was_open = ep.consecutive_failures >= self.breaker_threshold
+        ep.consecutive_failures += 1
+        if was_open and not trial:
+            # a request sent before the breaker opened; already accounted for
+            return
+        if ep.consecutive_failures < self.breaker_threshold:
+            return
+        # each failed half-open trial doubles the cooldown; a close resets it
+        ep.cooldown_level = ep.cooldown_level + 1 if trial else 0
+        cooldown = min(self.breaker_max_cooldown_s, self.breaker_cooldown_s * 2 ** min(ep.cooldown_level, 16))
+        ep.open_until = time.monotonic() + cooldown
+        ep.trips += 1
+        print(
+            f"[router] {ep.api_base} breaker open for {cooldown:.0f}s "
+            f"({ep.consecutive_failures} consecutive failures)"
+        )
+
+    def _record_success(self, ep: Endpoint) -> None:
+        if ep.consecutive_failures >= self.breaker_threshold:
+            print(f"[router] {ep.api_base} breaker closed")
+        ep.consecutive_failures = 0
+        ep.cooldown_level = 0
+
+    @asynccontextmanager
+    async def lease(self, endpoint: Optional[Endpoint] = None, exclude: Optional[str] = None) -> AsyncIterator[Endpoint]:
+        ep = endpoint or await self._wait_pick(exclude)
+        half_open = ep.consecutive_failures >= self.breaker_threshold
+        if half_open:
+            ep.probing = True
+        ep.outstanding += 1
+        t0 = time.perf_counter()
+        if ep.first_ts is None:
+            ep.first_ts = t0
+        try:
+            yield ep
+        except httpx.RequestError as exc:
+            ep.failed += 1
+            if isinstance(exc, httpx.ConnectError) and len(self.endpoints) > 1:
+                ep.healthy = False
+            self._record_failure(ep, trial=half_open)
+            raise
+        except httpx.HTTPStatusError as exc:
+            ep.failed += 1
+            if exc.response.status_code >= 500 or exc.response.status_code == 429:
+                self._record_failure(ep, trial=half_open)
+            raise
+        except asyncio.CancelledError:
+            # Hedge losers and shutdown; not the endpoint's fault.
+            ep.cancelled += 1
+            raise
+        except BaseException:
+            ep.failed += 1
+            raise
+        else:
+            t1 = time.perf_counter()
+            ep.completed += 1
+            ep.busy_s += t1 - t0
+            ep.last_ts = t1
+            self._record_success(ep)
+        finally:
+            ep.outstanding -= 1
+            if half_open:
+                ep.probing = False
+
+    async def probe_all(self, client: httpx.AsyncClient) -> None:
+        results = await asyncio.gather(*(probe_openai_server(client, e.api_base) for e in self.endpoints))
+        for ep, ok in zip(self.endpoints, results):
+            if ep.healthy != ok:
+                print(f"[router] {ep.api_base} -> {'up' if ok else 'DOWN'}")
+            ep.healthy = ok
+
+    async def health_loop(self, client: httpx.AsyncClient) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval_s)
+            await self.probe_all(client)
+
+    def summary(self) -> List[str]:
+        return [e.summary() for e in self.endpoints]
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import json
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+DISPATCH_ORDERS = ("file", "longest-first", "bucketed")
+
+LengthFn = Callable[[str], int]
+
+# (file_no, row_no) arrays in dispatch order, see dispatch_plan().
+DispatchPlan = Tuple[np.ndarray, np.ndarray]
+
+MAX_LENGTH = 2**32 - 1
+
+
+def char_length(text: str) -> int:
+    return len(text or "")
+
+
+def tokenizer_length(model_id: str) -> LengthFn:
+    """Token-count estimator backed by the model's HF tokenizer (needs transformers)."""
+
+    try:
+        from transformers import AutoTokenizer
+    except ImportError as exc:
+        raise ImportError("--length-estimator tokenizer requires 'transformers'") from exc
+    tok = AutoTokenizer.from_pretrained(model_id)
+    cache: Dict[str, int] = {}
+
+    def _len(text: str) -> int:
+        text = text or ""
+        n = cache.get(text)
+        if n is None:
+            n = cache[text] = len(tok.encode(text, add_special_tokens=False))
+        return n
+
+    return _len
+
+
+class LengthIndex:
+    """Byte offsets and estimated lengths of the pending rows of one input file.
+
+    Two compact arrays per file, so ordering a multi-million row set does not
+    keep any row in memory; rows are re-read by offset at dispatch time.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.offsets = array("q")
+        self.lengths = array("I")
+
+    @classmethod
+    def scan(
+        cls,
+        path: Path,
+        *,
+        length_fn: LengthFn,
+        skip: Optional[Callable[[Any], bool]] = None,
+        field: str = "source",
+    ) -> "LengthIndex":
+        idx = cls(path)
+        offset = 0
+        with path.open("rb") as f:
+            for raw in f:
+                line = raw.strip()
+                if line:
+                    row = json.loads(line)
+                    if skip is None or not skip(row.get("id")):
+                        idx.offsets.append(offset)
+                        idx.lengths.append(min(length_fn(row.get(field) or ""), MAX_LENGTH))
+                offset += len(raw)
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def read(self, f, i: int) -> Dict[str, Any]:
+        f.seek(self.offsets[i])
+        return json.loads(f.readline())
+
+
+def dispatch_plan(
+    indexes: List[LengthIndex],
+    *,
+    order: str,
+    buckets: int = 8,
+) -> DispatchPlan:
+    """Return (file_no, row_no) arrays in dispatch order across all files.
+
+    - longest-first: strictly by estimated length, descending.
+    - bucketed: length quantile buckets, longest bucket first, file order within
+      a bucket (keeps locality while still front-loading long rows).
+
+    Rows are sorted as indices into one concatenated length array (stable, so
+    ties keep file order); no per-row Python objects are built.
+    """
+
+    if order not in DISPATCH_ORDERS:
+        raise ValueError(f"Unknown dispatch order: {order}. Choices={list(DISPATCH_ORDERS)}")
+    counts = np.array([len(idx) for idx in indexes], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(counts)))
+    lengths = (
+        np.concatenate([np.frombuffer(idx.lengths, dtype=np.uint32) for idx in indexes])
+        if indexes
+        else np.zeros(0, dtype=np.uint32)
+    )
+
+    if order == "file" or not len(lengths):
+        ranked = np.arange(len(lengths), dtype=np.int64)
+    elif order == "longest-first":
+        ranked = np.argsort(-lengths.astype(np.int64), kind="stable")
+    else:
+        sorted_lengths = np.sort(lengths)
+        nb = max(1, buckets)
+        n = len(sorted_lengths)
+        bounds = sorted_lengths[[min(n - 1, (n * k) // nb) for k in range(1, nb)]]
+        bucket = np.searchsorted(bounds, lengths, side="right")
+        ranked = np.argsort(-bucket, kind="stable")
+
+    file_nos = np.searchsorted(starts, ranked, side="right") - 1
+    row_nos = ranked - starts[file_nos]
+    return file_nos.astype(np.uint32), row_nos.astype(np.uint32)
+
+
+def iter_planned_rows(
+    indexes: List[LengthIndex],
+    plan: DispatchPlan,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    handles: Dict[int, Any] = {}
+    try:
+        for fi, ri in zip(*plan):
+            fi, ri = int(fi), int(ri)
+            f = handles.get(fi)
+            if f is None:
+                f = handles[fi] = indexes[fi].path.open("rb")
+            yield fi, indexes[fi].read(f, ri)
+    finally:
+        for f in handles.values():
+            f.close()
+
+
+def tail_summary(start: float, end: float, last_dispatch: Optional[float], last_full: Optional[float]) -> str:
+    """Wall time spent after the last dispatch and after the batch was last full.
+
+    The second number is the drain tail: the stretch where fewer requests than
+    the concurrency limit were in flight. Compare it across --dispatch-order
+    settings to see what length-aware scheduling saves.
+    """
+
+    wall = max(0.0, end - start)
+    after_dispatch = end - last_dispatch if last_dispatch is not None else 0.0
+    drain = end - last_full if last_full is not None else wall
+    share = drain / wall if wall > 0 else 0.0
+    return (
+        f"wall={wall:.1f}s after_last_dispatch={after_dispatch:.1f}s "
+        f"tail_below_limit={drain:.1f}s ({share:.1%} of wall)"
+    )
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .concurrency import percentile
+
+
+def gen_stats_path(gen_dir: Path, model: str) -> Path:
+    """``outputs/<run>/gen/<model>.gen_stats.json``."""
+
+    return gen_dir / f"{model}.gen_stats.json"
+
+
+@dataclass
+class GenStats:
+    """Usage/latency accumulator for one (dataset, lp) or for a whole run."""
+
+    rows: int = 0
+    cached: int = 0
+    failed: int = 0
+    attempts: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latencies: List[float] = field(default_factory=list)
+    first_ts: Optional[float] = None
+    last_ts: Optional[float] = None
+
+    def start(self, ts: Optional[float] = None) -> None:
+        if self.first_ts is None:
+            self.first_ts = time.monotonic() if ts is None else ts
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Account one written output row (``usage``/``latency_s``/``retries``/``cached``)."""
+
+        self.rows += 1
+        self.last_ts = time.monotonic()
+        retries = int(row.get("retries") or 0)
+        self.retries += retries
+        if row.get("cached"):
+            self.cached += 1
+            return
+        self.attempts += retries + 1
+        usage = row.get("usage") or {}
+        self.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+        self.completion_tokens += int(usage.get("completion_tokens") or 0)
+        if row.get("latency_s") is not None:
+            self.latencies.append(float(row["latency_s"]))
+
+    def add_failure(self, attempts: int = 1) -> None:
+        self.failed += 1
+        self.attempts += attempts
+        self.last_ts = time.monotonic()
+
+    @property
+    def wall_s(self) -> float:
+        if self.first_ts is None or self.last_ts is None:
+            return 0.0
+        return max(0.0, self.last_ts - self.first_ts)
+
+    @property
+    def completion_tokens_per_s(self) -> Optional[float]:
+        # Counters only (no latency sort), so /metrics can read it from its thread.
+        wall = self.wall_s
+        return round(self.completion_tokens / wall, 2) if wall > 0 else None
+
+    @property
+    def error_rate(self) -> float:
+        # Every retry is one failed attempt; failed rows add their last attempt.
+        if self.attempts <= 0:
+            return 0.0
+        return (self.retries + self.failed) / self.attempts
+
+    def to_dict(self) -> Dict[str, Any]:
+        wall = self.wall_s
+        return {
+            "rows": self.rows,
+            "cached": self.cached,
+            "failed": self.failed,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "error_rate": round(self.error_rate, 6),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "wall_s": round(wall, 3),
+            "rows_per_s": round(self.rows / wall, 3) if wall > 0 else None,
+            "completion_tokens_per_s": self.completion_tokens_per_s,
+            "latency_p50_s": round(percentile(self.latencies, 50), 4),
+            "latency_p95_s": round(percentile(self.latencies, 95), 4),
+            "latency_p99_s": round(percentile(self.latencies, 99), 4),
+        }
+
+
+# GenStats.to_dict() fields that add up across invocations of the same job.
+ADDITIVE_FIELDS = (
+    "rows",
+    "cached",
+    "failed",
+    "attempts",
+    "retries",
+    "prompt_tokens",
+    "completion_tokens",
+    "wall_s",
+)
+LATENCY_FIELDS = ("latency_p50_s", "latency_p95_s", "latency_p99_s")
+
+
+def merge_stats(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Combine two :meth:`GenStats.to_dict` results of separate invocations.
+
+    Counters and wall time are summed and the rates recomputed from them.
+    Percentiles cannot be combined, so they come from the newer invocation
+    unless it sent no uncached request.
+    """
+
+    out = {**old, **new}
+    for k in ADDITIVE_FIELDS:
+        out[k] = (old.get(k) or 0) + (new.get(k) or 0)
+    out["wall_s"] = round(out["wall_s"], 3)
+    out["invocations"] = int(old.get("invocations") or 1) + int(new.get("invocations") or 1)
+    attempts, wall = out["attempts"], out["wall_s"]
+    out["error_rate"] = round((out["retries"] + out["failed"]) / attempts, 6) if attempts > 0 else 0.0
+    out["rows_per_s"] = round(out["rows"] / wall, 3) if wall > 0 else None
+    out["completion_tokens_per_s"] = round(out["completion_tokens"] / wall, 2) if wall > 0 else None
+    if (new.get("rows") or 0) <= (new.get("cached") or 0):
+        for k in LATENCY_FIELDS:
+            out[k] = old.get(k, out.get(k))
+    return out
+
+
+class RunStats:
+    """Per-(dataset, lp) :class:`GenStats` plus a run total."""
+
+    def __init__(self, model: str) -> None:
+        self.model = model
+        self.total = GenStats()
+        self.by_job: Dict[str, GenStats] = {}
+
+    def job(self, dataset: str, lp: str) -> GenStats:
+        key = f"{dataset}/{lp}"
+        st = self.by_job.get(key)
+        if st is None:
+            st = self.by_job[key] = GenStats()
+        return st
+
+    def start(self, dataset: str, lp: str) -> None:
+        now = time.monotonic()
+        self.total.start(now)
+        self.job(dataset, lp).start(now)
+
+    def add(self, dataset: str, lp: str, row: Dict[str, Any]) -> None:
+        self.total.add(row)
+        self.job(dataset, lp).add(row)
+
+    def add_failure(self, dataset: str, lp: str, attempts: int = 1) -> None:
+        self.total.add_failure(attempts)
+        self.job(dataset, lp).add_failure(attempts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        by_job = {}
+        for key, st in sorted(self.by_job.items()):
+            dataset, lp = key.split("/", 1)
+            by_job[key] = {"dataset": dataset, "lp": lp, **st.to_dict()}
+        return {"model": self.model, "total": self.total.to_dict(), "by_job": by_job}
+
+    def write(self, path: Path) -> None:
+        """Merge this invocation into ``path``.
+
+        Jobs of earlier invocations (other lps, or earlier passes over the
+        same file such as a resume or ``--retry-failed``) are kept; a job
+        seen again and the run total are combined with :func:`merge_stats`.
+        """
+
+        data = self.to_dict()
+        previous: Dict[str, Any] = {}
+        if path.exists():
+            try:
+                previous = json.loads(path.read_text(encoding="utf-8"))
+            except json.JSONDecodeError:
+                print(f"⚠️  {path} is not valid JSON; overwriting it")
+        if previous.get("model") == self.model:
+            by_job = dict(previous.get("by_job") or {})
+            for key, st in data["by_job"].items():
+                by_job[key] = merge_stats(by_job[key], st) if key in by_job else st
+            data["by_job"] = {key: by_job[key] for key in sorted(by_job)}
+            if previous.get("total"):
+                data["total"] = merge_stats(previous["total"], data["total"])
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        tmp.replace(path)
+
+    def summary(self) -> str:
+        d = self.total.to_dict()
+        tps = d["completion_tokens_per_s"]
+        return (
+            f"rows={d['rows']} cached={d['cached']} tokens={d['prompt_tokens']}+{d['completion_tokens']} "
+            f"tok/s={tps if tps is not None else '-'} p50={d['latency_p50_s']:.2f}s p95={d['latency_p95_s']:.2f}s "
+            f"p99={d['latency_p99_s']:.2f}s error_rate={d['error_rate']:.2%}"
+        )
@@ -1,11 +1,71 @@
 from __future__ import annotations
 
 import asyncio
+import email.utils
+import json
+import random
 import re
+import time
+from dataclasses import dataclass
 from typing import Any, Dict, List, Optional
 
 import httpx
 
+from .abort import ABORT_FINISH_REASON, AbortMonitor
+from .cache import ResponseCache, request_key
+from .concurrency import ConcurrencyLimiter, percentile
+from .hedging import HedgePolicy
+from .router import EndpointRouter
+
+# Responses that mean "server is overloaded" rather than "request is bad".
+OVERLOAD_STATUS = (429, 503)
+
+# Asked with the streamed character count whether a check is due, then
+# called with the text so far; returns a reason to cancel, or None.
+AbortCheck = AbortMonitor
+
+# 4xx responses worth retrying; any other 4xx means the request itself is bad.
+RETRYABLE_4XX = (408, 409, 429)
+
+# Full-jitter exponential backoff between retries: U(0, min(cap, base * 2^n)).
+BACKOFF_BASE_S = 1.0
+BACKOFF_CAP_S = 30.0
+
+
+class RequestFailed(Exception):
+    """A chat completion that failed after all retries (or with a non-retryable status)."""
+
+    def __init__(self, message: str, *, attempts: int, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.attempts = attempts
+        self.status = status
+
+
+def retry_after_s(exc: BaseException) -> Optional[float]:
+    """Seconds from a ``Retry-After`` header (delta-seconds or HTTP date), if any."""
+
+    if not isinstance(exc, httpx.HTTPStatusError):
+        return None
+    value = exc.response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        code = exc.response.status_code
+        return code >= 500 or code in RETRYABLE_4XX
+    return isinstance(exc, httpx.RequestError)
+
 
 def _chat_endpoint(api_base: str) -> str:
     base = api_base.rstrip("/")
@@ -44,6 +104,397 @@ def clean_translation(text: str) -> str:
     return t
 
 
+@dataclass
+class PoolStats:
+    """Connection-pool counters collected via httpcore trace events."""
+
+    requests: int = 0
+    connections_opened: int = 0
+    connect_time_s: float = 0.0
+
+    @property
+    def reuse_ratio(self) -> float:
+        if self.requests <= 0:
+            return 0.0
+        return max(0.0, 1.0 - self.connections_opened / self.requests)
+
+    @property
+    def mean_connect_ms(self) -> float:
+        if self.connections_opened <= 0:
+            return 0.0
+        return 1000.0 * self.connect_time_s / self.connections_opened
+
+    def summary(self) -> str:
+        return (
+            f"requests={self.requests} connections={self.connections_opened} "
+            f"reuse={self.reuse_ratio:.1%} connect_avg={self.mean_connect_ms:.1f}ms"
+        )
+
+
+class GenerationClient:
+    """Long-lived OpenAI-compatible client that owns a keep-alive connection pool.
+
+    One instance should be shared by every request of a run so TCP connections
+    are reused instead of being re-established per segment.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_connections: int = 16,
+        http2: bool = False,
+        timeout_s: float = 120.0,
+        keepalive_expiry_s: float = 60.0,
+        router: Optional[EndpointRouter] = None,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        cache: Optional[ResponseCache] = None,
+        hedge: Optional[HedgePolicy] = None,
+    ) -> None:
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("⚠️  http2 requested but 'h2' is not installed; falling back to HTTP/1.1")
+                http2 = False
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry_s,
+        )
+        self.http2 = http2
+        self.router = router
+        self.limiter = limiter
+        self.cache = cache
+        self.hedge = hedge
+        self.stats = PoolStats()
+        self._client = httpx.AsyncClient(timeout=timeout_s, limits=limits, http2=http2)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        return self._client
+
+    async def __aenter__(self) -> "GenerationClient":
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _trace(self):
+        started: Dict[str, float] = {}
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            if event_name == "connection.connect_tcp.started":
+                started["t"] = time.perf_counter()
+            elif event_name == "connection.connect_tcp.complete":
+                self.stats.connections_opened += 1
+                self.stats.connect_time_s += time.perf_counter() - started.get("t", time.perf_counter())
+
+        return trace
+
+    async def post_json(self, url: str, payload: Dict[str, Any], *, timeout_s: Optional[float] = None) -> Dict[str, Any]:
+        self.stats.requests += 1
+        kwargs: Dict[str, Any] = {"json": payload, "extensions": {"trace": self._trace()}}
+        if timeout_s is not None:
+            kwargs["timeout"] = timeout_s
+        r = await self._client.post(url, **kwargs)
+        r.raise_for_status()
+        return r.json()
+
+    async def stream_chat(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        *,
+        timeout_s: Optional[float] = None,
+        abort: Optional[AbortCheck] = None,
+    ) -> Dict[str, Any]:
+        """POST a ``stream: true`` chat completion and assemble the SSE chunks.
+
+        Returns a non-streamed-shaped response plus a ``timing`` block (TTFT and
+        inter-token latency). When ``abort`` fires the stream is closed, which
+        makes vLLM cancel the request, and ``finish_reason`` is ``"abort"``.
+        """
+
+        self.stats.requests += 1
+        kwargs: Dict[str, Any] = {"json": payload, "extensions": {"trace": self._trace()}}
+        if timeout_s is not None:
+            kwargs["timeout"] = timeout_s
+        parts: List[str] = []
+        n_chars = 0
+        checked_at = 0
+        finish_reason: Optional[str] = None
+        usage: Optional[Dict[str, Any]] = None
+        aborted: Optional[str] = None
+        t0 = time.perf_counter()
+        token_ts: List[float] = []
+        async with self._client.stream("POST", url, **kwargs) as r:
+            if r.is_error:
+                await r.aread()
+            r.raise_for_status()
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    # Read to the end of the body: leaving early makes httpx drop
+                    # the keep-alive connection (only an abort should do that).
+                    continue
+                chunk = json.loads(data)
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                for choice in chunk.get("choices") or []:
+                    delta = (choice.get("delta") or {}).get("content")
+                    if delta:
+                        token_ts.append(time.perf_counter())
+                        parts.append(delta)
+                        n_chars += len(delta)
+                    if choice.get("finish_reason"):
+                        finish_reason = choice["finish_reason"]
+                if abort is not None and abort.due(n_chars, checked_at):
+                    checked_at = n_chars
+                    aborted = abort("".join(parts))
+                    if aborted:
+                        finish_reason = ABORT_FINISH_REASON
+                        break
+        text = "".join(parts)
+        gaps = [b - a for a, b in zip(token_ts, token_ts[1:])]
+        timing: Dict[str, Any] = {
+            "latency_s": round(time.perf_counter() - t0, 4),
+            "ttft_s": round(token_ts[0] - t0, 4) if token_ts else None,
+            "itl_mean_s": round(sum(gaps) / len(gaps), 5) if gaps else None,
+            "itl_p95_s": round(percentile(gaps, 95), 5) if gaps else None,
+            "chunks": len(token_ts),
+        }
+        resp: Dict[str, Any] = {
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": finish_reason}],
+            "timing": timing,
+        }
+        if usage is not None:
+            resp["usage"] = usage
+        if aborted:
+            resp["aborted"] = aborted
+        return resp
+
+    async def _post(
+        self, url: str, payload: Dict[str, Any], timeout_s: float, abort: Optional[AbortCheck]
+    ) -> Dict[str, Any]:
+        if payload.get("stream"):
+            return await self.stream_chat(url, payload, timeout_s=timeout_s, abort=abort)
+        return await self.post_json(url, payload, timeout_s=timeout_s)
+
+    async def _timed_post(
+        self, api_base: str, payload: Dict[str, Any], timeout_s: float, abort: Optional[AbortCheck]
+    ) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        resp = await self._post(_chat_endpoint(api_base), payload, timeout_s, abort)
+        resp["meta"] = {"endpoint": api_base, "latency_s": round(time.perf_counter() - t0, 4)}
+        return resp
+
+    async def _send(
+        self,
+        api_base: Optional[str],
+        payload: Dict[str, Any],
+        timeout_s: float,
+        abort: Optional[AbortCheck] = None,
+        *,
+        exclude: Optional[str] = None,
+        picked: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        if api_base is not None:
+            return await self._timed_post(api_base, payload, timeout_s, abort)
+        async with self.router.lease(exclude=exclude) as ep:
+            if picked is not None:
+                picked["endpoint"] = ep.api_base
+            return await self._timed_post(ep.api_base, payload, timeout_s, abort)
+
+    async def _hedged_send(self, api_base: Optional[str], payload: Dict[str, Any], timeout_s: float) -> Dict[str, Any]:
+        """Send once; if it outlives the hedge delay, race a duplicate on another endpoint.
+
+        The first successful answer wins and the other request is cancelled
+        (closing its connection makes vLLM drop it).
+        """
+
+        hedge = self.hedge
+        hedge.requests += 1
+        t0 = time.perf_counter()
+        picked: Dict[str, str] = {}
+        primary = asyncio.ensure_future(self._send(api_base, payload, timeout_s, picked=picked))
+        try:
+            delay = hedge.delay()
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done:
+                    if hedge.try_start():
+                        return await self._race(primary, api_base, payload, timeout_s, picked.get("endpoint"), t0)
+                    resp = await primary
+                    hedge.record_slow_primary(time.perf_counter() - t0)
+                    hedge.record(time.perf_counter() - t0)
+                    return resp
+            resp = await primary
+            hedge.record(time.perf_counter() - t0)
+            return resp
+        finally:
+            if not primary.done():
+                primary.cancel()
+
+    async def _race(
+        self,
+        primary: "asyncio.Future[Dict[str, Any]]",
+        api_base: Optional[str],
+        payload: Dict[str, Any],
+        timeout_s: float,
+        primary_endpoint: Optional[str],
+        t0: float,
+    ) -> Dict[str, Any]:
+        hedge = self.hedge
+        backup = asyncio.ensure_future(self._send(api_base, payload, timeout_s, exclude=primary_endpoint))
+        racers = {primary, backup}
+        winner: Optional[asyncio.Future] = None
+        try:
+            while racers:
+                done, racers = await asyncio.wait(racers, return_when=asyncio.FIRST_COMPLETED)
+                ok = [t for t in done if t.exception() is None]
+                if ok:
+                    winner = primary if primary in ok else ok[0]
+                    break
+            if winner is None:
+                # Both failed: surface the primary's error to the retry loop.
+                return primary.result()
+            resp = winner.result()
+            latency = time.perf_counter() - t0
+            if winner is backup:
+                resp["meta"]["hedged"] = True
+            else:
+                hedge.record_slow_primary(latency)
+            hedge.record(latency)
+            return resp
+        finally:
+            hedge.finish(hedge_won=winner is backup, latency_s=time.perf_counter() - t0)
+            for t in (primary, backup):
+                if not t.done():
+                    t.cancel()
+            await asyncio.gather(primary, backup, return_exceptions=True)
+
+    async def _dispatch(
+        self, api_base: Optional[str], payload: Dict[str, Any], timeout_s: float, abort: Optional[AbortCheck]
+    ) -> Dict[str, Any]:
+        # Streamed requests carry a stateful per-row abort monitor; not hedged.
+        if self.hedge is not None and not payload.get("stream"):
+            return await self._hedged_send(api_base, payload, timeout_s)
+        return await self._send(api_base, payload, timeout_s, abort)
+
+    async def _attempt(
+        self, api_base: Optional[str], payload: Dict[str, Any], timeout_s: float, abort: Optional[AbortCheck] = None
+    ) -> Dict[str, Any]:
+        if self.limiter is None:
+            return await self._dispatch(api_base, payload, timeout_s, abort)
+        async with self.limiter.slot():
+            t0 = time.perf_counter()
+            try:
+                resp = await self._dispatch(api_base, payload, timeout_s, abort)
+            except httpx.TimeoutException:
+                self.limiter.record_overload()
+                raise
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code in OVERLOAD_STATUS:
+                    self.limiter.record_overload()
+                raise
+            self.limiter.record_latency(time.perf_counter() - t0)
+            return resp
+
+    async def chat_completion(
+        self,
+        *,
+        api_base: Optional[str] = None,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        top_p: float,
+        max_tokens: int,
+        stop: Optional[List[str]] = None,
+        response_format: Optional[Dict[str, Any]] = None,
+        timeout_s: float = 120.0,
+        max_retries: int = 3,
+        stream: bool = False,
+        abort: Optional[AbortCheck] = None,
+        n: int = 1,
+        best_of: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """POST a chat completion with retries.
+
+        Without ``api_base`` the request is routed through ``self.router``;
+        every retry re-picks an endpoint so a dead replica is skipped.
+        ``stream=True`` uses SSE (see :meth:`stream_chat`); ``abort`` is only
+        consulted in that mode.
+
+        ``n > 1`` asks for several sampled choices in one request (the prompt
+        is prefilled once); ``best_of`` is passed through for vLLM builds that
+        support it. Read them with :func:`extract_texts`.
+
+        The response carries a ``meta`` block (serving endpoint, latency of
+        the successful attempt, retry count, cache hit) that is never cached.
+        """
+
+        if api_base is None and self.router is None:
+            raise ValueError("chat_completion needs api_base or a client router")
+
+        payload: Dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+        }
+        if stop:
+            payload["stop"] = stop
+        if response_format:
+            payload["response_format"] = response_format
+        if n > 1:
+            payload["n"] = n
+        if best_of is not None and best_of > n:
+            payload["best_of"] = best_of
+
+        cache_key = None
+        if self.cache is not None and self.cache.cacheable(payload):
+            cache_key = request_key(payload)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                cached["meta"] = {"endpoint": None, "latency_s": 0.0, "retries": 0, "cached": True}
+                return cached
+        if stream:
+            # Added after the cache key so streamed and plain requests share entries.
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+
+        for attempt in range(max_retries + 1):
+            try:
+                resp = await self._attempt(api_base, payload, timeout_s, abort)
+                resp["meta"].update(retries=attempt, cached=False)
+                if cache_key is not None and resp.get("choices") and not resp.get("aborted"):
+                    self.cache.put(cache_key, {k: v for k, v in resp.items() if k not in ("timing", "meta")})
+                return resp
+            except (httpx.RequestError, httpx.HTTPStatusError) as exc:
+                status = exc.response.status_code if isinstance(exc, httpx.HTTPStatusError) else None
+                if attempt >= max_retries or not _retryable(exc):
+                    raise RequestFailed(
+                        f"{type(exc).__name__}: {exc}", attempts=attempt + 1, status=status
+                    ) from exc
+                # With a router, a tripped endpoint is skipped on the next
+                # attempt and lease() waits while every breaker is open, so the
+                # jittered sleep only spreads out the retries.
+                delay = random.uniform(0.0, min(BACKOFF_CAP_S, BACKOFF_BASE_S * 2**attempt))
+                hinted = retry_after_s(exc)
+                if hinted is not None:
+                    delay = max(delay, min(hinted, BACKOFF_CAP_S * 4))
+                await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+
 async def chat_completion(
     *,
     api_base: str,
@@ -56,33 +507,26 @@ async def chat_completion(
     response_format: Optional[Dict[str, Any]] = None,
     timeout_s: float = 120.0,
     max_retries: int = 3,
+    client: Optional[GenerationClient] = None,
 ) -> Dict[str, Any]:
-    url = _chat_endpoint(api_base)
-
-    payload: Dict[str, Any] = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-        "top_p": top_p,
-        "max_tokens": max_tokens,
-    }
-    if stop:
-        payload["stop"] = stop
-    if response_format:
-        payload["response_format"] = response_format
-
-    backoff = 1.5
-    for attempt in range(max_retries + 1):
-        try:
-            async with httpx.AsyncClient(timeout=timeout_s) as client:
-                r = await client.post(url, json=payload)
-                r.raise_for_status()
-                return r.json()
-        except (httpx.RequestError, httpx.HTTPStatusError):
-            if attempt >= max_retries:
-                raise
-            await asyncio.sleep(backoff)
-            backoff *= 2.0
+    """One-shot chat completion. Pass ``client`` to reuse a pooled connection."""
+
+    kwargs: Dict[str, Any] = dict(
+        api_base=api_base,
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        top_p=top_p,
+        max_tokens=max_tokens,
+        stop=stop,
+        response_format=response_format,
+        timeout_s=timeout_s,
+        max_retries=max_retries,
+    )
+    if client is not None:
+        return await client.chat_completion(**kwargs)
+    async with GenerationClient(max_connections=1, timeout_s=timeout_s) as tmp:
+        return await tmp.chat_completion(**kwargs)
 
 
 def extract_text(resp: Dict[str, Any]) -> str:
@@ -90,3 +534,22 @@ def extract_text(resp: Dict[str, Any]) -> str:
         return resp["choices"][0]["message"]["content"]
     except Exception:
         return ""
+
+
+def extract_texts(resp: Dict[str, Any]) -> List[str]:
+    """Contents of all choices, ordered by choice index (``n > 1`` requests)."""
+
+    choices = sorted(resp.get("choices") or [], key=lambda c: c.get("index", 0))
+    return [(c.get("message") or {}).get("content") or "" for c in choices]
+
+
+def extract_finish_reasons(resp: Dict[str, Any]) -> List[Optional[str]]:
+    choices = sorted(resp.get("choices") or [], key=lambda c: c.get("index", 0))
+    return [c.get("finish_reason") for c in choices]
+
+
+def extract_finish_reason(resp: Dict[str, Any]) -> Optional[str]:
+    try:
+        return resp["choices"][0].get("finish_reason")
+    except Exception:
+        return None
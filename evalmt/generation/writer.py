@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+import queue
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from .checkpoint import CheckpointedWriter
+
+
+class ReorderBuffer:
+    """Holds out-of-order completions and releases them in input order.
+
+    Sequence numbers must be dense (0, 1, 2, ...). A ``None`` row marks a
+    sequence number that will never produce output (e.g. a failed row) so it
+    does not block the rows behind it.
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = max(1, window)
+        self.next_seq = 0
+        self._held: Dict[int, Optional[Dict[str, Any]]] = {}
+
+    def can_admit(self, seq: int) -> bool:
+        return seq < self.next_seq + self.window
+
+    def push(self, seq: int, row: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        self._held[seq] = row
+        ready: List[Dict[str, Any]] = []
+        while self.next_seq in self._held:
+            r = self._held.pop(self.next_seq)
+            if r is not None:
+                ready.append(r)
+            self.next_seq += 1
+        return ready
+
+    def __len__(self) -> int:
+        return len(self._held)
+
+
+_CLOSE = object()
+_STOP = object()
+
+
+class BackgroundWriter:
+    """Serializes and writes generation rows on a dedicated thread.
+
+    The asyncio loop only enqueues row dicts; ``json.dumps``, file writes and
+    checkpoint flushes happen here, batched per queue drain.
+    """
+
+    def __init__(self, *, max_batch: int = 256, max_queue: int = 10000) -> None:
+        self.max_batch = max_batch
+        self._q: "queue.Queue[Tuple[Any, Any]]" = queue.Queue(maxsize=max_queue)
+        self._error: Optional[BaseException] = None
+        self.rows_written = 0
+        self._thread = threading.Thread(target=self._run, name="evalmt-writer", daemon=True)
+        self._thread.start()
+
+    def _check(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("background writer failed") from self._error
+
+    def submit(self, writer: CheckpointedWriter, rows: List[Dict[str, Any]]) -> None:
+        self._check()
+        if rows:
+            self._q.put((writer, rows))
+
+    def close_file(self, writer: CheckpointedWriter) -> None:
+        self._check()
+        self._q.put((writer, _CLOSE))
+
+    def shutdown(self) -> None:
+        """Drain the queue, close the thread and re-raise any write error."""
+
+        self._q.put((None, _STOP))
+        self._thread.join()
+        self._check()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._q.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            touched: Dict[int, CheckpointedWriter] = {}
+            stop = False
+            for writer, item in batch:
+                if item is _STOP:
+                    stop = True
+                    continue
+                if self._error is not None:
+                    continue
+                try:
+                    if item is _CLOSE:
+                        touched.pop(id(writer), None)
+                        writer.close()
+                        continue
+                    for row in item:
+                        line = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+                        writer.write(row.get("id"), line)
+                        self.rows_written += 1
+                    touched[id(writer)] = writer
+                except BaseException as exc:  # surfaced on the loop side via _check()
+                    self._error = exc
+            for writer in touched.values():
+                try:
+                    writer.maybe_flush()
+                except BaseException as exc:
+                    self._error = exc
+            if stop:
+                return
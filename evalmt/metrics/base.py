@@ -1,15 +1,111 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..utils.telemetry import REGISTRY
+from .cache import ScoreCache, cached_predict, metric_identity
+
+# Coarse stages reported on /metrics as evalmt_score_phase{state=...}.
+SCORE_PHASES = ["load", "prepare", "predict", "write", "done"]
+
+# Generation-only payload not copied into metric outputs (older gen files
+# embed the full chat messages; newer ones only keep a small prompt_ref;
+# n-best rows carry all sampled candidates; chunked doc rows carry per-chunk
+# provenance).
+GEN_ONLY_FIELDS = ("messages", "candidates", "candidate_counts", "chunks", "source_segments")
+
+
+@dataclass
+class ScoreJob:
+    """One generation file to score and where its outputs go."""
+
+    name: str
+    gen_path: Path
+    out_path: Path
+    tmp_dir: Path
 
 
 class BaseMetric(ABC):
+    # Segment score cache consulted by predict_cached(); set by evalmt-score.
+    score_cache: Optional[ScoreCache] = None
+
     def __init__(self, metric_key: str, cfg: Dict[str, Any]) -> None:
         self.metric_key = metric_key
         self.cfg = cfg
 
+    @staticmethod
+    def output_row(row: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of a generation row for a metric output, minus :data:`GEN_ONLY_FIELDS`."""
+
+        return {k: v for k, v in row.items() if k not in GEN_ONLY_FIELDS}
+
+    def report_phase(self, phase: str, *, rows: Optional[int] = None) -> None:
+        REGISTRY.set_state("evalmt_score_phase", phase, SCORE_PHASES)
+        if rows is not None:
+            REGISTRY.set("evalmt_score_rows_in_phase", rows)
+
+    def load(self) -> None:
+        """Load model weights ahead of the first score call (kept on the instance).
+
+        Used by ``evalmt-score-server`` to keep models resident; metrics
+        without a model in this process (BLEU, MetricX's predict subprocess)
+        have nothing to load.
+        """
+
+    def unload(self) -> None:
+        """Drop the references :meth:`load` took (the server evicts a metric with this)."""
+
+    def predict_cached(
+        self,
+        inputs: List[Dict[str, Any]],
+        predict: Callable[[List[Dict[str, Any]]], Tuple[List[float], Optional[List[Any]]]],
+    ) -> Tuple[List[float], Optional[List[Any]]]:
+        """Run ``predict`` only on inputs not found in :attr:`score_cache`.
+
+        ``inputs`` must be exactly what the model sees (e.g. COMET's
+        context-joined src/mt/ref), since they are the cache key.
+        """
+
+        cache = self.score_cache
+        hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+        out = cached_predict(cache, metric_identity(self.cfg), inputs, predict)
+        if cache is not None:
+            REGISTRY.inc("evalmt_score_cache_hits_total", cache.hits - hits)
+            REGISTRY.inc("evalmt_score_cache_misses_total", cache.misses - misses)
+        return out
+
+    def input_fields(self) -> List[str]:
+        """Generation fields the score depends on; rows whose values changed are rescored by ``--incremental``."""
+
+        return [
+            str(self.cfg.get("src_field", "source")),
+            str(self.cfg.get("mt_field", "hypothesis")),
+            str(self.cfg.get("ref_field", "reference")),
+        ]
+
+    def context_groups(self, rows: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        """Per-row group whose rows must be rescored together (``None``: rows are independent)."""
+
+        return None
+
+    def system_score(self, rows: List[Dict[str, Any]]) -> Optional[float]:
+        """System score of scored output rows (``None``: the metric writes no system score)."""
+
+        return None
+
     @abstractmethod
     def score(self, *, gen_path: Path, out_path: Path, tmp_dir: Path) -> None:
         raise NotImplementedError
+
+    def score_many(self, jobs: List[ScoreJob], *, tmp_dir: Path) -> None:
+        """Score several generation files in one process.
+
+        The default scores them one by one; metrics with an expensive model
+        load override this to load once and predict all inputs together.
+        """
+
+        for job in jobs:
+            self.score(gen_path=job.gen_path, out_path=job.out_path, tmp_dir=job.tmp_dir)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+# Fields COMET encodes (``ref`` is absent in QE mode).
+COMET_FIELDS = ("src", "mt", "ref")
+
+
+def sample_lengths(samples: List[Dict[str, Any]], tokenizer: Any = None, *, max_length: Optional[int] = None) -> List[int]:
+    """Approximate encoder length of each sample, tokenizing every field once.
+
+    The fields are summed (unified models such as XCOMET/CometKiwi encode
+    them as one sequence) and capped at ``max_length``. Without a tokenizer
+    whitespace tokens are counted.
+    """
+
+    lengths = [0] * len(samples)
+    for field in COMET_FIELDS:
+        idxs = [i for i, s in enumerate(samples) if field in s]
+        if not idxs:
+            continue
+        texts = [str(samples[i][field] or "") for i in idxs]
+        if tokenizer is not None:
+            counts = [len(ids) + 2 for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+        else:
+            counts = [len(t.split()) + 2 for t in texts]
+        for i, n in zip(idxs, counts):
+            lengths[i] += n
+    if max_length:
+        lengths = [min(n, max_length) for n in lengths]
+    return lengths
+
+
+def plan_batches(lengths: Sequence[int], *, max_tokens: int, max_batch_size: int) -> List[List[int]]:
+    """Length-sorted batches whose padded size (rows x longest) stays within ``max_tokens``.
+
+    Longest samples come first, so an out-of-memory batch fails early.
+    Batch sizes are powers of two and never shrink along the plan, which
+    lets runs of equally sized batches share one ``predict`` call.
+    """
+
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches: List[List[int]] = []
+    pos = 0
+    size = 1
+    while pos < len(order):
+        allowed = max(1, min(max_batch_size, max_tokens // max(1, lengths[order[pos]])))
+        while size * 2 <= allowed:
+            size *= 2
+        batches.append(order[pos : pos + size])
+        pos += size
+    return batches
+
+
+def fixed_batches(n: int, batch_size: int) -> List[List[int]]:
+    """Row-count batches in input order (what ``predict(batch_size=...)`` does unsorted)."""
+
+    return [list(range(s, min(s + batch_size, n))) for s in range(0, n, batch_size)]
+
+
+def padding_efficiency(lengths: Sequence[int], batches: List[List[int]]) -> float:
+    """Real tokens / padded tokens over ``batches``."""
+
+    real = sum(lengths[i] for b in batches for i in b)
+    padded = sum(len(b) * max(lengths[i] for i in b) for b in batches if b)
+    return real / padded if padded else 1.0
+
+
+def group_runs(batches: List[List[int]]) -> List[List[List[int]]]:
+    """Consecutive batches of the same size, to be sent as one ``predict`` call each."""
+
+    runs: List[List[List[int]]] = []
+    for b in batches:
+        if runs and len(runs[-1][0]) == len(b) and len(runs[-1][-1]) == len(b):
+            runs[-1].append(b)
+        else:
+            runs.append([b])
+    return runs
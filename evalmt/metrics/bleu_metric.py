@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from sacrebleu.metrics import BLEU
 
@@ -58,14 +58,7 @@ class BleuMetric(BaseMetric):
             return "zh" if asian_support else None
         return None
 
-    def score(self, *, gen_path: Path, out_path: Path, tmp_dir: Path) -> None:
-        mode = self.cfg.get("mode", "ref")
-        if mode != "ref":
-            raise ValueError("BLEU is reference-based only (mode=ref).")
-
-        mt_field = str(self.cfg.get("mt_field", "hypothesis"))
-        ref_field = str(self.cfg.get("ref_field", "reference"))
-
+    def _bleu(self, rows: List[Dict[str, Any]]) -> BLEU:
         case_sensitive = self.cfg.get("case_sensitive", None)
         if case_sensitive is None:
             lowercase = bool(self.cfg.get("lowercase", False))
@@ -77,17 +70,6 @@ class BleuMetric(BaseMetric):
         max_ngram_order = self.cfg.get("max_ngram_order", None)
         effective_order = bool(self.cfg.get("effective_order", True))
 
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-
-        rows = list(iter_jsonl(gen_path))
-        if not rows:
-            raise ValueError(f"No rows to score in {gen_path}")
-
-        if any(mt_field not in r for r in rows):
-            raise KeyError(f"Missing '{mt_field}' field for BLEU input in {gen_path}")
-        if any(ref_field not in r for r in rows):
-            raise KeyError(f"Missing '{ref_field}' field for BLEU input in {gen_path}")
-
         tokenize = self.cfg.get("tokenize", None)
         if tokenize is None:
             tokenize = self.cfg.get("tokenizer", None)
@@ -106,18 +88,49 @@ class BleuMetric(BaseMetric):
         if max_ngram_order is not None:
             bleu_kwargs["max_ngram_order"] = int(max_ngram_order)
 
-        bleu = BLEU(**bleu_kwargs)
+        return BLEU(**bleu_kwargs)
+
+    def _hyps_refs(self, rows: List[Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+        mt_field = str(self.cfg.get("mt_field", "hypothesis"))
+        ref_field = str(self.cfg.get("ref_field", "reference"))
+        return [r.get(mt_field, "") or "" for r in rows], [r.get(ref_field, "") or "" for r in rows]
+
+    def system_score(self, rows: List[Dict[str, Any]]) -> Optional[float]:
+        # Corpus BLEU, not the mean of sentence scores.
+        hyps, refs = self._hyps_refs(rows)
+        return float(self._bleu(rows).corpus_score(hyps, [refs]).score)
+
+    def score(self, *, gen_path: Path, out_path: Path, tmp_dir: Path) -> None:
+        mode = self.cfg.get("mode", "ref")
+        if mode != "ref":
+            raise ValueError("BLEU is reference-based only (mode=ref).")
+
+        mt_field = str(self.cfg.get("mt_field", "hypothesis"))
+        ref_field = str(self.cfg.get("ref_field", "reference"))
+
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+
+        rows = list(iter_jsonl(gen_path))
+        if not rows:
+            raise ValueError(f"No rows to score in {gen_path}")
+
+        if any(mt_field not in r for r in rows):
+            raise KeyError(f"Missing '{mt_field}' field for BLEU input in {gen_path}")
+        if any(ref_field not in r for r in rows):
+            raise KeyError(f"Missing '{ref_field}' field for BLEU input in {gen_path}")
 
-        hyps = [r.get(mt_field, "") or "" for r in rows]
-        refs = [r.get(ref_field, "") or "" for r in rows]
+        bleu = self._bleu(rows)
+        hyps, refs = self._hyps_refs(rows)
 
+        self.report_phase("predict", rows=len(rows))
         scored_rows: List[Dict[str, Any]] = []
         for r, hyp, ref in zip(rows, hyps, refs):
-            rr = dict(r)
+            rr = self.output_row(r)
             rr["metric"] = self.metric_key
             rr["score"] = float(bleu.sentence_score(hyp, [ref]).score)
             scored_rows.append(rr)
 
+        self.report_phase("write", rows=len(rows))
         write_jsonl(out_path, scored_rows, append=False)
 
         sys_score = float(bleu.corpus_score(hyps, [refs]).score)
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..config import ROOT
+
+DEFAULT_SCORE_CACHE_PATH = ROOT / "outputs" / "_cache" / "segment_scores.sqlite"
+
+# Metric config keys that change throughput or bookkeeping but not the score.
+SCORE_CACHE_IGNORED_CFG = (
+    "batch_size",
+    "gpus",
+    "direction",
+    "cuda_visible_devices",
+    "token_batching",
+    "max_tokens_per_batch",
+    "max_batch_size",
+)
+
+# (score, error_spans) of one segment.
+CachedScore = Tuple[float, Any]
+
+
+def metric_identity(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a metric config that determines its scores."""
+
+    return {k: v for k, v in cfg.items() if k not in SCORE_CACHE_IGNORED_CFG}
+
+
+def score_key(identity: Dict[str, Any], model_input: Dict[str, Any]) -> str:
+    """Content hash of one metric input (exactly what the model sees) under one metric config."""
+
+    blob = json.dumps({"metric": identity, "input": model_input}, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ScoreCache:
+    """On-disk SQLite cache of segment scores keyed by :func:`score_key`.
+
+    Shared by every run, model and pipeline on the machine: a segment whose
+    inputs were scored before under the same metric config is not sent to
+    the model again.
+    """
+
+    def __init__(self, path: Path = DEFAULT_SCORE_CACHE_PATH) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " key TEXT PRIMARY KEY,"
+            " score REAL NOT NULL,"
+            " error_spans TEXT,"
+            " created REAL NOT NULL)"
+        )
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, CachedScore]:
+        """Cached entries among ``keys`` (hits and misses are counted per distinct key)."""
+
+        wanted = list(dict.fromkeys(keys))
+        found: Dict[str, CachedScore] = {}
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start : start + 500]
+            marks = ",".join("?" * len(chunk))
+            for key, score, spans in self._db.execute(
+                f"SELECT key, score, error_spans FROM scores WHERE key IN ({marks})", chunk
+            ):
+                found[key] = (float(score), json.loads(spans) if spans is not None else None)
+        self.hits += len(found)
+        self.misses += len(wanted) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[str, CachedScore]) -> None:
+        now = time.time()
+        rows = [
+            (key, float(score), json.dumps(spans, ensure_ascii=False) if spans is not None else None, now)
+            for key, (score, spans) in entries.items()
+        ]
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO scores(key, score, error_spans, created) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return f"hits={self.hits} misses={self.misses} hit_ratio={self.hit_ratio:.1%} path={self.path}"
+
+
+def cached_predict(
+    cache: Optional[ScoreCache],
+    identity: Dict[str, Any],
+    inputs: List[Dict[str, Any]],
+    predict: Any,
+) -> Tuple[List[float], Optional[List[Any]]]:
+    """Scores (and error spans, if any) of ``inputs``, predicting only unseen ones.
+
+    ``predict(unique_inputs) -> (scores, spans_or_None)`` runs the model on
+    the distinct inputs that are not cached; identical inputs within one call
+    are predicted once. Without a cache every input is predicted.
+    """
+
+    if cache is None:
+        scores, spans = predict(inputs)
+        return [float(s) for s in scores], (list(spans) if spans is not None else None)
+
+    keys = [score_key(identity, x) for x in inputs]
+    known = cache.get_many(keys)
+    todo: Dict[str, Dict[str, Any]] = {}
+    for key, x in zip(keys, inputs):
+        if key not in known and key not in todo:
+            todo[key] = x
+
+    any_spans = any(spans is not None for _, spans in known.values())
+    if todo:
+        scores, spans = predict(list(todo.values()))
+        if len(scores) != len(todo):
+            raise RuntimeError(f"Metric returned {len(scores)} scores for {len(todo)} inputs")
+        fresh: Dict[str, CachedScore] = {}
+        for i, key in enumerate(todo):
+            seg_spans = None
+            if spans is not None:
+                any_spans = True
+                try:
+                    seg_spans = spans[i]
+                except Exception:
+                    seg_spans = None
+            fresh[key] = (float(scores[i]), seg_spans)
+        cache.put_many(fresh)
+        known.update(fresh)
+
+    out_scores = [known[k][0] for k in keys]
+    out_spans = [known[k][1] for k in keys] if any_spans else None
+    return out_scores, out_spans
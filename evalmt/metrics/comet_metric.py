@@ -3,16 +3,30 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
-from comet import download_model, load_from_checkpoint
-
 from ..utils.jsonl import iter_jsonl, write_jsonl
+from ..utils.telemetry import REGISTRY
 from ..utils.text import infer_order_field, join_with_sep, normalize_text
-from .base import BaseMetric
+from .base import BaseMetric, ScoreJob
+from .batching import fixed_batches, group_runs, padding_efficiency, plan_batches, sample_lengths
 from .registry import register_metric
 
 
 @register_metric("comet")
 class CometMetric(BaseMetric):
+    _model: Any = None
+
+    def load(self) -> None:
+        if self._model is None:
+            # Imported here so that building the metric (field/group helpers for
+            # --incremental, clients handing the work to evalmt-score-server)
+            # does not pull in comet/torch/lightning.
+            from comet import download_model, load_from_checkpoint
+
+            self._model = load_from_checkpoint(download_model(self.cfg["model"]))
+
+    def unload(self) -> None:
+        self._model = None
+
     def _build_context_fields(
         self,
         rows: List[Dict[str, Any]],
@@ -99,13 +113,23 @@ class CometMetric(BaseMetric):
 
         return ctx_src, ctx_mt, ctx_ref
 
-    def score(self, *, gen_path: Path, out_path: Path, tmp_dir: Path) -> None:
-        model_id = self.cfg["model"]
+    def context_groups(self, rows: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        # A changed segment also changes the context of its document neighbours.
+        if int(self.cfg.get("context_window", 0)) <= 0:
+            return None
+        doc_field = str(self.cfg.get("context_doc_field", "document_id"))
+        if not doc_field or all(r.get(doc_field) is None for r in rows):
+            return ["__all__"] * len(rows)
+        return [r.get(doc_field) if r.get(doc_field) is not None else f"__missing_doc_{i}" for i, r in enumerate(rows)]
+
+    def system_score(self, rows: List[Dict[str, Any]]) -> Optional[float]:
+        # COMET's system score is the mean segment score.
+        return sum(float(r["score"]) for r in rows) / len(rows) if rows else None
+
+    def _comet_inputs(self, gen_path: Path) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Rows of one generation file and their COMET inputs (context stays within the file)."""
+
         mode = self.cfg.get("mode", "ref")  # ref | qe
-        batch_size = int(self.cfg.get("batch_size", 8))
-        gpus = int(self.cfg.get("gpus", 1))
-        export_spans = bool(self.cfg.get("export_error_spans", False))
-        enable_context = bool(self.cfg.get("enable_context", False))
         context_window = int(self.cfg.get("context_window", 0))
         context_sep = str(self.cfg.get("context_separator", "</s>"))
         context_sep_with_spaces = bool(self.cfg.get("context_separator_with_spaces", True))
@@ -118,11 +142,6 @@ class CometMetric(BaseMetric):
         mt_field = str(self.cfg.get("mt_field", "hypothesis"))
         ref_field = str(self.cfg.get("ref_field", "reference"))
 
-        out_path.parent.mkdir(parents=True, exist_ok=True)
-
-        model_path = download_model(model_id)
-        model = load_from_checkpoint(model_path)
-
         rows = list(iter_jsonl(gen_path))
         if not rows:
             raise ValueError(f"No rows to score in {gen_path}")
@@ -134,9 +153,6 @@ class CometMetric(BaseMetric):
         if mode != "qe" and any(ref_field not in r for r in rows):
             raise KeyError(f"Missing '{ref_field}' field for COMET input in {gen_path}")
 
-        if context_window > 0:
-            enable_context = True
-
         ctx_src, ctx_mt, ctx_ref = self._build_context_fields(
             rows,
             window=context_window,
@@ -158,30 +174,130 @@ class CometMetric(BaseMetric):
                 comet_in.append({"src": ctx_src[i], "mt": ctx_mt[i]})
             else:
                 comet_in.append({"src": ctx_src[i], "mt": ctx_mt[i], "ref": ctx_ref[i]})
+        return rows, comet_in
 
-        try:
-            out = model.predict(comet_in, batch_size=batch_size, gpus=gpus, enable_context=enable_context)
-        except TypeError:
-            out = model.predict(comet_in, batch_size=batch_size, gpus=gpus)
+    @staticmethod
+    def _predict_call(model: Any, samples: List[Dict[str, Any]], *, batch_size: int, gpus: int, enable_context: bool) -> Any:
+        # Batches are already length-sorted; COMET must not reorder them. Upstream
+        # COMET has no enable_context, so drop that first and keep
+        # length_batching=False; only very old versions get the bare call.
+        variants: List[Dict[str, Any]] = [{"length_batching": False}, {}]
+        if enable_context:
+            variants.insert(0, {"enable_context": True, "length_batching": False})
+        for extra in variants[:-1]:
+            try:
+                return model.predict(samples, batch_size=batch_size, gpus=gpus, **extra)
+            except TypeError:
+                continue
+        return model.predict(samples, batch_size=batch_size, gpus=gpus)
 
-        spans = None
-        if export_spans:
-            spans = getattr(getattr(out, "metadata", None), "error_spans", None)
+    def _predict(
+        self,
+        model: Any,
+        samples: List[Dict[str, Any]],
+        *,
+        batch_size: int,
+        gpus: int,
+        enable_context: bool,
+        export_spans: bool,
+    ) -> Tuple[List[float], Optional[List[Any]]]:
+        """``predict`` in length-sorted batches under a token budget; results in input order.
 
-        scored_rows: List[Dict[str, Any]] = []
-        for i, r in enumerate(rows):
-            rr = dict(r)
-            rr["metric"] = self.metric_key
-            rr["score"] = float(out.scores[i])
-            if spans is not None:
-                try:
-                    rr["error_spans"] = spans[i]
-                except Exception:
-                    rr["error_spans"] = None
-            scored_rows.append(rr)
-
-        write_jsonl(out_path, scored_rows, append=False)
-
-        sys_score = getattr(out, "system_score", None)
-        if sys_score is not None:
-            (out_path.parent / f"{out_path.stem}.system_score.txt").write_text(str(sys_score), encoding="utf-8")
+        ``max_tokens_per_batch`` (default: ``batch_size`` x the encoder's max
+        length, i.e. the memory of the old worst case) bounds rows x longest
+        row per batch, up to ``max_batch_size`` rows. ``token_batching: false``
+        restores fixed ``batch_size`` batches in input order.
+        """
+
+        def _spans(out: Any) -> Optional[List[Any]]:
+            return getattr(getattr(out, "metadata", None), "error_spans", None) if export_spans else None
+
+        if not bool(self.cfg.get("token_batching", True)) or len(samples) <= 1:
+            out = self._predict_call(model, samples, batch_size=batch_size, gpus=gpus, enable_context=enable_context)
+            return list(out.scores), _spans(out)
+
+        encoder = getattr(model, "encoder", None)
+        max_len = getattr(encoder, "max_positions", None)
+        max_len = int(max_len) if isinstance(max_len, int) and max_len > 0 else None
+        lengths = sample_lengths(samples, getattr(encoder, "tokenizer", None), max_length=max_len)
+        max_tokens = int(self.cfg.get("max_tokens_per_batch", 0)) or batch_size * (max_len or 512)
+        batches = plan_batches(lengths, max_tokens=max_tokens, max_batch_size=int(self.cfg.get("max_batch_size", 128)))
+        runs = group_runs(batches)
+
+        efficiency = padding_efficiency(lengths, batches)
+        baseline = padding_efficiency(lengths, fixed_batches(len(samples), batch_size))
+        REGISTRY.set("evalmt_score_padding_efficiency", efficiency)
+        print(
+            f"[comet] {len(samples)} rows in {len(batches)} batches ({len(runs)} predict calls, <= {max_tokens} tokens): "
+            f"padding efficiency {efficiency:.1%} (fixed batch_size={batch_size}: {baseline:.1%})"
+        )
+
+        scores: List[float] = [0.0] * len(samples)
+        spans: Optional[List[Any]] = None
+        for run in runs:
+            idxs = [i for b in run for i in b]
+            out = self._predict_call(
+                model, [samples[i] for i in idxs], batch_size=len(run[0]), gpus=gpus, enable_context=enable_context
+            )
+            run_spans = _spans(out)
+            if run_spans is not None and spans is None:
+                spans = [None] * len(samples)
+            for k, i in enumerate(idxs):
+                scores[i] = float(out.scores[k])
+                if run_spans is not None and spans is not None:
+                    spans[i] = run_spans[k] if k < len(run_spans) else None
+        return scores, spans
+
+    def score(self, *, gen_path: Path, out_path: Path, tmp_dir: Path) -> None:
+        self.score_many([ScoreJob(gen_path.stem, gen_path, out_path, tmp_dir)], tmp_dir=tmp_dir)
+
+    def score_many(self, jobs: List[ScoreJob], *, tmp_dir: Path) -> None:
+        """Load the checkpoint once and predict the inputs of every file together."""
+
+        batch_size = int(self.cfg.get("batch_size", 8))
+        gpus = int(self.cfg.get("gpus", 1))
+        export_spans = bool(self.cfg.get("export_error_spans", False))
+        enable_context = bool(self.cfg.get("enable_context", False))
+        if int(self.cfg.get("context_window", 0)) > 0:
+            enable_context = True
+
+        # Inputs are read (and validated) before the checkpoint is loaded.
+        prepared: List[Tuple[ScoreJob, List[Dict[str, Any]], int]] = []
+        comet_in: List[Dict[str, Any]] = []
+        for job in jobs:
+            rows, job_in = self._comet_inputs(job.gen_path)
+            prepared.append((job, rows, len(comet_in)))
+            comet_in.extend(job_in)
+            self.report_phase("prepare", rows=len(comet_in))
+
+        def predict(todo: List[Dict[str, Any]]) -> Tuple[List[float], Optional[List[Any]]]:
+            # The checkpoint is only loaded when something is not cached.
+            self.report_phase("load")
+            self.load()
+            model = self._model
+
+            self.report_phase("predict", rows=len(todo))
+            return self._predict(model, todo, batch_size=batch_size, gpus=gpus, enable_context=enable_context, export_spans=export_spans)
+
+        all_scores, spans = self.predict_cached(comet_in, predict)
+
+        self.report_phase("write", rows=len(comet_in))
+        for job, rows, offset in prepared:
+            job.out_path.parent.mkdir(parents=True, exist_ok=True)
+            scores = all_scores[offset : offset + len(rows)]
+            scored_rows: List[Dict[str, Any]] = []
+            for i, r in enumerate(rows):
+                rr = self.output_row(r)
+                rr["metric"] = self.metric_key
+                rr["score"] = scores[i]
+                if spans is not None:
+                    try:
+                        rr["error_spans"] = spans[offset + i]
+                    except Exception:
+                        rr["error_spans"] = None
+                scored_rows.append(rr)
+
+            write_jsonl(job.out_path, scored_rows, append=False)
+
+            sys_score = self.system_score(scored_rows)
+            (job.out_path.parent / f"{job.out_path.stem}.system_score.txt").write_text(str(sys_score), encoding="utf-8")
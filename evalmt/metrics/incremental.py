@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from ..utils.jsonl import iter_jsonl, write_jsonl
+from .base import BaseMetric, ScoreJob
+
+
+@dataclass
+class IncrementalPlan:
+    """Rows of one generation file to rescore; the others keep their previous scores."""
+
+    job: ScoreJob
+    gen_rows: List[Dict[str, Any]]
+    previous: Dict[str, Dict[str, Any]]
+    rescore: Set[int]
+    # Scores only the ``rescore`` rows (None when nothing changed).
+    delta_job: Optional[ScoreJob] = None
+
+
+def _fingerprint(row: Dict[str, Any], fields: List[str]) -> str:
+    blob = json.dumps([row.get(f) for f in fields], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _unique_ids(rows: List[Dict[str, Any]]) -> Optional[List[str]]:
+    ids = [r.get("id") for r in rows]
+    if any(i is None for i in ids) or len(set(ids)) != len(ids):
+        return None
+    return [str(i) for i in ids]
+
+
+def plan_incremental(metric: BaseMetric, job: ScoreJob) -> Optional[IncrementalPlan]:
+    """Diff ``job.gen_path`` against its existing metric output by ``id`` and input hash.
+
+    Returns ``None`` when the file has to be scored in full (no previous
+    output, or rows without a unique ``id``).
+    """
+
+    if not job.out_path.exists():
+        return None
+    gen_rows = list(iter_jsonl(job.gen_path))
+    old_rows = list(iter_jsonl(job.out_path))
+    gen_ids = _unique_ids(gen_rows)
+    old_ids = _unique_ids(old_rows)
+    if gen_ids is None or old_ids is None:
+        print(f"[incremental] {job.name}: rows without a unique id; rescoring the whole file")
+        return None
+
+    fields = metric.input_fields()
+    previous = dict(zip(old_ids, old_rows))
+    rescore: Set[int] = set()
+    for i, (row_id, row) in enumerate(zip(gen_ids, gen_rows)):
+        old = previous.get(row_id)
+        if old is None or "score" not in old or _fingerprint(old, fields) != _fingerprint(row, fields):
+            rescore.add(i)
+
+    groups = metric.context_groups(gen_rows)
+    if groups is not None and rescore:
+        touched = {groups[i] for i in rescore}
+        rescore = {i for i, g in enumerate(groups) if g in touched}
+
+    plan = IncrementalPlan(job=job, gen_rows=gen_rows, previous=previous, rescore=rescore)
+    if rescore:
+        stem = job.out_path.stem
+        delta_gen = job.tmp_dir / f"{stem}.incremental_gen.jsonl"
+        write_jsonl(delta_gen, [r for i, r in enumerate(gen_rows) if i in rescore], append=False)
+        plan.delta_job = ScoreJob(
+            name=f"{job.name} (delta)",
+            gen_path=delta_gen,
+            out_path=job.tmp_dir / f"{stem}.incremental_scored.jsonl",
+            tmp_dir=job.tmp_dir,
+        )
+    return plan
+
+
+def merge_incremental(metric: BaseMetric, plan: IncrementalPlan) -> None:
+    """Write the merged metric output (in generation order) and its system score atomically."""
+
+    job = plan.job
+    fresh: Dict[str, Dict[str, Any]] = {}
+    if plan.delta_job is not None:
+        fresh = {str(r["id"]): r for r in iter_jsonl(plan.delta_job.out_path)}
+
+    merged: List[Dict[str, Any]] = []
+    for i, r in enumerate(plan.gen_rows):
+        row_id = str(r["id"])
+        if i in plan.rescore:
+            if row_id not in fresh:
+                raise RuntimeError(f"Incremental scoring lost row {row_id} of {job.gen_path}")
+            merged.append(fresh[row_id])
+            continue
+        old = plan.previous[row_id]
+        rr = metric.output_row(r)
+        rr["metric"] = metric.metric_key
+        rr["score"] = old["score"]
+        if "error_spans" in old:
+            rr["error_spans"] = old["error_spans"]
+        merged.append(rr)
+
+    tmp_out = job.out_path.with_name(job.out_path.name + ".tmp")
+    write_jsonl(tmp_out, merged)
+    tmp_out.replace(job.out_path)
+    sys_score = metric.system_score(merged)
+    if sys_score is not None:
+        sys_path = job.out_path.parent / f"{job.out_path.stem}.system_score.txt"
+        tmp_sys = sys_path.with_name(sys_path.name + ".tmp")
+        tmp_sys.write_text(str(sys_score), encoding="utf-8")
+        tmp_sys.replace(sys_path)
+
+    delta = plan.delta_job
+    if delta is not None:
+        delta_sys = delta.out_path.parent / f"{delta.out_path.stem}.system_score.txt"
+        for path in (delta.gen_path, delta.out_path, delta_sys):
+            path.unlink(missing_ok=True)
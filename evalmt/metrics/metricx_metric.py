@@ -3,17 +3,22 @@ from __future__ import annotations
 import os
 import subprocess
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from ..config import ROOT
 from ..utils.jsonl import iter_jsonl, write_jsonl
-from .base import BaseMetric
+from .base import BaseMetric, ScoreJob
 from .registry import register_metric
 
 
 @register_metric("metricx")
 class MetricXMetric(BaseMetric):
     def score(self, *, gen_path: Path, out_path: Path, tmp_dir: Path) -> None:
+        self.score_many([ScoreJob(out_path.stem, gen_path, out_path, tmp_dir)], tmp_dir=tmp_dir)
+
+    def score_many(self, jobs: List[ScoreJob], *, tmp_dir: Path) -> None:
+        """One MetricX predict subprocess (one model load) over the rows of every file."""
+
         variant = self.cfg.get("variant", "metricx24")
         mode = self.cfg.get("mode", "ref")  # ref | qe
         tokenizer = self.cfg["tokenizer"]
@@ -21,29 +26,27 @@ class MetricXMetric(BaseMetric):
         max_input_length = int(self.cfg.get("max_input_length", 1536))
         batch_size = int(self.cfg.get("batch_size", 1))
 
-        out_path.parent.mkdir(parents=True, exist_ok=True)
         tmp_dir.mkdir(parents=True, exist_ok=True)
+        stem = jobs[0].out_path.stem if len(jobs) == 1 else "batch"
+        in_jsonl = tmp_dir / f"{stem}.metricx_input.jsonl"
 
-        in_jsonl = tmp_dir / f"{out_path.stem}.metricx_input.jsonl"
-        gen_rows = list(iter_jsonl(gen_path))
-
+        prepared: List[Tuple[ScoreJob, List[Dict[str, Any]]]] = []
         metricx_rows: List[Dict[str, Any]] = []
-        for r in gen_rows:
-            ref = "" if mode == "qe" else r.get("reference", "")
-            metricx_rows.append({
-                "source": r["source"],
-                "hypothesis": r["hypothesis"],
-                "reference": ref,
-            })
-        write_jsonl(in_jsonl, metricx_rows, append=False)
+        for job in jobs:
+            gen_rows = list(iter_jsonl(job.gen_path))
+            prepared.append((job, gen_rows))
+            for r in gen_rows:
+                ref = "" if mode == "qe" else r.get("reference", "")
+                metricx_rows.append({
+                    "source": r["source"],
+                    "hypothesis": r["hypothesis"],
+                    "reference": ref,
+                })
+        self.report_phase("prepare", rows=len(metricx_rows))
 
-        pred_jsonl = tmp_dir / f"{out_path.stem}.metricx_pred.jsonl"
+        pred_jsonl = tmp_dir / f"{stem}.metricx_pred.jsonl"
 
         metricx_repo = ROOT / "third_party" / "metricx"
-        if not metricx_repo.exists():
-            raise FileNotFoundError(
-                f"MetricX repo not found at {metricx_repo}. Run ./scripts/fetch_metricx.sh"
-            )
 
         env = dict(os.environ)
         env["PYTHONPATH"] = str(metricx_repo) + (os.pathsep + env["PYTHONPATH"] if "PYTHONPATH" in env else "")
@@ -74,17 +77,32 @@ class MetricXMetric(BaseMetric):
         if mode == "qe":
             cmd.append("--qe")
 
-        subprocess.run(cmd, env=env, check=True)
+        def predict(todo: List[Dict[str, Any]]) -> Tuple[List[float], Optional[List[Any]]]:
+            if not metricx_repo.exists():
+                raise FileNotFoundError(
+                    f"MetricX repo not found at {metricx_repo}. Run ./scripts/fetch_metricx.sh"
+                )
+            write_jsonl(in_jsonl, todo, append=False)
+            self.report_phase("predict", rows=len(todo))
+            subprocess.run(cmd, env=env, check=True)
+
+            pred_rows = list(iter_jsonl(pred_jsonl))
+            if len(pred_rows) != len(todo):
+                raise RuntimeError(f"MetricX output size mismatch: {len(pred_rows)} vs {len(todo)}")
+            return [float(p.get("prediction")) for p in pred_rows], None
 
-        pred_rows = list(iter_jsonl(pred_jsonl))
-        if len(pred_rows) != len(gen_rows):
-            raise RuntimeError(f"MetricX output size mismatch: {len(pred_rows)} vs {len(gen_rows)}")
+        scores, _ = self.predict_cached(metricx_rows, predict)
 
-        merged: List[Dict[str, Any]] = []
-        for r, p in zip(gen_rows, pred_rows):
-            rr = dict(r)
-            rr["metric"] = self.metric_key
-            rr["score"] = float(p.get("prediction"))
-            merged.append(rr)
+        self.report_phase("write", rows=len(metricx_rows))
+        offset = 0
+        for job, gen_rows in prepared:
+            job.out_path.parent.mkdir(parents=True, exist_ok=True)
+            merged: List[Dict[str, Any]] = []
+            for r, score in zip(gen_rows, scores[offset : offset + len(gen_rows)]):
+                rr = self.output_row(r)
+                rr["metric"] = self.metric_key
+                rr["score"] = score
+                merged.append(rr)
+            offset += len(gen_rows)
 
-        write_jsonl(out_path, merged, append=False)
+            write_jsonl(job.out_path, merged, append=False)
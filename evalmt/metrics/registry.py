@@ -1,11 +1,20 @@
 from __future__ import annotations
 
-from typing import Dict, Type
+import importlib
+from typing import Any, Dict, Type
 
 from .base import BaseMetric
 
 METRIC_REGISTRY: Dict[str, Type[BaseMetric]] = {}
 
+# Lazy-import only the required metric implementation to avoid
+# pulling heavy deps from other metric stacks into this env.
+METRIC_MODULES = {
+    "bleu": "evalmt.metrics.bleu_metric",
+    "comet": "evalmt.metrics.comet_metric",
+    "metricx": "evalmt.metrics.metricx_metric",
+}
+
 
 def register_metric(metric_type: str):
     def _wrap(cls):
@@ -13,3 +22,13 @@ def register_metric(metric_type: str):
         return cls
 
     return _wrap
+
+
+def create_metric(metric_key: str, cfg: Dict[str, Any]) -> BaseMetric:
+    metric_type = cfg["type"]
+    if metric_type in METRIC_MODULES and metric_type not in METRIC_REGISTRY:
+        importlib.import_module(METRIC_MODULES[metric_type])
+
+    if metric_type not in METRIC_REGISTRY:
+        raise KeyError(f"Unknown metric type: {metric_type}. Registered={list(METRIC_REGISTRY)}")
+    return METRIC_REGISTRY[metric_type](metric_key, cfg)
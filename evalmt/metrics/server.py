@@ -0,0 +1,299 @@
+from __future__ import annotations
+
+import gc
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional
+
+from ..config import ROOT, load_metric_config
+from .base import BaseMetric, ScoreJob
+from .cache import ScoreCache
+from .registry import create_metric
+
+# Socket used when neither --socket nor EVALMT_SCORE_SERVER is given.
+DEFAULT_SOCKET = ROOT / "outputs" / "_score_server.sock"
+SERVER_ENV = "EVALMT_SCORE_SERVER"
+
+# JSON-RPC 2.0 error codes; METRIC_UNAVAILABLE tells the client to try
+# another server (or score locally), e.g. a metric from another uv env.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SCORE_FAILED = -32000
+METRIC_UNAVAILABLE = -32001
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+def _job_to_dict(job: ScoreJob) -> Dict[str, str]:
+    return {"name": job.name, "gen_path": str(job.gen_path), "out_path": str(job.out_path), "tmp_dir": str(job.tmp_dir)}
+
+
+def _job_from_dict(d: Dict[str, Any]) -> ScoreJob:
+    return ScoreJob(name=str(d["name"]), gen_path=Path(d["gen_path"]), out_path=Path(d["out_path"]), tmp_dir=Path(d["tmp_dir"]))
+
+
+class ScoreService:
+    """Keeps metric instances (and their loaded models) alive between requests.
+
+    Requests are scored one at a time; at most ``max_resident`` metrics stay
+    loaded (least recently used is dropped first, 0 = no limit).
+    """
+
+    def __init__(self, *, max_resident: int = 0) -> None:
+        self.max_resident = max_resident
+        self._metrics: "OrderedDict[str, BaseMetric]" = OrderedDict()
+        self._caches: Dict[str, ScoreCache] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.loads = 0
+        self.stop = threading.Event()
+
+    def metric(self, key: str) -> BaseMetric:
+        if key in self._metrics:
+            self._metrics.move_to_end(key)
+            return self._metrics[key]
+        try:
+            metric = create_metric(key, load_metric_config(key))
+        except (ImportError, KeyError, FileNotFoundError) as exc:
+            raise RpcError(METRIC_UNAVAILABLE, f"{key}: {type(exc).__name__}: {exc}") from exc
+        while self.max_resident and len(self._metrics) >= self.max_resident:
+            old, evicted = self._metrics.popitem(last=False)
+            print(f"[score-server] unloading {old}", file=sys.stderr)
+            # COMET/Lightning models hold reference cycles: drop the model,
+            # collect, and only then hand the freed VRAM back to CUDA.
+            evicted.unload()
+            del evicted
+            gc.collect()
+            if "torch" in sys.modules:
+                sys.modules["torch"].cuda.empty_cache()
+        t0 = time.monotonic()
+        try:
+            metric.load()
+        except ImportError as exc:
+            raise RpcError(METRIC_UNAVAILABLE, f"{key}: {type(exc).__name__}: {exc}") from exc
+        self.loads += 1
+        print(f"[score-server] loaded {key} in {time.monotonic() - t0:.1f}s", file=sys.stderr)
+        self._metrics[key] = metric
+        return metric
+
+    def preload(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self.metric(key)
+
+    def _score(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            key = str(params["metric"])
+            jobs = [_job_from_dict(j) for j in params["jobs"]]
+            tmp_dir = Path(params["tmp_dir"])
+            cache_path = params.get("score_cache")
+        except (KeyError, TypeError) as exc:
+            raise RpcError(INVALID_PARAMS, f"score needs metric, jobs, tmp_dir: {exc}") from exc
+        with self._lock:
+            resident = key in self._metrics
+            t0 = time.monotonic()
+            cache = None
+            if cache_path:
+                if cache_path not in self._caches:
+                    self._caches[cache_path] = ScoreCache(Path(cache_path))
+                cache = self._caches[cache_path]
+            hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+            try:
+                metric = self.metric(key)
+                metric.score_cache = cache
+                metric.score_many(jobs, tmp_dir=tmp_dir)
+                metric.report_phase("done")
+            except RpcError:
+                raise
+            except Exception as exc:
+                traceback.print_exc()
+                raise RpcError(SCORE_FAILED, f"{type(exc).__name__}: {exc}") from exc
+            self.requests += 1
+        print(f"[score-server] {key}: {len(jobs)} files in {time.monotonic() - t0:.1f}s", file=sys.stderr)
+        result: Dict[str, Any] = {"files": len(jobs), "seconds": round(time.monotonic() - t0, 3), "resident": resident}
+        if cache is not None:
+            hits, misses = cache.hits - hits, cache.misses - misses
+            ratio = hits / (hits + misses) if hits + misses else 0.0
+            result["cache"] = f"hits={hits} misses={misses} hit_ratio={ratio:.1%} path={cache.path}"
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "root": str(ROOT),
+            "resident": list(self._metrics),
+            "max_resident": self.max_resident,
+            "requests": self.requests,
+            "loads": self.loads,
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    def handle(self, line: str) -> Optional[Dict[str, Any]]:
+        """One JSON-RPC request line -> response (``None`` for notifications)."""
+
+        req_id: Any = None
+        try:
+            try:
+                req = json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise RpcError(PARSE_ERROR, str(exc)) from exc
+            if not isinstance(req, dict) or "method" not in req:
+                raise RpcError(INVALID_REQUEST, "expected a JSON-RPC request object")
+            req_id = req.get("id")
+            method = req["method"]
+            params = req.get("params") or {}
+            if method == "score":
+                result: Any = self._score(params)
+            elif method == "status":
+                result = self.status()
+            elif method == "shutdown":
+                self.stop.set()
+                result = {"ok": True}
+            else:
+                raise RpcError(METHOD_NOT_FOUND, f"unknown method: {method}")
+        except RpcError as exc:
+            return {"jsonrpc": "2.0", "id": req_id, "error": {"code": exc.code, "message": str(exc)}}
+        if req_id is None:
+            return None
+        return {"jsonrpc": "2.0", "id": req_id, "result": result}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        service: ScoreService = self.server.service  # type: ignore[attr-defined]
+        for raw in self.rfile:
+            line = raw.decode("utf-8").strip()
+            if not line:
+                continue
+            resp = service.handle(line)
+            if resp is not None:
+                self.wfile.write((json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            if service.stop.is_set():
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _socket_alive(path: Path) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(2.0)
+            s.connect(str(path))
+        return True
+    except OSError:
+        return False
+
+
+def serve_socket(service: ScoreService, path: Path) -> None:
+    if path.exists():
+        if _socket_alive(path):
+            raise RuntimeError(f"A score server is already listening on {path}")
+        path.unlink()  # stale socket of a server that died
+    path.parent.mkdir(parents=True, exist_ok=True)
+    server = _UnixServer(str(path), _Handler)
+    server.service = service  # type: ignore[attr-defined]
+    print(f"[score-server] listening on {path}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+
+
+def serve_stdio(service: ScoreService) -> None:
+    # The protocol owns the original stdout; anything else written to fd 1
+    # (progress bars, metric subprocesses) goes to stderr instead.
+    out: IO[str] = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        resp = service.handle(line)
+        if resp is not None:
+            out.write(json.dumps(resp, ensure_ascii=False) + "\n")
+            out.flush()
+        if service.stop.is_set():
+            break
+
+
+def call(path: Path, method: str, params: Optional[Dict[str, Any]] = None, *, timeout_s: Optional[float] = None) -> Any:
+    """Send one request to the server on ``path``; raises :class:`RpcError` on an error response."""
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(5.0)
+        s.connect(str(path))
+        s.settimeout(timeout_s)
+        req = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}
+        s.sendall((json.dumps(req, ensure_ascii=False) + "\n").encode("utf-8"))
+        with s.makefile("r", encoding="utf-8") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError(f"score server on {path} closed the connection")
+    resp = json.loads(line)
+    if "error" in resp:
+        raise RpcError(int(resp["error"]["code"]), str(resp["error"]["message"]))
+    return resp["result"]
+
+
+def server_sockets(arg: Optional[str]) -> List[Path]:
+    """Sockets to try: ``--server``, else $EVALMT_SCORE_SERVER, else the default socket if present."""
+
+    value = arg if arg is not None else os.environ.get(SERVER_ENV)
+    if value is not None:
+        return [Path(p.strip()) for p in value.split(",") if p.strip()]
+    return [DEFAULT_SOCKET] if DEFAULT_SOCKET.exists() else []
+
+
+def score_remote(
+    sockets: List[Path],
+    metric: str,
+    jobs: List[ScoreJob],
+    tmp_dir: Path,
+    *,
+    score_cache: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Hand the jobs to the first server that can run ``metric``; ``None`` if none can.
+
+    ``score_cache`` is the segment score cache the server should use (``None``: no cache).
+    """
+
+    params = {
+        "metric": metric,
+        "jobs": [_job_to_dict(j) for j in jobs],
+        "tmp_dir": str(tmp_dir),
+        "score_cache": score_cache,
+    }
+    for path in sockets:
+        try:
+            result = call(path, "score", params)
+        except (OSError, ConnectionError) as exc:
+            print(f"[score] server {path} not reachable ({type(exc).__name__}); trying next")
+            continue
+        except RpcError as exc:
+            if exc.code == METRIC_UNAVAILABLE:
+                print(f"[score] server {path} cannot run {metric} ({exc}); trying next")
+                continue
+            raise RuntimeError(f"score server {path} failed on {metric}: {exc}") from exc
+        result["server"] = str(path)
+        return result
+    return None
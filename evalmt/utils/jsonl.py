@@ -23,3 +23,18 @@ def write_jsonl(path: Path, rows: Iterable[Dict[str, Any]], *, append: bool = Fa
     with path.open(mode, encoding="utf-8") as f:
         for row in rows:
             f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def count_lines(path: Path, *, chunk_size: int = 1 << 20) -> int:
+    """Count newline-terminated (plus a trailing unterminated) lines without parsing."""
+
+    n = 0
+    last = b"\n"
+    with path.open("rb") as f:
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                break
+            n += buf.count(b"\n")
+            last = buf[-1:]
+    return n if last == b"\n" else n + 1
@@ -1,25 +1,68 @@
 from __future__ import annotations
 
 import asyncio
+from typing import Optional
 
 import httpx
 
 
+def models_url(api_base: str) -> str:
+    base = api_base.rstrip("/")
+    return f"{base}/models" if base.endswith("/v1") else f"{base}/v1/models"
+
+
+async def probe_openai_server(client: httpx.AsyncClient, api_base: str, timeout_s: float = 5.0) -> bool:
+    """Single `/v1/models` probe; True if the server answered 200."""
+
+    try:
+        r = await client.get(models_url(api_base), timeout=timeout_s)
+    except httpx.RequestError:
+        return False
+    return r.status_code == 200
+
+
+async def scrape_prometheus_gauge(
+    client: httpx.AsyncClient,
+    api_base: str,
+    name: str,
+    timeout_s: float = 5.0,
+) -> Optional[float]:
+    """Sum every sample of gauge `name` from the server's `/metrics` page.
+
+    vLLM serves Prometheus metrics at the root (not under `/v1`). Returns None
+    when the page or the gauge is unavailable.
+    """
+
+    base = api_base.rstrip("/")
+    if base.endswith("/v1"):
+        base = base[: -len("/v1")]
+    try:
+        r = await client.get(f"{base}/metrics", timeout=timeout_s)
+    except httpx.RequestError:
+        return None
+    if r.status_code != 200:
+        return None
+    total: Optional[float] = None
+    for line in r.text.splitlines():
+        if not line.startswith(name) or line[len(name) : len(name) + 1] not in ("{", " "):
+            continue
+        try:
+            total = (total or 0.0) + float(line.rsplit(" ", 1)[1])
+        except ValueError:
+            continue
+    return total
+
+
 async def wait_for_openai_server(api_base: str, timeout_s: int = 600) -> None:
     """Wait for vLLM OpenAI-compatible server to become ready."""
 
-    base = api_base.rstrip("/")
-    url = f"{base}/models" if base.endswith("/v1") else f"{base}/v1/models"
+    url = models_url(api_base)
 
     deadline = asyncio.get_event_loop().time() + timeout_s
     async with httpx.AsyncClient(timeout=10.0) as client:
         while True:
-            try:
-                r = await client.get(url)
-                if r.status_code == 200:
-                    return
-            except httpx.RequestError:
-                pass
+            if await probe_openai_server(client, api_base, timeout_s=10.0):
+                return
 
             if asyncio.get_event_loop().time() > deadline:
                 raise TimeoutError(f"Server not ready within {timeout_s}s: {url}")
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# A sampled gauge returns one value, or (labels, value) pairs for a labelled family.
+Sample = Union[float, int, None, List[Tuple[Dict[str, str], float]]]
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _fmt_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in sorted(labels.items()):
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class MetricsRegistry:
+    """Tiny Prometheus text-format registry (no prometheus_client dependency).
+
+    Counters/gauges are pushed with :meth:`inc` / :meth:`set`; values that
+    already live on some object are registered once with :meth:`sample` and
+    read at scrape time, so hot paths don't pay for instrumentation.
+    ``const_labels`` (e.g. run/model) are attached to every series.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str]] = {}
+        self._values: Dict[str, Dict[LabelKey, float]] = {}
+        self._samplers: Dict[str, Callable[[], Sample]] = {}
+        self.const_labels: Dict[str, str] = {}
+
+    def _declare(self, name: str, kind: str, help_text: str) -> None:
+        if name not in self._meta:
+            self._meta[name] = (kind, help_text)
+
+    def counter(self, name: str, help_text: str = "") -> None:
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            self._values.setdefault(name, {})
+
+    def gauge(self, name: str, help_text: str = "") -> None:
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._values.setdefault(name, {})
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, "counter", "")
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._declare(name, "gauge", "")
+            self._values.setdefault(name, {})[key] = float(value)
+
+    def set_state(self, name: str, state: str, states: List[str]) -> None:
+        """Enum-style gauge: ``name{state="x"} 1`` for the current state, 0 otherwise."""
+
+        with self._lock:
+            self._declare(name, "gauge", "")
+            self._values[name] = {(("state", s),): 1.0 if s == state else 0.0 for s in states}
+
+    def sample(self, name: str, fn: Callable[[], Sample], help_text: str = "", kind: str = "gauge") -> None:
+        with self._lock:
+            self._declare(name, kind, help_text)
+            self._samplers[name] = fn
+
+    def render(self) -> str:
+        with self._lock:
+            meta = dict(self._meta)
+            values = {k: dict(v) for k, v in self._values.items()}
+            samplers = dict(self._samplers)
+        lines: List[str] = []
+        for name in sorted(meta):
+            kind, help_text = meta[name]
+            series: List[Tuple[Dict[str, str], float]] = [(dict(k), v) for k, v in values.get(name, {}).items()]
+            fn = samplers.get(name)
+            if fn is not None:
+                try:
+                    got = fn()
+                except Exception:
+                    got = None
+                if isinstance(got, list):
+                    series.extend(got)
+                elif got is not None:
+                    series.append(({}, float(got)))
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, v in series:
+                lines.append(f"{name}{_fmt_labels({**self.const_labels, **labels})} {float(v):g}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by every instrumented module.
+REGISTRY = MetricsRegistry()
+_STARTED = time.time()
+REGISTRY.sample("evalmt_process_uptime_seconds", lambda: time.time() - _STARTED, "seconds since process start")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(
+    port: Optional[int], *, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY
+) -> Optional[ThreadingHTTPServer]:
+    """Serve ``/metrics`` from a daemon thread; ``None``/0 port disables it.
+
+    A busy port only prints a warning: losing the dashboard must not kill a
+    multi-hour run.
+    """
+
+    if not port:
+        return None
+    handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+    try:
+        server = ThreadingHTTPServer((host, int(port)), handler)
+    except OSError as exc:
+        print(f"⚠️  metrics endpoint disabled ({host}:{port}: {exc})")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="evalmt-metrics", daemon=True).start()
+    print(f"[metrics] serving http://{host}:{port}/metrics")
+    return server
@@ -148,6 +148,46 @@ pipeline_project_for() {
   esac
 }
 
+# uv project of a metric: METRIC_UV_PROJECTS (metric=project,...), then the
+# per-family METRIC_UV_PROJECT_* vars, then the score project.
+pipeline_metric_project() {
+  local metric="$1"
+  local project=""
+  if [ -n "${METRIC_UV_PROJECTS:-}" ]; then
+    local pairs pair
+    IFS=',' read -r -a pairs <<< "$METRIC_UV_PROJECTS"
+    for pair in "${pairs[@]}"; do
+      local key="${pair%%=*}"
+      local val="${pair#*=}"
+      if [ "$key" = "$metric" ]; then
+        project="$val"
+        break
+      fi
+    done
+  fi
+  if [ -z "$project" ]; then
+    case "$metric" in
+      metricx* )
+        project="${METRIC_UV_PROJECT_METRICX:-}"
+        ;;
+      *comet*|xcomet*|cometkiwi* )
+        project="${METRIC_UV_PROJECT_COMET:-}"
+        ;;
+      bleu )
+        project="${METRIC_UV_PROJECT_BLEU:-}"
+        ;;
+    esac
+  fi
+  if [ -z "$project" ]; then
+    if [ "${METRIC_UV_PROJECTS_REQUIRED:-0}" = "1" ]; then
+      echo "__MISSING__"
+      return
+    fi
+    project="$(pipeline_project_for score)"
+  fi
+  echo "$project"
+}
+
 pipeline_docops() {
   pipeline_uv_run "$(pipeline_project_for docops)" evalmt-docops "$@"
 }
@@ -158,16 +198,21 @@ pipeline_jsonl_count() {
     echo "0"
     return
   fi
-  python3 - "$path" <<'PY'
-import sys
-path = sys.argv[1]
-cnt = 0
-with open(path, "r", encoding="utf-8") as f:
-    for line in f:
-        if line.strip():
-            cnt += 1
-print(cnt)
-PY
+  # Non-blank lines; no interpreter start-up per file.
+  grep -c '[^[:space:]]' "$path" || true
+}
+
+# Completed rows of a generation output, read from its checkpoint sidecar
+# (`<out>.ckpt`, one newline-terminated line per row). Falls back to counting
+# the output itself for runs written before the sidecar existed.
+pipeline_gen_done_count() {
+  local path="$1"
+  local ckpt="${path}.ckpt"
+  if [ -f "$ckpt" ] && [ -f "$path" ]; then
+    wc -l < "$ckpt" | tr -d ' '
+  else
+    pipeline_jsonl_count "$path"
+  fi
 }
 
 pipeline_jsonl_has_key() {
@@ -18,7 +18,7 @@ DOC_MARKER_JOIN="${DOC_MARKER_JOIN:- }"
 DOC_MARKER_FIELDS="${DOC_MARKER_FIELDS:-source}"
 DOC_MARKER_REGEX="${DOC_MARKER_REGEX:-⟦\\d+⟧}"
 DOC_MARKER_KEEP_RAW="${DOC_MARKER_KEEP_RAW:-1}"
-DOC_ALIGN_MODE="${DOC_ALIGN_MODE:-rule}"
+DOC_ALIGN_MODE="${DOC_ALIGN_MODE:-gpt}"
 DOC_ALIGN_META="${DOC_ALIGN_META:-0}"
 DOC_ALIGN_MODEL="${DOC_ALIGN_MODEL:-}"
 DOC_ALIGN_API_BASE="${DOC_ALIGN_API_BASE:-$API_BASE}"
@@ -299,30 +299,22 @@ for MODEL_KEY in "${MODEL_LIST[@]}"; do
     fi
   done
 
-  # Scoring: 4 combos
-  for LP in "${LP_LIST[@]}"; do
-    SENT_FROM_DOC="outputs/${RUN_NAME}/gen/${DATASET}/${LP}/${MODEL_KEY}__from_doc.jsonl"
+  # Scoring: 4 combos (one evalmt-score call per metric covers every LP)
+  LPS_CSV=$(IFS=','; echo "${LP_LIST[*]}")
 
-    # sentence evals (non-context)
-    for METRIC in "${METRICS_SENT[@]}"; do
-      # sent -> sent
-      ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LP" "$MODEL_KEY"
-      # doc -> sent
-      ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LP" "${MODEL_KEY}__from_doc"
-    done
+  # sentence evals (non-context): sent -> sent, doc -> sent
+  for METRIC in "${METRICS_SENT[@]}"; do
+    ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LPS_CSV" "${MODEL_KEY},${MODEL_KEY}__from_doc"
+  done
 
-    # document evals (context)
-    for METRIC in "${METRICS_DOC[@]}"; do
-      # sent -> doc (context on sentence data)
-      ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LP" "$MODEL_KEY"
-      # doc -> doc
-      ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LP" "${MODEL_KEY}__from_doc"
-    done
+  # document evals (context): sent -> doc (context on sentence data), doc -> doc
+  for METRIC in "${METRICS_DOC[@]}"; do
+    ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LPS_CSV" "${MODEL_KEY},${MODEL_KEY}__from_doc"
+  done
 
-    # document evals (non-context) for doc input -> doc eval
-    for METRIC in "${METRICS_SENT[@]}"; do
-      ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DOC_DATASET" "$LP" "$MODEL_KEY"
-    done
+  # document evals (non-context) for doc input -> doc eval
+  for METRIC in "${METRICS_SENT[@]}"; do
+    ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DOC_DATASET" "$LPS_CSV" "$MODEL_KEY"
   done
 
   if [ -n "$ALIGN_PID" ]; then
@@ -2,14 +2,19 @@
 set -euo pipefail
 
 RUN_NAME="${1:?RUN_NAME required (ex: run1)}"
-DATASET="${2:?DATASET required (ex: wmt24pp)}"
-LP="${3:?LP required (ex: en-ko_KR)}"
+DATASET="${2:?DATASET required (ex: wmt24pp or wmt24pp,wmt24pp_doc)}"
+LP="${3:?LP required (ex: en-ko_KR, en-ko_KR,en-ja_JP or all)}"
 MODEL_KEY="${4:?MODEL_KEY required (ex: gemma3_27b_it)}"
 API_BASE="${5:-http://localhost:8000/v1}"
 
 # You can override concurrency like:
 #   CONCURRENCY=64 ./scripts/generate.sh ...
 CONCURRENCY="${CONCURRENCY:-16}"
+# Chunked doc generation (doc rows need 'docops to-doc --keep-segments'):
+#   DOC_CHUNK_SIZE=8 DOC_CHUNK_CONTEXT_SRC=4 DOC_CHUNK_CONTEXT_TGT=0 ./scripts/generate.sh ...
+DOC_CHUNK_SIZE="${DOC_CHUNK_SIZE:-0}"
+DOC_CHUNK_CONTEXT_SRC="${DOC_CHUNK_CONTEXT_SRC:-0}"
+DOC_CHUNK_CONTEXT_TGT="${DOC_CHUNK_CONTEXT_TGT:-0}"
 PIPELINE_ENV_FILE="${PIPELINE_ENV_FILE:-.uv/pipeline_envs.env}"
 if [ -f "$PIPELINE_ENV_FILE" ]; then
   # shellcheck source=/dev/null
@@ -29,4 +34,7 @@ uv run "${UV_ARGS[@]}" evalmt-generate \
   --model "$MODEL_KEY" \
   --api-base "$API_BASE" \
   --concurrency "$CONCURRENCY" \
+  --doc-chunk-size "$DOC_CHUNK_SIZE" \
+  --chunk-context-src "$DOC_CHUNK_CONTEXT_SRC" \
+  --chunk-context-tgt "$DOC_CHUNK_CONTEXT_TGT" \
   --resume
@@ -13,6 +13,9 @@ MODELS="${4:-all}"
 DOC_SUFFIX="${DOC_SUFFIX:-_doc}"
 DOC_GEN_SEP="${DOC_GEN_SEP:-$'\n'}"
 DOC_SPLIT_SEP="${DOC_SPLIT_SEP:-$DOC_GEN_SEP}"
+# 1: split on segment markers (pipeline_generate.sh DOC_MARKER_ENABLE=1); LLM alignment only for docs that lost them
+DOC_MARKER_ENABLE="${DOC_MARKER_ENABLE:-0}"
+DOC_MARKER_REGEX="${DOC_MARKER_REGEX:-⟦\\d+⟧}"
 
 DOC_ALIGN_MODE="${DOC_ALIGN_MODE:-gpt}"
 DOC_ALIGN_META="${DOC_ALIGN_META:-0}"
@@ -92,14 +95,27 @@ for dataset in "${DATASET_LIST[@]}"; do
         continue
       fi
 
+      DOC_GEN_RAW="outputs/${RUN_NAME}/gen/${DOC_DATASET}/${LP}/${MODEL_KEY}__raw.jsonl"
       DOC_FOR_EXP="$DOC_GEN"
       SPLITTER="auto"
+      if [ "$DOC_MARKER_ENABLE" = "1" ]; then
+        SPLITTER="marker"
+        # Markers stay in __raw.jsonl; the doc gen itself is cleaned for doc->doc scoring.
+        # Rows generated since the last clean are merged into raw first.
+        pipeline_docops sync-raw \
+          --gen "$DOC_GEN" \
+          --raw "$DOC_GEN_RAW" \
+          --marker-regex "$DOC_MARKER_REGEX" \
+          --fields "source,reference,hypothesis"
+        DOC_FOR_EXP="$DOC_GEN_RAW"
+      fi
       pipeline_docops expand \
         --base "${BASE_DIR}/${LP}.jsonl" \
         --doc "$DOC_FOR_EXP" \
         --output "$SENT_FROM_DOC" \
         --sep "$DOC_SPLIT_SEP" \
         --splitter "$SPLITTER" \
+        --marker-regex "$DOC_MARKER_REGEX" \
         --add-doc-hyp \
         --align-mode "$DOC_ALIGN_MODE" \
         $( [ "$DOC_ALIGN_META" = "1" ] && echo "--align-meta" ) \
@@ -108,6 +124,17 @@ for dataset in "${DATASET_LIST[@]}"; do
         $( [ "$DOC_ALIGN_MODE" = "gpt" ] && echo "--align-model-name $DOC_ALIGN_MODEL_NAME" ) \
         $( [ "$DOC_ALIGN_MODE" = "gpt" ] && echo "--align-max-tokens $DOC_ALIGN_MAX_TOKENS" ) \
         $( [ "$DOC_ALIGN_MODE" = "gpt" ] && echo "--align-response-format $DOC_ALIGN_RESPONSE_FORMAT" )
+
+      if [ "$DOC_MARKER_ENABLE" = "1" ]; then
+        pipeline_docops clean \
+          --input "$DOC_GEN_RAW" \
+          --output "$DOC_GEN" \
+          --marker-regex "$DOC_MARKER_REGEX" \
+          --fields "source,reference,hypothesis"
+        # The clean rewrote the generate output; its checkpoint offsets no longer
+        # apply (resume re-indexes the output, done counts fall back to it).
+        rm -f "${DOC_GEN}.ckpt"
+      fi
     done
   done
 done
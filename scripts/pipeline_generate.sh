@@ -17,6 +17,12 @@ FORCE_DOC_PREP="${FORCE_DOC_PREP:-0}"
 
 DOC_SUFFIX="${DOC_SUFFIX:-_doc}"
 DOC_GEN_SEP="${DOC_GEN_SEP:-$'\n'}"
+# 1: number doc segments (⟦1⟧ ...) so pipeline_align.sh can split without the LLM aligner
+DOC_MARKER_ENABLE="${DOC_MARKER_ENABLE:-0}"
+DOC_MARKER_TEMPLATE="${DOC_MARKER_TEMPLATE:-⟦{i}⟧}"
+# >0: translate doc rows DOC_CHUNK_SIZE segments per request (see generate.sh for context sizes)
+DOC_CHUNK_SIZE="${DOC_CHUNK_SIZE:-0}"
+export DOC_CHUNK_SIZE
 
 DOC_GEN_SEP="$(pipeline_normalize_sep "$DOC_GEN_SEP")"
 
@@ -47,8 +53,8 @@ needs_generation() {
       local base_n doc_n sent_n doc_n_gen
       base_n=$(pipeline_jsonl_count "$base_path")
       doc_n=$(pipeline_jsonl_count "$doc_path")
-      sent_n=$(pipeline_jsonl_count "$sent_gen")
-      doc_n_gen=$(pipeline_jsonl_count "$doc_gen")
+      sent_n=$(pipeline_gen_done_count "$sent_gen")
+      doc_n_gen=$(pipeline_gen_done_count "$doc_gen")
       if [ "$sent_n" -lt "$base_n" ] || [ "$doc_n_gen" -lt "$doc_n" ]; then
         need=1
         break
@@ -96,12 +102,18 @@ EOF
       exit 1
     fi
     DOC_PATH="${DOC_PREP_DIR}/${lp}.jsonl"
-    if [ "$FORCE_DOC_PREP" = "1" ] || [ ! -f "$DOC_PATH" ]; then
+    NEED_SEGMENTS=0
+    if [ "$DOC_CHUNK_SIZE" -gt 0 ] && [ "$(pipeline_jsonl_has_key "$DOC_PATH" "source_segments")" = "0" ]; then
+      NEED_SEGMENTS=1
+    fi
+    if [ "$FORCE_DOC_PREP" = "1" ] || [ ! -f "$DOC_PATH" ] || [ "$NEED_SEGMENTS" = "1" ]; then
       pipeline_docops to-doc \
         --input "$BASE_PATH" \
         --output "$DOC_PATH" \
         --sep "$DOC_GEN_SEP" \
-        --fields "source,reference"
+        --fields "source,reference" \
+        $( [ "$DOC_MARKER_ENABLE" = "1" ] && echo "--marker-template $DOC_MARKER_TEMPLATE" ) \
+        $( [ "$DOC_CHUNK_SIZE" -gt 0 ] && echo "--keep-segments" )
     fi
   done
 done
@@ -146,18 +158,19 @@ for MODEL_KEY in "${MODEL_LIST[@]}"; do
   fi
 
   if [ "$NEED_GEN" = "1" ]; then
+    # One evalmt-generate process per model: every (dataset, lp) shares a single
+    # work queue so the server stays busy across LP boundaries.
+    GEN_DATASETS=()
     for dataset in "${DATASET_LIST[@]}"; do
-      DOC_DATASET="${dataset}${DOC_SUFFIX}"
-      mapfile -t LP_LIST < <(pipeline_list_lps "$dataset" "$LPS")
-
-      for lp in "${LP_LIST[@]}"; do
-        ./scripts/generate.sh "$RUN_NAME" "$dataset" "$lp" "$MODEL_KEY" "$API_BASE"
-      done
-
-      for lp in "${LP_LIST[@]}"; do
-        ./scripts/generate.sh "$RUN_NAME" "$DOC_DATASET" "$lp" "$MODEL_KEY" "$API_BASE"
-      done
+      GEN_DATASETS+=("$dataset" "${dataset}${DOC_SUFFIX}")
     done
+    GEN_DATASETS_CSV=$(IFS=','; echo "${GEN_DATASETS[*]}")
+    # LPS may be space- or comma-separated (see pipeline_list_lps); pass a CSV.
+    GEN_LPS="$LPS"
+    if [ "$LPS" != "all" ]; then
+      GEN_LPS=$(echo ${LPS//,/ } | tr ' ' ',')
+    fi
+    ./scripts/generate.sh "$RUN_NAME" "$GEN_DATASETS_CSV" "$GEN_LPS" "$MODEL_KEY" "$API_BASE"
   else
     pipeline_log "All generation outputs already exist for $MODEL_KEY; skipping generation."
   fi
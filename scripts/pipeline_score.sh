@@ -51,54 +51,149 @@ if [ "${#METRICS_DOC[@]}" -eq 0 ]; then
   METRICS_DOC=("${METRICS_SENT[@]}")
 fi
 
-for dataset in "${DATASET_LIST[@]}"; do
-  BASE_DIR="$(pipeline_dataset_prepared_dir "$dataset")"
-  mapfile -t LP_LIST < <(pipeline_list_lps "$dataset" "$LPS")
-  if [ "${#LP_LIST[@]}" -eq 0 ]; then
-    pipeline_log "No LPs found for dataset $dataset"
-    continue
-  fi
+# One evalmt-score call per (metric, dataset): every LP and model (plus the
+# doc->sent __from_doc variants) shares a single model load.
+join_csv() {
+  local IFS=','
+  echo "$*"
+}
+
+SENT_MODELS=()
+for MODEL_KEY in "${MODEL_LIST[@]}"; do
+  SENT_MODELS+=("$MODEL_KEY" "${MODEL_KEY}__from_doc")
+done
+SENT_MODELS_CSV=$(join_csv "${SENT_MODELS[@]}")
+DOC_MODELS_CSV=$(join_csv "${MODEL_LIST[@]}")
+
+# LPs in prepared dir $1 that can be scored with metric $2.
+scorable_lps() {
+  local dir="$1"
+  local metric="$2"
+  local out=()
+  for LP in "${LP_LIST[@]}"; do
+    local path="${dir}/${LP}.jsonl"
+    [ -f "$path" ] || continue
+    if [ "$(pipeline_jsonl_has_key "$path" "reference")" = "0" ] && pipeline_metric_requires_reference "$metric"; then
+      pipeline_log "Skip metric $metric (no reference in $path)"
+      continue
+    fi
+    out+=("$LP")
+  done
+  join_csv "${out[@]}"
+}
 
-  DOC_DATASET="${dataset}${DOC_SUFFIX}"
-  DOC_DIR="$(pipeline_dataset_prepared_dir "$DOC_DATASET")"
-
-  for MODEL_KEY in "${MODEL_LIST[@]}"; do
-    for LP in "${LP_LIST[@]}"; do
-      BASE_PATH="${BASE_DIR}/${LP}.jsonl"
-      DOC_PATH="${DOC_DIR}/${LP}.jsonl"
-      HAS_REF=$(pipeline_jsonl_has_key "$BASE_PATH" "reference")
-
-      # sentence evals (non-context)
-      for METRIC in "${METRICS_SENT[@]}"; do
-        if [ "$HAS_REF" = "0" ] && pipeline_metric_requires_reference "$METRIC"; then
-          pipeline_log "Skip metric $METRIC (no reference in $BASE_PATH)"
-          continue
-        fi
-        ./scripts/score.sh "$RUN_NAME" "$METRIC" "$dataset" "$LP" "$MODEL_KEY"
-        ./scripts/score.sh "$RUN_NAME" "$METRIC" "$dataset" "$LP" "${MODEL_KEY}__from_doc"
-      done
-
-      # document evals (context)
-      for METRIC in "${METRICS_DOC[@]}"; do
-        if [ "$HAS_REF" = "0" ] && pipeline_metric_requires_reference "$METRIC"; then
-          pipeline_log "Skip metric $METRIC (no reference in $BASE_PATH)"
-          continue
-        fi
-        ./scripts/score.sh "$RUN_NAME" "$METRIC" "$dataset" "$LP" "$MODEL_KEY"
-        ./scripts/score.sh "$RUN_NAME" "$METRIC" "$dataset" "$LP" "${MODEL_KEY}__from_doc"
-      done
-
-      # document evals (non-context) for doc input -> doc eval
-      if [ -f "$DOC_PATH" ]; then
-        DOC_HAS_REF=$(pipeline_jsonl_has_key "$DOC_PATH" "reference")
-        for METRIC in "${METRICS_SENT[@]}"; do
-          if [ "$DOC_HAS_REF" = "0" ] && pipeline_metric_requires_reference "$METRIC"; then
-            pipeline_log "Skip metric $METRIC (no reference in $DOC_PATH)"
-            continue
-          fi
-          ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DOC_DATASET" "$LP" "$MODEL_KEY"
-        done
-      fi
+# SCORE_SERVER=1: one evalmt-score-server per metric uv project keeps the
+# metric model loaded across all score.sh calls of that metric.
+SCORE_SERVER="${SCORE_SERVER:-0}"
+SCORE_SERVER_MAX_RESIDENT="${SCORE_SERVER_MAX_RESIDENT:-1}"
+SCORE_SERVER_WAIT_S="${SCORE_SERVER_WAIT_S:-300}"
+SERVER_PROJECTS=()
+SERVER_SOCKS=()
+SERVER_PIDS=()
+
+stop_score_servers() {
+  local i
+  for i in "${!SERVER_PIDS[@]}"; do
+    if kill -0 "${SERVER_PIDS[$i]}" 2>/dev/null; then
+      pipeline_uv_run "${SERVER_PROJECTS[$i]}" evalmt-score-server --socket "${SERVER_SOCKS[$i]}" --shutdown >/dev/null 2>&1 \
+        || kill -TERM -- "-${SERVER_PIDS[$i]}" 2>/dev/null || kill -TERM "${SERVER_PIDS[$i]}" 2>/dev/null || true
+    fi
+  done
+  wait 2>/dev/null || true
+}
+
+# Socket of the server for metric $1 ("" = score in-process).
+score_server_for() {
+  local project i
+  [ "${#SERVER_SOCKS[@]}" -gt 0 ] || return 0
+  project=$(pipeline_metric_project "$1")
+  for i in "${!SERVER_PROJECTS[@]}"; do
+    if [ "${SERVER_PROJECTS[$i]}" = "$project" ]; then
+      echo "${SERVER_SOCKS[$i]}"
+      return
+    fi
+  done
+}
+
+if [ "$SCORE_SERVER" = "1" ]; then
+  SERVER_DIR="outputs/${RUN_NAME}/tmp"
+  mkdir -p "$SERVER_DIR"
+  for METRIC in "${METRICS_SENT[@]}" "${METRICS_DOC[@]}"; do
+    PROJECT=$(pipeline_metric_project "$METRIC")
+    [ "$PROJECT" != "__MISSING__" ] || pipeline_die "No UV project configured for metric '$METRIC'."
+    [ -n "$(score_server_for "$METRIC")" ] && continue
+    SOCK="$SERVER_DIR/score_server_${#SERVER_SOCKS[@]}.sock"
+    rm -f "$SOCK"
+    if [ -n "${SCORE_GPU_LIST:-}" ]; then
+      export CUDA_VISIBLE_DEVICES="$SCORE_GPU_LIST"
+    fi
+    UV_ARGS=()
+    if [ -n "$PROJECT" ]; then
+      UV_ARGS=(--project "$PROJECT")
+    fi
+    if command -v setsid >/dev/null 2>&1; then
+      setsid uv run "${UV_ARGS[@]}" evalmt-score-server --socket "$SOCK" --max-resident "$SCORE_SERVER_MAX_RESIDENT" &
+    else
+      uv run "${UV_ARGS[@]}" evalmt-score-server --socket "$SOCK" --max-resident "$SCORE_SERVER_MAX_RESIDENT" &
+    fi
+    SERVER_PIDS+=("$!")
+    SERVER_PROJECTS+=("$PROJECT")
+    SERVER_SOCKS+=("$SOCK")
+    pipeline_log "Score server for project '${PROJECT:-default}' -> $SOCK (pid $!)"
+  done
+  trap stop_score_servers EXIT
+
+  for i in "${!SERVER_SOCKS[@]}"; do
+    waited=0
+    until [ -S "${SERVER_SOCKS[$i]}" ]; do
+      kill -0 "${SERVER_PIDS[$i]}" 2>/dev/null || pipeline_die "Score server for ${SERVER_SOCKS[$i]} exited during startup."
+      [ "$waited" -lt "$SCORE_SERVER_WAIT_S" ] || pipeline_die "Score server did not open ${SERVER_SOCKS[$i]} within ${SCORE_SERVER_WAIT_S}s."
+      sleep 1
+      waited=$((waited + 1))
     done
   done
+fi
+
+score_call() {
+  local sock
+  sock=$(score_server_for "$2")
+  if [ -n "$sock" ]; then
+    EVALMT_SCORE_SERVER="$sock" ./scripts/score.sh "$@"
+  else
+    ./scripts/score.sh "$@"
+  fi
+}
+
+# Metric-outer so a resident model (SCORE_SERVER=1) is reused across datasets
+# before the next metric is loaded.
+score_metric() {
+  local metric="$1"
+  local with_doc="$2"
+  local dataset SCORE_LPS
+  for dataset in "${DATASET_LIST[@]}"; do
+    mapfile -t LP_LIST < <(pipeline_list_lps "$dataset" "$LPS")
+    if [ "${#LP_LIST[@]}" -eq 0 ]; then
+      pipeline_log "No LPs found for dataset $dataset"
+      continue
+    fi
+    SCORE_LPS=$(scorable_lps "$(pipeline_dataset_prepared_dir "$dataset")" "$metric")
+    if [ -n "$SCORE_LPS" ]; then
+      score_call "$RUN_NAME" "$metric" "$dataset" "$SCORE_LPS" "$SENT_MODELS_CSV"
+    fi
+    [ "$with_doc" = "1" ] || continue
+    # document evals (non-context) for doc input -> doc eval
+    local doc_dataset="${dataset}${DOC_SUFFIX}"
+    SCORE_LPS=$(scorable_lps "$(pipeline_dataset_prepared_dir "$doc_dataset")" "$metric")
+    if [ -n "$SCORE_LPS" ]; then
+      score_call "$RUN_NAME" "$metric" "$doc_dataset" "$SCORE_LPS" "$DOC_MODELS_CSV"
+    fi
+  done
+}
+
+# sentence evals (non-context), then document evals (context)
+for METRIC in "${METRICS_SENT[@]}"; do
+  score_metric "$METRIC" 1
+done
+for METRIC in "${METRICS_DOC[@]}"; do
+  score_metric "$METRIC" 0
 done
@@ -76,11 +76,10 @@ for MODEL_KEY in "${MODEL_LIST[@]}"; do
     ./scripts/clean_gpu.sh
   fi
 
+  LPS_CSV=$(IFS=','; echo "${LP_LIST[*]}")
   for METRIC in "${METRIC_LIST[@]}"; do
-    for LP in "${LP_LIST[@]}"; do
-      echo "=== Score: metric=$METRIC model=$MODEL_KEY lp=$LP ==="
-      ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LP" "$MODEL_KEY"
-    done
+    echo "=== Score: metric=$METRIC model=$MODEL_KEY lps=$LPS_CSV ==="
+    ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LPS_CSV" "$MODEL_KEY"
   done
 
 done
@@ -28,7 +28,7 @@ DOC_MARKER_TEMPLATE="${DOC_MARKER_TEMPLATE:-⟦{i}⟧}"
 DOC_MARKER_JOIN="${DOC_MARKER_JOIN:- }"
 DOC_MARKER_FIELDS="${DOC_MARKER_FIELDS:-source}"
 DOC_MARKER_REGEX="${DOC_MARKER_REGEX:-⟦\\d+⟧}"
-DOC_ALIGN_MODE="${DOC_ALIGN_MODE:-rule}"
+DOC_ALIGN_MODE="${DOC_ALIGN_MODE:-gpt}"
 DOC_ALIGN_META="${DOC_ALIGN_META:-0}"
 DOC_ALIGN_MODEL="${DOC_ALIGN_MODEL:-}"
 DOC_ALIGN_API_BASE="${DOC_ALIGN_API_BASE:-$API_BASE}"
@@ -166,7 +166,7 @@ for MODEL_KEY in "${MODEL_LIST[@]}"; do
 
     SPLITTER="auto"
     if [ "$DOC_MARKER_ENABLE" = "1" ]; then
-      SPLITTER="auto"
+      SPLITTER="marker"
     fi
 
     uv run evalmt-docops expand \
@@ -187,10 +187,9 @@ for MODEL_KEY in "${MODEL_LIST[@]}"; do
   done
 
   # Context scoring on sentence-level split outputs
+  LPS_CSV=$(IFS=','; echo "${LP_LIST[*]}")
   for METRIC in "${METRIC_LIST[@]}"; do
-    for LP in "${LP_LIST[@]}"; do
-      ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LP" "${MODEL_KEY}__from_doc"
-    done
+    ./scripts/score.sh "$RUN_NAME" "$METRIC" "$DATASET" "$LPS_CSV" "${MODEL_KEY}__from_doc"
   done
 
   if [ -n "$ALIGN_PID" ]; then
@@ -1,11 +1,16 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+# shellcheck source=./_pipeline_lib.sh
+source "$SCRIPT_DIR/_pipeline_lib.sh"
+
 RUN_NAME="${1:?RUN_NAME required}"
 METRIC_KEY="${2:?METRIC_KEY required (ex: xcomet_mqm)}"
 DATASET="${3:?DATASET required}"
-LP="${4:?LP required}"
-MODEL_KEY="${5:?MODEL_KEY required}"
+# LP / MODEL_KEY (and DATASET) accept comma lists and globs; one process loads the metric once for all of them.
+LP="${4:?LP required (ex: en-ko_KR, en-ko_KR,en-ja_JP or 'en-*')}"
+MODEL_KEY="${5:?MODEL_KEY required (ex: gemma3_27b_it or gemma3_27b_it,gemma3_27b_it__from_doc)}"
 
 # Optional: restrict GPUs for scoring (useful if you keep a vLLM server running
 # on other GPUs and want to score on a free GPU).
@@ -13,6 +18,8 @@ MODEL_KEY="${5:?MODEL_KEY required}"
 #   SCORE_GPU_LIST=7 ./scripts/score.sh ...
 SCORE_GPU_LIST="${SCORE_GPU_LIST:-}"
 UV_PROJECT_SCORE="${UV_PROJECT_SCORE:-${UV_PROJECT:-}}"
+# SCORE_INCREMENTAL=1: only rescore rows that are new/changed since the existing metric output.
+SCORE_INCREMENTAL="${SCORE_INCREMENTAL:-0}"
 METRIC_ENV_FILE="${METRIC_ENV_FILE:-.uv/metric_envs.env}"
 
 if [ -f "$METRIC_ENV_FILE" ]; then
@@ -20,50 +27,7 @@ if [ -f "$METRIC_ENV_FILE" ]; then
   source "$METRIC_ENV_FILE"
 fi
 
-METRIC_UV_PROJECTS="${METRIC_UV_PROJECTS:-}"
-METRIC_UV_PROJECTS_REQUIRED="${METRIC_UV_PROJECTS_REQUIRED:-0}"
-METRIC_UV_PROJECT_COMET="${METRIC_UV_PROJECT_COMET:-}"
-METRIC_UV_PROJECT_METRICX="${METRIC_UV_PROJECT_METRICX:-}"
-METRIC_UV_PROJECT_BLEU="${METRIC_UV_PROJECT_BLEU:-}"
-
-metric_project() {
-  local metric="$1"
-  local project=""
-  if [ -n "$METRIC_UV_PROJECTS" ]; then
-    IFS=',' read -r -a pairs <<< "$METRIC_UV_PROJECTS"
-    for pair in "${pairs[@]}"; do
-      local key="${pair%%=*}"
-      local val="${pair#*=}"
-      if [ "$key" = "$metric" ]; then
-        project="$val"
-        break
-      fi
-    done
-  fi
-  if [ -z "$project" ]; then
-    case "$metric" in
-      metricx* )
-        project="$METRIC_UV_PROJECT_METRICX"
-        ;;
-      *comet*|xcomet*|cometkiwi* )
-        project="$METRIC_UV_PROJECT_COMET"
-        ;;
-      bleu )
-        project="$METRIC_UV_PROJECT_BLEU"
-        ;;
-    esac
-  fi
-  if [ -z "$project" ]; then
-    if [ "$METRIC_UV_PROJECTS_REQUIRED" = "1" ]; then
-      echo "__MISSING__"
-      return
-    fi
-    project="$UV_PROJECT_SCORE"
-  fi
-  echo "$project"
-}
-
-PROJECT=$(metric_project "$METRIC_KEY")
+PROJECT=$(pipeline_metric_project "$METRIC_KEY")
 if [ "$PROJECT" = "__MISSING__" ]; then
   echo "ERROR: No UV project configured for metric '$METRIC_KEY'." >&2
   echo "Set METRIC_UV_PROJECTS or METRIC_UV_PROJECT_COMET/METRIC_UV_PROJECT_METRICX/METRIC_UV_PROJECT_BLEU." >&2
@@ -74,6 +38,11 @@ if [ -n "$PROJECT" ]; then
   UV_ARGS=(--project "$PROJECT")
 fi
 
+SCORE_ARGS=()
+if [ "$SCORE_INCREMENTAL" = "1" ]; then
+  SCORE_ARGS+=(--incremental)
+fi
+
 if [ -n "$SCORE_GPU_LIST" ]; then
   echo "CUDA_VISIBLE_DEVICES=$SCORE_GPU_LIST"
   CUDA_VISIBLE_DEVICES="$SCORE_GPU_LIST" uv run "${UV_ARGS[@]}" evalmt-score \
@@ -81,12 +50,14 @@ if [ -n "$SCORE_GPU_LIST" ]; then
     --metric "$METRIC_KEY" \
     --dataset "$DATASET" \
     --lp "$LP" \
-    --model "$MODEL_KEY"
+    --model "$MODEL_KEY" \
+    "${SCORE_ARGS[@]}"
 else
   uv run "${UV_ARGS[@]}" evalmt-score \
     --run "$RUN_NAME" \
     --metric "$METRIC_KEY" \
     --dataset "$DATASET" \
     --lp "$LP" \
-    --model "$MODEL_KEY"
+    --model "$MODEL_KEY" \
+    "${SCORE_ARGS[@]}"
 fi
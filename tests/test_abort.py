@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from evalmt.generation.abort import AbortMonitor, LengthRatioDetector, RepetitionDetector
+
+
+def test_repetition_detects_loop() -> None:
+    d = RepetitionDetector()
+    assert d.check("Das ist gut. " + "la la " * 60, "This is good.") == "repetition(period=3)"
+    assert d.check("Ein normaler Satz ohne Schleife, " * 2, "A normal sentence.") is None
+
+
+def test_repetition_ignores_runs_copied_from_source() -> None:
+    d = RepetitionDetector()
+    rule = "-" * 300
+    assert d.check(f"Titel\n{rule}", f"Title\n{rule}\nBody") is None
+    assert d.check(f"Titel\n{rule}", "Title\nBody") == "repetition(period=1)"
+    table = "|---|---|\n" * 40
+    assert d.check("| a | b |\n" + table, "| a | b |\n" + table) is None
+
+
+def test_length_ratio() -> None:
+    d = LengthRatioDetector(max_ratio=2.0, min_chars=10)
+    assert d.check("x" * 21, "y" * 10) == "length-ratio(>2x)"
+    assert d.check("x" * 20, "y" * 10) is None
+
+
+def test_monitor_due_and_check() -> None:
+    m = AbortMonitor([LengthRatioDetector(max_ratio=1.0, min_chars=1)], "abc", check_every=64)
+    assert not m.due(63, 0)
+    assert m.due(64, 0)
+    assert not m.due(100, 64)
+    assert m("x" * 100) == "length-ratio(>1x)"
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import random
+
+from evalmt.metrics.batching import fixed_batches, group_runs, padding_efficiency, plan_batches, sample_lengths
+
+
+def test_plan_batches_example() -> None:
+    assert plan_batches([10, 50, 20, 50], max_tokens=100, max_batch_size=8) == [[1, 3], [2, 0]]
+
+
+def test_plan_batches_oversized_sample_gets_its_own_batch() -> None:
+    assert plan_batches([500, 10], max_tokens=100, max_batch_size=8) == [[0], [1]]
+
+
+def test_plan_batches_properties() -> None:
+    rng = random.Random(0)
+    for _ in range(200):
+        lengths = [rng.randint(1, 300) for _ in range(rng.randint(0, 120))]
+        max_tokens = rng.choice([64, 256, 1024, 4096])
+        max_batch = rng.choice([1, 4, 16, 64])
+        batches = plan_batches(lengths, max_tokens=max_tokens, max_batch_size=max_batch)
+        assert sorted(i for b in batches for i in b) == list(range(len(lengths)))
+        sizes = [len(b) for b in batches]
+        # Powers of two that never shrink (the last batch may be a remainder).
+        for s in sizes[:-1]:
+            assert s & (s - 1) == 0 and s <= max_batch
+        assert all(a <= b for a, b in zip(sizes[:-2], sizes[1:-1]))
+        for b in batches:
+            assert len(b) == 1 or len(b) * max(lengths[i] for i in b) <= max_tokens
+
+
+def test_group_runs() -> None:
+    assert group_runs([[0, 1], [2, 3], [4, 5, 6, 7], [8]]) == [[[0, 1], [2, 3]], [[4, 5, 6, 7]], [[8]]]
+    # A short remainder never joins a run of full batches.
+    assert group_runs([[0, 1], [2]]) == [[[0, 1]], [[2]]]
+    assert group_runs([]) == []
+
+
+def test_fixed_batches_and_efficiency() -> None:
+    assert fixed_batches(5, 2) == [[0, 1], [2, 3], [4]]
+    assert padding_efficiency([2, 4], [[0, 1]]) == 0.75
+    assert padding_efficiency([], []) == 1.0
+
+
+def test_sample_lengths_whitespace_fallback() -> None:
+    samples = [{"src": "a b", "mt": "c"}, {"src": "a", "mt": "b c d", "ref": "e"}]
+    assert sample_lengths(samples) == [(2 + 2) + (1 + 2), (1 + 2) + (3 + 2) + (1 + 2)]
+    assert sample_lengths(samples, max_length=5) == [5, 5]
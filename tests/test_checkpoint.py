@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import signal
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+from evalmt.generation.checkpoint import CheckpointedWriter, checkpoint_path, recover_checkpoint
+
+
+def _row(i: int) -> bytes:
+    return (json.dumps({"id": f"r{i}", "hypothesis": "x" * (i % 7)}) + "\n").encode("utf-8")
+
+
+def _ids(path: Path) -> list:
+    return [json.loads(line)["id"] for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_recover_missing_output(tmp_path: Path) -> None:
+    out = tmp_path / "m.jsonl"
+    checkpoint_path(out).write_text("12\t\"r0\"\n", encoding="utf-8")
+    done, n = recover_checkpoint(out)
+    assert n == 0 and len(done) == 0
+    assert not checkpoint_path(out).exists()
+
+
+def test_recover_clean_close(tmp_path: Path) -> None:
+    out = tmp_path / "m.jsonl"
+    w = CheckpointedWriter(out)
+    for i in range(10):
+        w.write(f"r{i}", _row(i))
+    w.close()
+    done, n = recover_checkpoint(out)
+    assert n == 10
+    assert "r9" in done and "r10" not in done
+
+
+def test_recover_torn_tail(tmp_path: Path) -> None:
+    out = tmp_path / "m.jsonl"
+    w = CheckpointedWriter(out)
+    for i in range(5):
+        w.write(f"r{i}", _row(i))
+    w.close()
+    with out.open("ab") as f:
+        f.write(_row(5)[:7])
+    done, n = recover_checkpoint(out)
+    assert n == 5
+    assert _ids(out) == [f"r{i}" for i in range(5)]
+
+
+def test_recover_unindexed_tail(tmp_path: Path) -> None:
+    out = tmp_path / "m.jsonl"
+    w = CheckpointedWriter(out, flush_every=4, flush_interval_s=3600)
+    for i in range(10):
+        w.write(f"r{i}", _row(i))
+    # Rows 8 and 9 reached the output but not the sidecar.
+    w._out.flush()
+    assert len(checkpoint_path(out).read_text(encoding="utf-8").splitlines()) == 8
+    done, n = recover_checkpoint(out)
+    assert n == 10 and "r9" in done
+    assert len(checkpoint_path(out).read_text(encoding="utf-8").splitlines()) == 10
+    # The appended index entries are valid: a second recovery changes nothing.
+    assert recover_checkpoint(out)[1] == 10
+
+
+def test_recover_rewritten_output(tmp_path: Path) -> None:
+    out = tmp_path / "m.jsonl"
+    w = CheckpointedWriter(out)
+    for i in range(4):
+        w.write(f"r{i}", _row(i + 20))
+    w.close()
+    # Rewritten in place with shorter rows: the sidecar offsets are stale.
+    out.write_bytes(b"".join(_row(i) for i in range(3)))
+    done, n = recover_checkpoint(out)
+    assert n == 3
+    assert _ids(out) == ["r0", "r1", "r2"]
+
+
+def test_kill_then_resume(tmp_path: Path) -> None:
+    out = tmp_path / "m.jsonl"
+    script = textwrap.dedent(
+        f"""
+        import json, os, signal
+        from pathlib import Path
+        from evalmt.generation.checkpoint import CheckpointedWriter
+
+        w = CheckpointedWriter(Path({str(out)!r}), flush_every=64, flush_interval_s=3600)
+        for i in range(126):
+            w.write(f"r{{i}}", (json.dumps({{"id": f"r{{i}}"}}) + "\\n").encode("utf-8"))
+        w._out.flush()
+        w._out.write(b'{{"id": "r126", "hyp')
+        w._out.flush()
+        os.kill(os.getpid(), signal.SIGKILL)
+        """
+    )
+    proc = subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).resolve().parents[1])
+    assert proc.returncode == -signal.SIGKILL
+    assert len(checkpoint_path(out).read_text(encoding="utf-8").splitlines()) == 64
+
+    done, n = recover_checkpoint(out)
+    assert n == 126
+    assert _ids(out) == [f"r{i}" for i in range(126)]
+
+    # Resume appends after the recovered rows.
+    w = CheckpointedWriter(out)
+    w.write("r126", _row(126))
+    w.close()
+    assert recover_checkpoint(out)[1] == 127
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import pytest
+
+from evalmt.generation.chunking import chunk_spans, context_instruction, target_context
+
+
+def test_chunk_spans() -> None:
+    assert chunk_spans(5, 2) == [(0, 2), (2, 4), (4, 5)]
+    assert chunk_spans(4, 4) == [(0, 4)]
+    assert chunk_spans(3, 10) == [(0, 3)]
+    assert chunk_spans(0, 3) == []
+    with pytest.raises(ValueError):
+        chunk_spans(3, 0)
+
+
+CHUNKS = [
+    {"start": 0, "end": 2, "hypothesis": "a b", "segment_hypotheses": ["a", "b"]},
+    {"start": 2, "end": 4, "hypothesis": "c d"},
+    {"start": 4, "end": 6, "hypothesis": "e f", "segment_hypotheses": ["e", "f"]},
+]
+
+
+def test_target_context_per_segment() -> None:
+    assert target_context(CHUNKS[:1], 2, 1) == ["b"]
+    assert target_context(CHUNKS[:1], 2, 5) == ["a", "b"]
+    assert target_context(CHUNKS, 6, 1) == ["f"]
+
+
+def test_target_context_unsplit_chunk_counts_once() -> None:
+    assert target_context(CHUNKS[:2], 4, 3) == ["b", "c d"]
+    assert target_context(CHUNKS, 6, 3) == ["c d", "e", "f"]
+
+
+def test_target_context_empty() -> None:
+    assert target_context(CHUNKS[:1], 2, 0) == []
+    assert target_context([], 0, 3) == []
+
+
+def test_context_instruction() -> None:
+    assert context_instruction([], []) == ""
+    text = context_instruction(["src"], ["tgt"])
+    assert "Preceding text:\nsrc" in text and "Preceding translation:\ntgt" in text
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from evalmt.metrics.base import BaseMetric, ScoreJob
+from evalmt.metrics.incremental import merge_incremental, plan_incremental
+from evalmt.utils.jsonl import iter_jsonl, write_jsonl
+
+
+class LengthMetric(BaseMetric):
+    """Scores a hypothesis by its length; optionally rescores whole documents together."""
+
+    def __init__(self, by_doc: bool = False) -> None:
+        super().__init__("length", {})
+        self.by_doc = by_doc
+        self.scored: List[str] = []
+
+    def context_groups(self, rows: List[Dict[str, Any]]) -> Optional[List[Any]]:
+        return [r.get("doc") for r in rows] if self.by_doc else None
+
+    def system_score(self, rows: List[Dict[str, Any]]) -> Optional[float]:
+        return sum(r["score"] for r in rows) / len(rows)
+
+    def score(self, *, gen_path: Path, out_path: Path, tmp_dir: Path) -> None:
+        out = []
+        for r in iter_jsonl(gen_path):
+            self.scored.append(r["id"])
+            rr = self.output_row(r)
+            rr["metric"] = self.metric_key
+            rr["score"] = float(len(r["hypothesis"]))
+            out.append(rr)
+        write_jsonl(out_path, out)
+
+
+def _job(tmp_path: Path) -> ScoreJob:
+    return ScoreJob(
+        name="d/lp/m", gen_path=tmp_path / "gen.jsonl", out_path=tmp_path / "out" / "m.jsonl", tmp_dir=tmp_path / "tmp"
+    )
+
+
+def _gen(job: ScoreJob, hyps: Dict[str, str], doc: Optional[Dict[str, str]] = None) -> None:
+    rows = [{"id": k, "source": "s", "hypothesis": v, **({"doc": doc[k]} if doc else {})} for k, v in hyps.items()]
+    write_jsonl(job.gen_path, rows)
+
+
+def _run(metric: LengthMetric, job: ScoreJob) -> None:
+    plan = plan_incremental(metric, job)
+    if plan is None:
+        metric.score(gen_path=job.gen_path, out_path=job.out_path, tmp_dir=job.tmp_dir)
+        return
+    if plan.delta_job is not None:
+        d = plan.delta_job
+        metric.score(gen_path=d.gen_path, out_path=d.out_path, tmp_dir=d.tmp_dir)
+    merge_incremental(metric, plan)
+
+
+def test_first_run_is_full(tmp_path: Path) -> None:
+    job = _job(tmp_path)
+    _gen(job, {"a": "x"})
+    assert plan_incremental(LengthMetric(), job) is None
+
+
+def test_only_new_or_changed_rows_are_rescored(tmp_path: Path) -> None:
+    job = _job(tmp_path)
+    metric = LengthMetric()
+    _gen(job, {"a": "x", "b": "yy", "c": "zzz"})
+    _run(metric, job)
+    metric.scored.clear()
+
+    _gen(job, {"a": "x", "b": "changed", "c": "zzz", "d": "dddd"})
+    plan = plan_incremental(metric, job)
+    assert plan is not None and plan.rescore == {1, 3}
+    _run(metric, job)
+    assert metric.scored == ["b", "d"]
+
+    rows = list(iter_jsonl(job.out_path))
+    assert [(r["id"], r["score"]) for r in rows] == [("a", 1.0), ("b", 7.0), ("c", 3.0), ("d", 4.0)]
+    assert float((job.out_path.parent / "m.system_score.txt").read_text()) == 15.0 / 4
+    # Delta scratch files are removed after the merge.
+    assert not any(p.name.startswith("m.incremental") for p in job.tmp_dir.iterdir())
+
+
+def test_unchanged_file_scores_nothing(tmp_path: Path) -> None:
+    job = _job(tmp_path)
+    metric = LengthMetric()
+    _gen(job, {"a": "x", "b": "yy"})
+    _run(metric, job)
+    metric.scored.clear()
+    plan = plan_incremental(metric, job)
+    assert plan is not None and plan.rescore == set() and plan.delta_job is None
+    merge_incremental(metric, plan)
+    assert metric.scored == []
+    assert [r["score"] for r in iter_jsonl(job.out_path)] == [1.0, 2.0]
+
+
+def test_context_groups_are_rescored_together(tmp_path: Path) -> None:
+    job = _job(tmp_path)
+    metric = LengthMetric(by_doc=True)
+    doc = {"a": "d1", "b": "d1", "c": "d2"}
+    _gen(job, {"a": "x", "b": "yy", "c": "zzz"}, doc)
+    _run(metric, job)
+    metric.scored.clear()
+    _gen(job, {"a": "x", "b": "new", "c": "zzz"}, doc)
+    _run(metric, job)
+    assert metric.scored == ["a", "b"]
+
+
+def test_rows_without_unique_ids_fall_back_to_full(tmp_path: Path) -> None:
+    job = _job(tmp_path)
+    metric = LengthMetric()
+    _gen(job, {"a": "x"})
+    _run(metric, job)
+    write_jsonl(job.gen_path, [{"id": "a", "hypothesis": "x"}, {"id": "a", "hypothesis": "y"}])
+    assert plan_incremental(metric, job) is None
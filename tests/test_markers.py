@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from evalmt.align.markers import DEFAULT_MARKER_REGEX, format_markers, split_on_markers, strip_markers
+
+M = format_markers("⟦{i}⟧", 3)
+
+
+def test_format_markers() -> None:
+    assert M == ["⟦1⟧", "⟦2⟧", "⟦3⟧"]
+
+
+def test_strip_markers() -> None:
+    assert strip_markers("⟦1⟧ Hallo ⟦2⟧ Welt") == "Hallo Welt"
+    assert strip_markers("⟦1⟧ A\n⟦2⟧ B\n⟦3⟧") == "A\nB"
+    assert strip_markers("kein Marker") == "kein Marker"
+    assert strip_markers("") == ""
+
+
+def test_split_on_markers_in_order() -> None:
+    assert split_on_markers("⟦1⟧ A. ⟦2⟧ B. ⟦3⟧ C.", M) == ["A.", "B.", "C."]
+    # An empty segment keeps its marker.
+    assert split_on_markers("⟦1⟧ A ⟦2⟧ ⟦3⟧ C", M) == ["A", "", "C"]
+
+
+def test_split_on_markers_lead_text_joins_first_segment() -> None:
+    assert split_on_markers("Vorwort ⟦1⟧ A ⟦2⟧ B ⟦3⟧ C", M) == ["Vorwort A", "B", "C"]
+
+
+def test_split_on_markers_rejects_broken_markers() -> None:
+    assert split_on_markers("⟦1⟧ A ⟦3⟧ C", M) is None  # missing
+    assert split_on_markers("⟦2⟧ B ⟦1⟧ A ⟦3⟧ C", M) is None  # reordered
+    assert split_on_markers("⟦1⟧ A ⟦1⟧ A ⟦2⟧ B ⟦3⟧ C", M) is None  # duplicated
+    assert split_on_markers("no markers", M) is None
+    assert split_on_markers("⟦1⟧ A", []) is None
+
+
+def test_split_on_markers_invented_marker_needs_regex() -> None:
+    text = "⟦1⟧ A ⟦2⟧ B ⟦3⟧ C ⟦4⟧ D"
+    assert split_on_markers(text, M) == ["A", "B", "C ⟦4⟧ D"]
+    assert split_on_markers(text, M, DEFAULT_MARKER_REGEX) is None
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from evalmt.metrics.cache import ScoreCache, cached_predict, metric_identity, score_key
+
+IDENTITY = metric_identity({"type": "comet", "model": "m", "batch_size": 8})
+
+
+class Model:
+    def __init__(self, spans: bool = False) -> None:
+        self.calls: List[List[Dict[str, Any]]] = []
+        self.spans = spans
+
+    def __call__(self, inputs: List[Dict[str, Any]]):
+        self.calls.append(list(inputs))
+        scores = [float(len(x["mt"])) for x in inputs]
+        return scores, ([[x["mt"]] for x in inputs] if self.spans else None)
+
+
+def test_identity_ignores_throughput_settings() -> None:
+    a = metric_identity({"type": "comet", "model": "m", "batch_size": 8, "gpus": 1})
+    b = metric_identity({"type": "comet", "model": "m", "batch_size": 64})
+    assert score_key(a, {"mt": "x"}) == score_key(b, {"mt": "x"})
+    assert score_key(a, {"mt": "x"}) != score_key(metric_identity({"type": "comet", "model": "n"}), {"mt": "x"})
+
+
+def test_without_cache_predicts_everything() -> None:
+    model = Model()
+    scores, spans = cached_predict(None, IDENTITY, [{"mt": "a"}, {"mt": "a"}], model)
+    assert scores == [1.0, 1.0] and spans is None
+    assert len(model.calls[0]) == 2
+
+
+def test_predicts_only_unseen_distinct_inputs(tmp_path: Path) -> None:
+    cache = ScoreCache(tmp_path / "scores.sqlite")
+    model = Model()
+    scores, _ = cached_predict(cache, IDENTITY, [{"mt": "aa"}, {"mt": "b"}, {"mt": "aa"}], model)
+    assert scores == [2.0, 1.0, 2.0]
+    assert model.calls == [[{"mt": "aa"}, {"mt": "b"}]]
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    scores, _ = cached_predict(cache, IDENTITY, [{"mt": "b"}, {"mt": "ccc"}], model)
+    assert scores == [1.0, 3.0]
+    assert model.calls[-1] == [{"mt": "ccc"}]
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    # Everything cached: the model is not called at all.
+    cached_predict(cache, IDENTITY, [{"mt": "aa"}, {"mt": "ccc"}], model)
+    assert len(model.calls) == 2
+    cache.close()
+
+    # Persisted across instances.
+    reopened = ScoreCache(tmp_path / "scores.sqlite")
+    assert cached_predict(reopened, IDENTITY, [{"mt": "b"}], Model())[0] == [1.0]
+    assert reopened.hits == 1
+    reopened.close()
+
+
+def test_error_spans_round_trip(tmp_path: Path) -> None:
+    cache = ScoreCache(tmp_path / "scores.sqlite")
+    _, spans = cached_predict(cache, IDENTITY, [{"mt": "x"}], Model(spans=True))
+    assert spans == [["x"]]
+    model = Model(spans=True)
+    _, spans = cached_predict(cache, IDENTITY, [{"mt": "x"}, {"mt": "yy"}], model)
+    assert spans == [["x"], ["yy"]]
+    assert model.calls == [[{"mt": "yy"}]]
+    cache.close()
+
+
+def test_score_count_mismatch_raises(tmp_path: Path) -> None:
+    cache = ScoreCache(tmp_path / "scores.sqlite")
+    with pytest.raises(RuntimeError):
+        cached_predict(cache, IDENTITY, [{"mt": "a"}, {"mt": "b"}], lambda xs: ([1.0], None))
+    cache.close()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from evalmt.generation.stats import GenStats, RunStats, merge_stats
+
+OLD = {
+    "dataset": "wmt24pp",
+    "lp": "en-de_DE",
+    "rows": 10,
+    "cached": 2,
+    "failed": 1,
+    "attempts": 9,
+    "retries": 1,
+    "prompt_tokens": 100,
+    "completion_tokens": 50,
+    "wall_s": 5.0,
+    "latency_p50_s": 0.1,
+    "latency_p95_s": 0.2,
+    "latency_p99_s": 0.3,
+}
+NEW = {
+    **OLD,
+    "rows": 5,
+    "cached": 0,
+    "failed": 0,
+    "attempts": 5,
+    "retries": 0,
+    "prompt_tokens": 20,
+    "completion_tokens": 30,
+    "wall_s": 5.0,
+    "latency_p50_s": 0.5,
+    "latency_p95_s": 0.6,
+    "latency_p99_s": 0.7,
+}
+
+
+def test_merge_stats_sums_counters_and_recomputes_rates() -> None:
+    m = merge_stats(OLD, NEW)
+    assert (m["rows"], m["cached"], m["failed"], m["attempts"], m["retries"]) == (15, 2, 1, 14, 1)
+    assert (m["prompt_tokens"], m["completion_tokens"], m["wall_s"]) == (120, 80, 10.0)
+    assert m["error_rate"] == round(2 / 14, 6)
+    assert m["rows_per_s"] == 1.5
+    assert m["completion_tokens_per_s"] == 8.0
+    assert m["invocations"] == 2
+    assert m["latency_p95_s"] == 0.6
+    assert (m["dataset"], m["lp"]) == ("wmt24pp", "en-de_DE")
+    assert merge_stats(m, NEW)["invocations"] == 3
+
+
+def test_merge_stats_keeps_latency_of_a_fully_cached_pass() -> None:
+    cached = {**NEW, "rows": 5, "cached": 5, "latency_p95_s": 0.0}
+    assert merge_stats(OLD, cached)["latency_p95_s"] == 0.2
+
+
+def test_merge_stats_zero_wall() -> None:
+    zero = {k: 0 for k in ("rows", "cached", "failed", "attempts", "retries", "prompt_tokens", "completion_tokens", "wall_s")}
+    m = merge_stats(zero, zero)
+    assert m["error_rate"] == 0.0 and m["rows_per_s"] is None and m["completion_tokens_per_s"] is None
+
+
+def _run(model: str, lp: str, rows: int) -> RunStats:
+    st = RunStats(model)
+    st.start("wmt24pp", lp)
+    for _ in range(rows):
+        st.add("wmt24pp", lp, {"usage": {"prompt_tokens": 3, "completion_tokens": 2}, "latency_s": 0.1})
+    return st
+
+
+def test_run_stats_write_merges_invocations(tmp_path: Path) -> None:
+    path = tmp_path / "m.gen_stats.json"
+    _run("m", "en-de_DE", 3).write(path)
+    _run("m", "en-ko_KR", 2).write(path)
+    _run("m", "en-de_DE", 1).write(path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert data["by_job"]["wmt24pp/en-de_DE"]["rows"] == 4
+    assert data["by_job"]["wmt24pp/en-de_DE"]["invocations"] == 2
+    assert data["by_job"]["wmt24pp/en-ko_KR"]["rows"] == 2
+    assert data["total"]["rows"] == 6 and data["total"]["invocations"] == 3
+
+
+def test_run_stats_write_replaces_another_models_file(tmp_path: Path) -> None:
+    path = tmp_path / "m.gen_stats.json"
+    _run("other", "en-de_DE", 3).write(path)
+    _run("m", "en-ko_KR", 2).write(path)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert list(data["by_job"]) == ["wmt24pp/en-ko_KR"] and data["total"]["rows"] == 2
+
+
+def test_tokens_per_s_uses_counters() -> None:
+    st = GenStats(completion_tokens=100, first_ts=1.0, last_ts=3.0)
+    assert st.completion_tokens_per_s == 50.0
+    assert GenStats().completion_tokens_per_s is None
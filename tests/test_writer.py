@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from evalmt.generation.writer import ReorderBuffer
+
+
+def _row(seq: int) -> dict:
+    return {"id": seq}
+
+
+def test_releases_in_input_order() -> None:
+    buf = ReorderBuffer(window=8)
+    assert buf.push(2, _row(2)) == []
+    assert buf.push(1, _row(1)) == []
+    assert len(buf) == 2
+    assert buf.push(0, _row(0)) == [_row(0), _row(1), _row(2)]
+    assert len(buf) == 0
+    assert buf.next_seq == 3
+
+
+def test_failed_row_does_not_block() -> None:
+    buf = ReorderBuffer(window=8)
+    assert buf.push(1, _row(1)) == []
+    assert buf.push(0, None) == [_row(1)]
+    assert buf.push(3, _row(3)) == []
+    assert buf.push(2, None) == [_row(3)]
+    assert buf.next_seq == 4
+
+
+def test_window_bounds_admission() -> None:
+    buf = ReorderBuffer(window=2)
+    assert buf.can_admit(0) and buf.can_admit(1)
+    assert not buf.can_admit(2)
+    buf.push(1, _row(1))
+    assert not buf.can_admit(2)
+    buf.push(0, _row(0))
+    assert buf.can_admit(2) and buf.can_admit(3)
+    assert not buf.can_admit(4)
+
+
+def test_window_is_at_least_one() -> None:
+    buf = ReorderBuffer(window=0)
+    assert buf.can_admit(0)
+    assert not buf.can_admit(1)